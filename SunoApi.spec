@@ -7,7 +7,8 @@ from PyInstaller.utils.win32.versioninfo import (
 
 datas = []
 binaries = []
-hiddenimports = ['mutagen', 'requests', 'colorama', 'pyperclip', 'PIL', 'PIL._tkinter_finder']
+hiddenimports = ['mutagen', 'requests', 'colorama', 'pyperclip', 'PIL', 'PIL._tkinter_finder',
+                 'numpy']  # waveform peaks; imported optionally, so name it
 
 # Include resources folder
 import os
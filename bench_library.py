@@ -0,0 +1,364 @@
+"""
+Synthetic library generator and scan benchmark for the Library tab.
+
+Generates libraries of tagged MP3/WAV files laid out the way the downloader
+writes them (month folders, per-track stem folders, .txt lyric sidecars) and
+times the library code paths against them:
+
+    python bench_library.py generate ./bench_lib --count 10000
+    python bench_library.py run ./bench_lib --json bench_output.txt
+
+Each benchmark phase runs in a fresh process so the reported peak RSS belongs
+to that phase alone. "Cold" means the metadata cache is empty; the OS page
+cache is not dropped (that needs root), so run `generate` well before `run`
+or drop caches manually for a true cold-disk number.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import struct
+import sys
+import time
+import uuid as uuid_module
+
+from mutagen.id3 import ID3, APIC, TIT2, TPE1, TCON, COMM, TDRC, TYER, USLT, TXXX
+
+WORDS = (
+    "neon rain midnight echo velvet static ghost signal paper moon river glass "
+    "electric heart summer fade golden hour wire satellite ocean drift ember "
+    "silver city dream shadow highway thunder honey violet crystal orbit pulse "
+    "lantern winter fever mirror garden storm cherry halo rocket whisper tide"
+).split()
+
+ARTISTS = [
+    "Audio Alchemy", "InternetThot", "Night Drive", "Paper Lanterns", "Velvet Static",
+    "Ghost Signal", "Golden Hour", "The Satellites", "Ember & Wire", "Violet Orbit",
+]
+
+STYLES = [
+    "synthwave, dreamy, female vocals", "lofi hip hop, chill, vinyl crackle",
+    "indie rock, upbeat, male vocals", "dark ambient, cinematic", "pop punk, energetic",
+    "jazz, smooth saxophone, late night", "drum and bass, liquid, atmospheric",
+]
+
+STEMS = ["(bass)", "(drums)", "(vocals)", "(instrumental)", "(synth)"]
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo -> 417 byte frames
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+MP3_SAMPLES_PER_FRAME = 1152
+MP3_SAMPLE_RATE = 44100
+
+WAV_SAMPLE_RATE = 44100
+WAV_CHANNELS = 2
+WAV_BITS = 16
+
+
+# --- Generation ---
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _lyrics(rng, lines):
+    out = []
+    for i in range(lines):
+        if i % 8 == 0:
+            out.append("[Chorus]" if (i // 8) % 2 else "[Verse]")
+        out.append(_words(rng, rng.randint(4, 9)).capitalize())
+    return "\n".join(out)
+
+
+def _mp3_body(rng, seconds, silent_frames=8):
+    """A Xing-headed frame declaring `seconds` of audio plus a few silent frames."""
+    total_frames = int(seconds * MP3_SAMPLE_RATE / MP3_SAMPLES_PER_FRAME)
+    # Xing tag sits after the 32 byte side info of an MPEG-1 stereo frame
+    xing = b"Xing" + struct.pack(">III", 0x3, total_frames, total_frames * MP3_FRAME_SIZE)
+    first = MP3_FRAME_HEADER + b"\x00" * 32 + xing
+    first += b"\x00" * (MP3_FRAME_SIZE - len(first))
+    silent = MP3_FRAME_HEADER + b"\x00" * (MP3_FRAME_SIZE - 4)
+    return first + silent * silent_frames
+
+
+def _id3_bytes(song, art):
+    """Render the ID3 tag embed_metadata would write for this song."""
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=song["title"]))
+    tags.add(TPE1(encoding=3, text=song["artist"]))
+    tags.add(TCON(encoding=3, text=song["style"]))
+    tags.add(TDRC(encoding=3, text=song["year"]))
+    tags.add(TYER(encoding=3, text=song["year"]))
+    tags.add(COMM(encoding=3, lang="eng", desc="Description", text=song["lyrics"]))
+    tags.add(USLT(encoding=3, lang="eng", desc="", text=song["lyrics"]))
+    tags.add(TXXX(encoding=3, desc="SUNO_UUID", text=song["uuid"]))
+    if art:
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=art))
+    buffer = io.BytesIO()
+    tags.save(buffer, v2_version=3)
+    return buffer.getvalue()
+
+
+def _write_mp3(path, song, art, rng):
+    with open(path, "wb") as f:
+        f.write(_id3_bytes(song, art))
+        f.write(_mp3_body(rng, song["duration"]))
+
+
+def _write_wav(path, song, art, seconds):
+    """PCM WAV with an `id3 ` chunk after the data, like mutagen's WAVE.save()."""
+    byte_rate = WAV_SAMPLE_RATE * WAV_CHANNELS * WAV_BITS // 8
+    block_align = WAV_CHANNELS * WAV_BITS // 8
+    data_size = int(seconds * byte_rate) // block_align * block_align
+    id3 = _id3_bytes(song, art)
+    if len(id3) % 2:
+        id3 += b"\x00"
+    fmt = struct.pack("<HHIIHH", 1, WAV_CHANNELS, WAV_SAMPLE_RATE, byte_rate, block_align, WAV_BITS)
+    riff_size = 4 + (8 + len(fmt)) + (8 + data_size) + (8 + len(id3))
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", riff_size) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+        f.write(b"data" + struct.pack("<I", data_size))
+        # Seek over the sample data so filesystems that support it keep it sparse
+        f.seek(data_size, os.SEEK_CUR)
+        f.write(b"id3 " + struct.pack("<I", len(id3)) + id3)
+
+
+def generate_library(out_dir, count, seed=1, wav_ratio=0.1, stem_ratio=0.1, sidecar_ratio=1.0,
+                     art_kb=512, lyrics_lines=40, months=24, wav_seconds=5.0, progress=None):
+    """
+    Write `count` synthetic songs under `out_dir`.
+
+    Layout mirrors SunoDownloader with organize_by_month and organize_by_track on:
+    out_dir/YYYY-MM/Title.mp3, stems in out_dir/YYYY-MM/<base title>/Title (drums).mp3,
+    and a Title.txt lyrics sidecar next to a `sidecar_ratio` share of the songs.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    art_pool = b"\xff\xd8\xff\xe0" + rng.randbytes(max(0, art_kb * 1024 * 2))
+    end = time.time()
+    start = end - months * 30 * 86400
+    written = 0
+
+    while written < count:
+        base_title = _words(rng, rng.randint(2, 4)).title()
+        created = rng.uniform(start, end)
+        month_dir = os.path.join(out_dir, time.strftime("%Y-%m", time.localtime(created)))
+        os.makedirs(month_dir, exist_ok=True)
+
+        variants = [(base_title, month_dir)]
+        if rng.random() < stem_ratio:
+            track_dir = os.path.join(month_dir, base_title)
+            os.makedirs(track_dir, exist_ok=True)
+            variants = [(f"{base_title} {stem}", track_dir) for stem in rng.sample(STEMS, 3)]
+
+        for title, folder in variants:
+            if written >= count:
+                break
+            song = {
+                "title": title,
+                "artist": rng.choice(ARTISTS),
+                "style": rng.choice(STYLES),
+                "year": time.strftime("%Y", time.localtime(created)),
+                "uuid": str(uuid_module.UUID(int=rng.getrandbits(128), version=4)),
+                "lyrics": _lyrics(rng, lyrics_lines),
+                "duration": rng.randint(90, 240),
+            }
+            art_len = int(art_kb * 1024 * rng.uniform(0.5, 1.5)) if art_kb > 0 else 0
+            art = art_pool[:art_len]
+
+            is_wav = rng.random() < wav_ratio
+            path = os.path.join(folder, title + (".wav" if is_wav else ".mp3"))
+            if os.path.exists(path):
+                path = os.path.join(folder, f"{title} v{written}" + (".wav" if is_wav else ".mp3"))
+            if is_wav:
+                _write_wav(path, song, art, wav_seconds)
+            else:
+                _write_mp3(path, song, art, rng)
+            os.utime(path, (created, created))
+
+            if rng.random() < sidecar_ratio:
+                txt_path = os.path.splitext(path)[0] + ".txt"
+                with open(txt_path, "w", encoding="utf-8") as f:
+                    f.write(song["lyrics"])
+                os.utime(txt_path, (created, created))
+
+            written += 1
+            if progress and written % 1000 == 0:
+                progress(written)
+    return written
+
+
+# --- Benchmark phases ---
+
+def _peak_rss_bytes(who="self"):
+    """Peak resident set size of this process (or its largest reaped child), or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    target = resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN
+    peak = resource.getrusage(target).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class HeadlessLibrary:
+    """Drives LibraryTab's scan code without a Tk root."""
+
+    def __init__(self, download_path, cache_file, cache_max_entries=None):
+        from library_tab import LibraryTab
+        config = {"path": download_path}
+        if cache_max_entries is not None:
+            config["library_cache_max_entries"] = cache_max_entries
+        # No Frame.__init__ (it needs a display); the tab sets up its scan state the
+        # same way it does when built for real, so the shipped methods run unchanged.
+        self.tab = LibraryTab.__new__(LibraryTab)
+        self.tab._init_scan_state(config, cache_file)
+
+    def scan(self):
+        """Run one scan to completion and return the number of songs it produced."""
+        self.tab._scan_thread()
+        songs = 0
+        while True:
+            msg_type, data = self.tab.scan_queue.get()
+            if msg_type == "batch":
+                songs += len(data)
+            elif msg_type == "done":
+                return songs
+
+
+def _phase_scan(library_dir, cache_file):
+    return HeadlessLibrary(library_dir, cache_file).scan()
+
+
+def _phase_uuid_index(library_dir, cache_file):
+    from suno_utils import build_uuid_cache
+    return len(build_uuid_cache(library_dir))
+
+
+PHASES = {
+    # name: (callable, remove cache before running)
+    "cold_scan": (_phase_scan, True),
+    "warm_scan": (_phase_scan, False),
+    "uuid_index": (_phase_uuid_index, False),
+}
+
+
+def _run_phase(name, library_dir, cache_file):
+    func, _ = PHASES[name]
+    started = time.perf_counter()
+    items = func(library_dir, cache_file)
+    elapsed = time.perf_counter() - started
+    return {
+        "phase": name,
+        "items": items,
+        "seconds": elapsed,
+        "files_per_sec": items / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        # Scan worker processes, if the phase used any
+        "worker_peak_rss_bytes": _peak_rss_bytes("children"),
+    }
+
+
+def _phase_process(name, library_dir, cache_file, results):
+    results.put(_run_phase(name, library_dir, cache_file))
+
+
+def run_benchmark(library_dir, cache_file, phases):
+    """Run each phase in its own spawned process and collect the results."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for name in phases:
+        _, cold = PHASES[name]
+        if cold:
+            # SQLite cache plus its WAL side files
+            for path in (cache_file, cache_file + "-wal", cache_file + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+        # A plain Process rather than a Pool: pool workers are daemonic and
+        # could not start the scan's own worker processes.
+        result_queue = ctx.Queue()
+        proc = ctx.Process(target=_phase_process, args=(name, library_dir, cache_file, result_queue))
+        proc.start()
+        results.append(result_queue.get())
+        proc.join()
+    return results
+
+
+def _format_bytes(value):
+    if value is None:
+        return "n/a"
+    return f"{value / (1024 * 1024):.1f} MB"
+
+
+def print_results(results):
+    print(f"{'phase':<12} {'items':>8} {'seconds':>9} {'files/s':>10} {'peak RSS':>11} {'workers':>11}")
+    for r in results:
+        print(f"{r['phase']:<12} {r['items']:>8} {r['seconds']:>9.2f} "
+              f"{r['files_per_sec']:>10.0f} {_format_bytes(r['peak_rss_bytes']):>11} "
+              f"{_format_bytes(r['worker_peak_rss_bytes']):>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SunoSync library generator and scan benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="Write a synthetic tagged library")
+    gen.add_argument("directory")
+    gen.add_argument("--count", type=int, default=1000, help="number of audio files (default 1000)")
+    gen.add_argument("--seed", type=int, default=1)
+    gen.add_argument("--wav-ratio", type=float, default=0.1, help="share of WAV files (default 0.1)")
+    gen.add_argument("--stem-ratio", type=float, default=0.1, help="share of tracks split into stems")
+    gen.add_argument("--sidecar-ratio", type=float, default=1.0, help="share of songs with a .txt sidecar")
+    gen.add_argument("--art-kb", type=int, default=512, help="mean APIC cover size in KiB")
+    gen.add_argument("--lyrics-lines", type=int, default=40)
+    gen.add_argument("--months", type=int, default=24, help="spread of creation dates")
+    gen.add_argument("--wav-seconds", type=float, default=5.0, help="PCM length of WAV files")
+    gen.add_argument("--clean", action="store_true", help="delete the directory first")
+
+    run = sub.add_parser("run", help="Benchmark scans against a generated library")
+    run.add_argument("directory")
+    run.add_argument("--cache", default=None,
+                     help="metadata cache path (default: <directory>/../bench_cache.db)")
+    run.add_argument("--phases", default=",".join(PHASES),
+                     help=f"comma separated subset of: {', '.join(PHASES)}")
+    run.add_argument("--json", dest="json_path", default=None, help="also write results as JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        if args.clean and os.path.exists(args.directory):
+            shutil.rmtree(args.directory)
+        started = time.perf_counter()
+        written = generate_library(
+            args.directory, args.count, seed=args.seed, wav_ratio=args.wav_ratio,
+            stem_ratio=args.stem_ratio, sidecar_ratio=args.sidecar_ratio, art_kb=args.art_kb,
+            lyrics_lines=args.lyrics_lines, months=args.months, wav_seconds=args.wav_seconds,
+            progress=lambda n: print(f"  {n} files...", flush=True),
+        )
+        print(f"Wrote {written} files to {args.directory} in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    library_dir = os.path.abspath(args.directory)
+    if not os.path.isdir(library_dir):
+        parser.error(f"library directory does not exist: {library_dir}")
+    cache_file = args.cache or os.path.join(os.path.dirname(library_dir), "bench_cache.db")
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    unknown = [p for p in phases if p not in PHASES]
+    if unknown:
+        parser.error(f"unknown phase(s): {', '.join(unknown)}")
+
+    results = run_benchmark(library_dir, cache_file, phases)
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"library": library_dir, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+
+# App data kept inside the download folder (no audio, so the library ignores it)
+DATA_DIR = ".sunosync"
+INDEX_FILE = "index.db"
+# BLAKE2b digest size in bytes; 128 bits is plenty to tell songs apart
+HASH_SIZE = 16
+
+
+def index_path(directory):
+    return os.path.join(directory, DATA_DIR, INDEX_FILE)
+
+
+class DownloadIndex:
+    """
+    Record of what the downloader has written into a download folder.
+
+    One row per SUNO clip: its canonical file (relative to the folder, so the
+    folder can be moved; normally in the SongStore), the number of bytes
+    downloaded and a BLAKE2b hash of the audio as it was streamed. The hash is
+    taken before tags are embedded, so re-tagging a file doesn't change it and two
+    clips with the same audio always match. Rows whose file has since been deleted
+    or moved are ignored. A views table lists the folder entries (hard links,
+    symlinks or copies) that show each clip.
+
+    Stored in .sunosync/index.db inside the folder. Safe to share between the
+    download threads; calls are serialized.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = index_path(directory)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    uuid TEXT PRIMARY KEY,
+                    filepath TEXT NOT NULL,
+                    download_size INTEGER,
+                    audio_hash TEXT,
+                    downloaded_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_downloads_hash ON downloads(audio_hash);
+                CREATE TABLE IF NOT EXISTS views (
+                    uuid TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    PRIMARY KEY (uuid, path)
+                );
+            """)
+
+    @classmethod
+    def open_existing(cls, directory):
+        """The folder's index, or None if nothing has been downloaded into it yet."""
+        if not directory or not os.path.exists(index_path(directory)):
+            return None
+        return cls(directory)
+
+    def _abspath(self, relpath):
+        return os.path.normpath(os.path.join(self.directory, relpath))
+
+    def add(self, uuid, filepath, download_size, audio_hash):
+        """Record a clip saved to filepath."""
+        relpath = os.path.relpath(filepath, self.directory)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (uuid, filepath, download_size, audio_hash, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (uuid, relpath, download_size, audio_hash, time.time()))
+
+    def canonical(self, uuid):
+        """Path of the clip's canonical file if it still exists, else None."""
+        with self._lock:
+            row = self._conn.execute("SELECT filepath FROM downloads WHERE uuid = ?", (uuid,)).fetchone()
+        if row is None:
+            return None
+        filepath = self._abspath(row[0])
+        return filepath if os.path.exists(filepath) else None
+
+    def move_canonical(self, old_path, new_path):
+        """Point every clip whose canonical file is old_path at new_path."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE downloads SET filepath = ? WHERE filepath = ?",
+                               (os.path.relpath(new_path, self.directory),
+                                os.path.relpath(old_path, self.directory)))
+
+    def add_view(self, uuid, path, kind):
+        """Record a folder entry ('hardlink', 'symlink' or 'copy') showing a clip."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO views (uuid, path, kind) VALUES (?, ?, ?)",
+                               (uuid, os.path.relpath(path, self.directory), kind))
+
+    def views(self, uuid):
+        """[(path, kind)] recorded for a clip, including ones that no longer exist."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, kind FROM views WHERE uuid = ?", (uuid,)).fetchall()
+        return [(self._abspath(path), kind) for path, kind in rows]
+
+    def views_of(self, filepath):
+        """
+        [(uuid, path, kind)] recorded for every clip whose canonical file is
+        filepath (older downloads linked clips with the same audio to one file).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT v.uuid, v.path, v.kind FROM views v JOIN downloads d ON d.uuid = v.uuid "
+                "WHERE d.filepath = ?", (os.path.relpath(filepath, self.directory),)).fetchall()
+        return [(uuid, self._abspath(path), kind) for uuid, path, kind in rows]
+
+    def forget_views_of(self, filepath):
+        """Drop the views of every clip whose canonical file is filepath."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM views WHERE uuid IN (SELECT uuid FROM downloads WHERE filepath = ?)",
+                (os.path.relpath(filepath, self.directory),))
+
+    def find_hash(self, audio_hash):
+        """Path of an existing file with this audio (a view of it if there is one), or None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT v.path FROM downloads d JOIN views v ON v.uuid = d.uuid WHERE d.audio_hash = ? "
+                "UNION ALL SELECT filepath FROM downloads WHERE audio_hash = ?",
+                (audio_hash, audio_hash)).fetchall()
+        for (relpath,) in rows:
+            filepath = self._abspath(relpath)
+            if os.path.exists(filepath):
+                return filepath
+        return None
+
+    def average_size(self, ext):
+        """(count, mean bytes) of past downloads saved with this extension, e.g. '.wav'."""
+        with self._lock:
+            count, average = self._conn.execute(
+                "SELECT COUNT(*), AVG(download_size) FROM downloads "
+                "WHERE download_size > 0 AND filepath LIKE ?", ("%" + ext,)).fetchone()
+        return count, average
+
+    def uuids(self):
+        """UUIDs of clips whose file is still in place."""
+        with self._lock:
+            rows = self._conn.execute("SELECT uuid, filepath FROM downloads").fetchall()
+        return {uuid for uuid, relpath in rows if os.path.exists(self._abspath(relpath))}
+
+    def duplicates(self):
+        """
+        Groups of two or more clips with identical audio, each clip given as the
+        first of its views that still exists, else its canonical file. Oldest
+        download first, largest groups first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uuid, audio_hash, filepath FROM downloads WHERE audio_hash IN ("
+                "  SELECT audio_hash FROM downloads WHERE audio_hash IS NOT NULL"
+                "  GROUP BY audio_hash HAVING COUNT(*) > 1"
+                ") ORDER BY downloaded_at").fetchall()
+            view_rows = self._conn.execute("SELECT uuid, path FROM views").fetchall()
+        # Files in the store aren't listed anywhere; report one of the clip's views instead
+        shown = defaultdict(list)
+        for uuid, view in view_rows:
+            shown[uuid].append(self._abspath(view))
+        groups = defaultdict(list)
+        for uuid, audio_hash, relpath in rows:
+            filepath = next((view for view in shown.get(uuid, ()) if os.path.exists(view)),
+                            self._abspath(relpath))
+            if filepath not in groups[audio_hash] and os.path.exists(filepath):
+                groups[audio_hash].append(filepath)
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -797,6 +797,9 @@ class DownloaderTab(tk.Frame):
 
     def open_filters(self):
         ws_name = self.filter_settings.get("workspace_name")
+        sources = self.filter_settings.get("sources")
+        if sources:
+            ws_name = ", ".join(source.get("name") or source.get("id") for source in sources)
         FilterPopup(
             self,
             self.filter_settings,
@@ -814,8 +817,8 @@ class DownloaderTab(tk.Frame):
             self.filter_settings["type"] = (
                 "all"  # Reset to all or keep previous? Usually reset.
             )
-            if hasattr(self, "workspace_btn"):
-                self.workspace_btn.set_text("Workspaces")
+            self.filter_settings["sources"] = []
+            self._update_source_btns([])
             messagebox.showinfo(
                 "Workspace Cleared", "Workspace selection has been cleared."
             )
@@ -946,21 +949,59 @@ class DownloaderTab(tk.Frame):
         # ws is a dict
         ws_id = ws.get("id")
         name = ws.get("name")
-        self.filter_settings["workspace_id"] = ws_id
-        self.filter_settings["workspace_name"] = name
-        self.filter_settings["type"] = (
-            "workspace"  # Custom type to indicate workspace mode if needed
-        )
-        self.save_config()
-
-        # Update UI to show selected workspace
-        if hasattr(self, "workspace_btn"):
-            self.workspace_btn.set_text(f"WS: {name[:10]}...")
+        sources = self._select_source({"type": "workspace", "id": ws_id, "name": name})
+        self._show_sources_selected(sources, "Workspace Selected", f"Selected workspace: {name}")
+
+    def _select_source(self, source):
+        """
+        Make a workspace/playlist the one to sync, or (if the user says so) add it to
+        those already selected so they are all synced together in one run.
+        """
+        settings = self.filter_settings
+        sources = list(settings.get("sources") or [])
+        if not sources and settings.get("workspace_id"):
+            sources = [{
+                "type": settings.get("type"),
+                "id": settings["workspace_id"],
+                "name": settings.get("workspace_name"),
+            }]
+        others = [s for s in sources if s.get("id") != source["id"]]
+        if others and messagebox.askyesno(
+            "Sync Together?",
+            f"Also keep syncing {', '.join(s.get('name') or s.get('id') for s in others)}?\n\n"
+            f"Yes syncs them together with {source['name']} in one run; "
+            f"No syncs only {source['name']}.",
+        ):
+            sources = others + [source]
+        else:
+            sources = [source]
 
-        messagebox.showinfo(
-            "Workspace Selected",
-            f"Selected workspace: {name}\nClick 'Start Download' or 'Preload' to proceed.",
-        )
+        settings["sources"] = sources if len(sources) > 1 else []
+        settings["workspace_id"] = source["id"]
+        settings["workspace_name"] = source["name"]
+        settings["type"] = source["type"]  # Custom type to indicate workspace/playlist mode
+        self.save_config()
+        return sources
+
+    def _show_sources_selected(self, sources, title, selected):
+        self._update_source_btns(sources)
+        if len(sources) > 1:
+            selected = f"Syncing {len(sources)} together: " + ", ".join(s.get("name") or s.get("id") for s in sources)
+        messagebox.showinfo(title, f"{selected}\nClick 'Start Download' or 'Preload' to proceed.")
+
+    def _update_source_btns(self, sources):
+        """Show the selected workspaces and playlists on their buttons."""
+        for attr, kind, label, prefix in (("workspace_btn", "workspace", "Workspaces", "WS"),
+                                          ("playlist_btn", "playlist", "Playlists", "PL")):
+            if not hasattr(self, attr):
+                continue
+            names = [s.get("name") or s.get("id") for s in sources if s.get("type") == kind]
+            if len(names) > 1:
+                getattr(self, attr).set_text(f"{prefix}: {len(names)} selected")
+            elif names:
+                getattr(self, attr).set_text(f"{prefix}: {names[0][:10]}...")
+            else:
+                getattr(self, attr).set_text(label)
 
     def open_playlists(self):
         token = self.token_var.get().strip()
@@ -995,28 +1036,9 @@ class DownloaderTab(tk.Frame):
         # pl is a dict
         pl_id = pl.get("id")
         name = pl.get("name") or pl.get("title")
-        self.filter_settings["workspace_id"] = (
-            pl_id  # We reuse workspace_id as it's just an ID passed to API
-        )
-        self.filter_settings["workspace_name"] = name
-        self.filter_settings["type"] = "playlist"  # Custom type
-
-        # Note: The downloader needs to know if it's a playlist or workspace to use correct URL?
-        # Actually, in suno_downloader.py, we need to handle "playlist" type if the API endpoint is different.
-        # Currently suno_downloader uses /api/project/{id} for workspace_id.
-        # If playlists use /api/playlist/{id}, we need to update suno_downloader.py.
-        # Let's check suno_downloader.py logic.
-
-        self.save_config()
-
-        # Update UI
-        if hasattr(self, "playlist_btn"):
-            self.playlist_btn.set_text(f"PL: {name[:10]}...")
-
-        messagebox.showinfo(
-            "Playlist Selected",
-            f"Selected playlist: {name}\nClick 'Start Download' or 'Preload' to proceed.",
-        )
+        # We reuse workspace_id as it's just an ID passed to API
+        sources = self._select_source({"type": "playlist", "id": pl_id, "name": name})
+        self._show_sources_selected(sources, "Playlist Selected", f"Selected playlist: {name}")
 
     def preload_songs(self):
         print("DEBUG: Preload button clicked")
@@ -1079,6 +1101,7 @@ class DownloaderTab(tk.Frame):
             organize_by_track=self.track_folder_var.get(),
             stems_only=self.filter_settings.get("stems_only"),
             smart_resume=self.smart_resume_var.get(),
+            sources=self.filter_settings.get("sources"),
             scan_only=True,  # CRITICAL: Only scan, don't download
         )
 
@@ -1192,6 +1215,7 @@ class DownloaderTab(tk.Frame):
             organize_by_track=self.track_folder_var.get(),
             stems_only=self.filter_settings.get("stems_only"),
             smart_resume=self.smart_resume_var.get(),
+            sources=self.filter_settings.get("sources"),
         )
 
         thread = threading.Thread(target=self.downloader.run, daemon=True)
@@ -0,0 +1,329 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+# Song dict keys stored as columns, in table order. 'id' is stored as 'uuid'.
+SONG_COLUMNS = ("filepath", "title", "artist", "duration", "date", "filesize", "mtime_ns", "inode", "uuid")
+
+# Full-text index over a song's searchable text. Rows share their rowid with the song
+# row and record the file/sidecar mtimes they were read at, so stale rows can be found.
+TEXT_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS song_text USING fts5(
+        title, artist, lyrics, style, prompt,
+        mtime_ns UNINDEXED, sidecar_mtime_ns UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS song_text_delete AFTER DELETE ON songs BEGIN
+        DELETE FROM song_text WHERE rowid = old.rowid;
+    END;
+"""
+# Waveform peaks, keyed by file identity (size, mtime, inode) rather than path so a
+# renamed or moved song keeps its peaks. An empty blob marks a file that couldn't be decoded.
+PEAKS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS peaks (
+        filesize INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        peaks BLOB,
+        PRIMARY KEY (filesize, mtime_ns, inode)
+    );
+"""
+# Join condition from a song row (alias s) to its peaks row (alias p)
+_PEAKS_JOIN = "p.filesize = s.filesize AND p.mtime_ns = s.mtime_ns AND p.inode = COALESCE(s.inode, 0)"
+# bm25 column weights: a hit in the title counts most, then artist, style, lyrics, prompt
+TEXT_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 0.5)
+
+
+class LibraryCache:
+    """
+    SQLite-backed metadata cache for the Library tab.
+
+    One row per audio file, keyed by absolute path, with indexed title/artist/date/uuid
+    columns. Lyrics live in their own table, filled on demand by LyricsStore, so
+    loading the row cache at startup never pulls lyric text into memory. The
+    database runs in WAL mode and every write is an upsert of just the rows that
+    changed.
+
+    If SQLite was built with FTS5, a song_text table indexes lyrics, style tags and
+    prompts for full-text search (see TextIndexer); has_text_search says whether it
+    exists. A peaks table holds each song's waveform (see PeakIndexer).
+
+    Safe to share between the Tk thread and the scan thread; calls are serialized.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+        self.has_text_search = self._create_text_schema()
+        self._migrate_legacy_json()
+
+    def _create_schema(self):
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS songs (
+                    filepath TEXT PRIMARY KEY,
+                    title TEXT,
+                    artist TEXT,
+                    duration INTEGER,
+                    date TEXT,
+                    filesize INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER,
+                    uuid TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_songs_title ON songs(title);
+                CREATE INDEX IF NOT EXISTS idx_songs_artist ON songs(artist);
+                CREATE INDEX IF NOT EXISTS idx_songs_date ON songs(date);
+                CREATE INDEX IF NOT EXISTS idx_songs_uuid ON songs(uuid);
+                CREATE TABLE IF NOT EXISTS lyrics (
+                    filepath TEXT PRIMARY KEY REFERENCES songs(filepath) ON DELETE CASCADE,
+                    lyrics TEXT,
+                    sidecar_mtime_ns INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS dirs (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER,
+                    subdirs TEXT
+                );
+            """ + PEAKS_SCHEMA)
+            # Databases created before change keys were (size, mtime_ns, inode)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(songs)")}
+            for column in ("mtime_ns", "inode"):
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE songs ADD COLUMN {column} INTEGER")
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(lyrics)")}
+            if "sidecar_mtime_ns" not in existing:
+                self._conn.execute("ALTER TABLE lyrics ADD COLUMN sidecar_mtime_ns INTEGER")
+
+    def _create_text_schema(self):
+        try:
+            with self._conn:
+                self._conn.executescript(TEXT_SCHEMA)
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable: {e}")
+            return False
+
+    def _migrate_legacy_json(self):
+        """Import library_cache.json from older versions once, then set it aside."""
+        legacy_path = os.path.splitext(self.db_path)[0] + ".json"
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            if isinstance(legacy, dict):
+                self.upsert_many(legacy.values())
+            os.replace(legacy_path, legacy_path + ".bak")
+            print(f"Migrated {len(legacy)} cache entries from {os.path.basename(legacy_path)}")
+        except Exception as e:
+            print(f"Error migrating legacy cache: {e}")
+
+    @staticmethod
+    def _row_to_song(row):
+        song = dict(row)
+        song['id'] = song.pop('uuid')
+        return song
+
+    def load_all(self):
+        """Return {filepath: song dict} for every cached file, without lyrics."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(SONG_COLUMNS)} FROM songs").fetchall()
+        return {row['filepath']: self._row_to_song(row) for row in rows}
+
+    def upsert_many(self, songs):
+        """
+        Insert or update song rows in one transaction. Songs carrying a 'lyrics' key
+        also store their lyrics; for the rest any cached lyrics are dropped, since the
+        file was re-read and they may be stale.
+        """
+        rows = []
+        lyrics = []
+        stale = []
+        for song in songs:
+            rows.append((
+                song['filepath'], song.get('title'), song.get('artist'), song.get('duration', 0),
+                song.get('date', ''), song.get('filesize', 0), song.get('mtime_ns'), song.get('inode'),
+                song.get('id'),
+            ))
+            if 'lyrics' in song:
+                lyrics.append((song['filepath'], song['lyrics'] or '', song.get('sidecar_mtime_ns')))
+            else:
+                stale.append((song['filepath'],))
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(f"""
+                INSERT INTO songs ({', '.join(SONG_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(filepath) DO UPDATE SET
+                    title=excluded.title, artist=excluded.artist, duration=excluded.duration,
+                    date=excluded.date, filesize=excluded.filesize, mtime_ns=excluded.mtime_ns,
+                    inode=excluded.inode, uuid=excluded.uuid
+            """, rows)
+            if lyrics:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO lyrics (filepath, lyrics, sidecar_mtime_ns) VALUES (?, ?, ?)",
+                    lyrics)
+            if stale:
+                self._conn.executemany("DELETE FROM lyrics WHERE filepath = ?", stale)
+
+    def delete_many(self, filepaths):
+        """Remove rows (and their lyrics) for the given paths."""
+        filepaths = [(filepath,) for filepath in filepaths]
+        if not filepaths:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM songs WHERE filepath = ?", filepaths)
+
+    def get_lyrics(self, filepath):
+        """
+        Cached (lyrics, sidecar_mtime_ns) for a file, or None if never stored.
+        sidecar_mtime_ns is the .txt sidecar's mtime when the lyrics were read
+        (None if there was no sidecar or it is unknown).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lyrics, sidecar_mtime_ns FROM lyrics WHERE filepath = ?", (filepath,)).fetchone()
+        return (row['lyrics'], row['sidecar_mtime_ns']) if row else None
+
+    def set_lyrics(self, filepath, lyrics, sidecar_mtime_ns=None):
+        """Store lyrics for a file that already has a song row."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lyrics (filepath, lyrics, sidecar_mtime_ns) "
+                "SELECT filepath, ?, ? FROM songs WHERE filepath = ?",
+                (lyrics or '', sidecar_mtime_ns, filepath))
+
+    def text_index_state(self, filepaths=None):
+        """
+        (filepath, mtime_ns, indexed_mtime_ns, indexed_sidecar_mtime_ns) for every song,
+        or just the given paths. The indexed values are None for songs not indexed yet.
+        """
+        query = ("SELECT s.filepath, s.mtime_ns, t.mtime_ns, t.sidecar_mtime_ns "
+                 "FROM songs s LEFT JOIN song_text t ON t.rowid = s.rowid")
+        with self._lock:
+            if filepaths is None:
+                return self._conn.execute(query).fetchall()
+            return [row for filepath in filepaths
+                    for row in self._conn.execute(query + " WHERE s.filepath = ?", (filepath,))]
+
+    def set_text_many(self, entries):
+        """
+        Store searchable text for songs in one transaction. entries are
+        (filepath, fields, mtime_ns, sidecar_mtime_ns) with fields from read_text_fields();
+        title and artist are taken from the song row.
+        """
+        rows = [(fields['lyrics'], fields['style'], fields['prompt'], mtime_ns, sidecar_mtime_ns, filepath)
+                for filepath, fields, mtime_ns, sidecar_mtime_ns in entries]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM song_text WHERE rowid = (SELECT rowid FROM songs WHERE filepath = ?)",
+                [(row[-1],) for row in rows])
+            self._conn.executemany(
+                "INSERT INTO song_text (rowid, title, artist, lyrics, style, prompt, mtime_ns, sidecar_mtime_ns) "
+                "SELECT rowid, title, artist, ?, ?, ?, ?, ? FROM songs WHERE filepath = ?", rows)
+
+    def search_text(self, match, limit=500):
+        """
+        Run an FTS5 MATCH expression. Returns [(filepath, snippet)] best match first;
+        the snippet marks matched terms with [brackets].
+        """
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT s.filepath, snippet(song_text, -1, '[', ']', '…', 12)
+                FROM song_text JOIN songs s ON s.rowid = song_text.rowid
+                WHERE song_text MATCH ?
+                ORDER BY bm25(song_text, {', '.join(map(str, TEXT_WEIGHTS))})
+                LIMIT ?
+            """, (match, limit)).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def peak_index_state(self):
+        """Filepaths of songs with no stored waveform peaks."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT s.filepath FROM songs s LEFT JOIN peaks p ON {_PEAKS_JOIN} "
+                "WHERE p.peaks IS NULL AND s.mtime_ns IS NOT NULL").fetchall()
+        return [row[0] for row in rows]
+
+    def get_peaks(self, filepath):
+        """Stored peaks blob for a song (b'' if it couldn't be decoded), or None if not computed."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT p.peaks FROM songs s JOIN peaks p ON {_PEAKS_JOIN} WHERE s.filepath = ?",
+                (filepath,)).fetchone()
+        return row[0] if row else None
+
+    def set_peaks_many(self, entries):
+        """Store (filepath, peaks blob) pairs under the identity of each file's song row."""
+        rows = [(peaks, filepath) for filepath, peaks in entries]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO peaks (filesize, mtime_ns, inode, peaks) "
+                "SELECT filesize, mtime_ns, COALESCE(inode, 0), ? FROM songs "
+                "WHERE filepath = ? AND filesize IS NOT NULL AND mtime_ns IS NOT NULL", rows)
+
+    def prune_peaks(self):
+        """Drop peaks that no song row refers to any more (files edited or deleted)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM peaks WHERE rowid IN (SELECT p.rowid FROM peaks p "
+                f"LEFT JOIN songs s ON {_PEAKS_JOIN} WHERE s.filepath IS NULL)")
+
+    def load_dirs(self):
+        """Return {dirpath: (mtime_ns, [subdir names])} recorded by the last scan."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, mtime_ns, subdirs FROM dirs").fetchall()
+        return {row['path']: (row['mtime_ns'], json.loads(row['subdirs'] or '[]')) for row in rows}
+
+    def save_dirs(self, dirs):
+        """Upsert directory states from a {dirpath: (mtime_ns, [subdir names])} dict."""
+        rows = [(path, state[0], json.dumps(state[1])) for path, state in dirs.items()]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, subdirs) VALUES (?, ?, ?)", rows)
+
+    def delete_dirs(self, paths):
+        """Forget directory states so the next scan lists those directories again."""
+        paths = [(path,) for path in paths]
+        if not paths:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM dirs WHERE path = ?", paths)
+
+    def vacuum(self):
+        """Checkpoint the WAL and rebuild the database file to reclaim space from deleted rows."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def disk_size(self):
+        """Bytes used on disk by the database and its WAL."""
+        total = 0
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,308 @@
+import re
+from array import array
+from bisect import insort_left
+
+
+# Gram length indexed; shorter queries scan the pre-lowered text instead
+GRAM = 3
+# Rebuild postings once this many removed/replaced entries have piled up (and outnumber live ones)
+COMPACT_MIN_DEAD = 1000
+
+
+def _search_text(song):
+    """Lower-cased text a song is searched by. Fields are joined with a character
+    no query contains, so matches never span from one field into the next."""
+    return f"{song.get('title') or ''}\x00{song.get('artist') or ''}".lower()
+
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(text):
+    """Case-folded sort key that orders embedded numbers by value ("Track 2" < "Track 10")."""
+    folded = (text or "").casefold()
+    if not _DIGITS.search(folded):
+        return (folded,)
+    parts = _DIGITS.split(folded)
+    parts[1::2] = map(int, parts[1::2])
+    return tuple(parts)
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """
+    Substring search over song titles and artists.
+
+    Each song's fields are lower-cased once, when it is added, and their trigrams
+    are posted to an inverted index of compact integer arrays. A query of three or
+    more characters only checks the songs listed under its rarest trigram; shorter
+    ones scan the pre-lowered text. A query that extends the previous one (the usual
+    case while typing) only re-checks the previous result.
+
+    Songs are identified by filepath; search() returns a set of filepaths. Removed
+    songs are tombstoned and the postings rebuilt once enough of them pile up.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def clear(self):
+        self._texts = []      # doc id -> search text, None once removed
+        self._paths = []      # doc id -> filepath, None once removed
+        self._ids = {}        # filepath -> live doc id
+        self._postings = {}   # gram -> array of doc ids (ascending)
+        self._dead = 0
+        self._invalidate()
+
+    def add(self, songs):
+        """Index songs, replacing any already indexed under the same filepath."""
+        for song in songs:
+            filepath = song['filepath']
+            text = _search_text(song)
+            doc = self._ids.get(filepath)
+            if doc is not None:
+                if self._texts[doc] == text:
+                    continue
+                self._kill(doc)
+            self._post(filepath, text)
+        self._maybe_compact()
+        self._invalidate()
+
+    def remove(self, filepaths):
+        for filepath in filepaths:
+            doc = self._ids.get(filepath)
+            if doc is not None:
+                self._kill(doc)
+        self._maybe_compact()
+        self._invalidate()
+
+    def search(self, query):
+        """Filepaths of songs whose title or artist contains query (already lower-cased)."""
+        if not query:
+            return set(self._ids)
+        texts = self._texts
+        if self._last_query is not None and self._last_query in query:
+            # Anything matching the longer query also matched the shorter one
+            docs = [doc for doc in self._last_result if query in texts[doc]]
+        elif len(query) >= GRAM:
+            postings = [self._postings.get(gram, ()) for gram in _grams(query, GRAM)]
+            docs = [doc for doc in min(postings, key=len)
+                    if texts[doc] is not None and query in texts[doc]]
+        else:
+            docs = [doc for doc, text in enumerate(texts) if text is not None and query in text]
+        self._last_query, self._last_result = query, docs
+        paths = self._paths
+        return {paths[doc] for doc in docs}
+
+    def _post(self, filepath, text):
+        doc = len(self._texts)
+        self._texts.append(text)
+        self._paths.append(filepath)
+        self._ids[filepath] = doc
+        postings = self._postings
+        for gram in _grams(text, GRAM):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(doc)
+
+    def _kill(self, doc):
+        del self._ids[self._paths[doc]]
+        self._texts[doc] = self._paths[doc] = None
+        self._dead += 1
+
+    def _maybe_compact(self):
+        if self._dead >= COMPACT_MIN_DEAD and self._dead > len(self._ids):
+            live = [(path, text) for path, text in zip(self._paths, self._texts) if path is not None]
+            self.clear()
+            for path, text in live:
+                self._post(path, text)
+
+    def _invalidate(self):
+        self._last_query = self._last_result = None
+
+
+class _SpecKey:
+    """Compares songs' key tuples column by column, each column in its own direction."""
+    __slots__ = ("values", "reverses")
+
+    def __init__(self, values, reverses):
+        self.values = values
+        self.reverses = reverses
+
+    def __lt__(self, other):
+        for a, b, reverse in zip(self.values, other.values, self.reverses):
+            if a != b:
+                return b < a if reverse else a < b
+        return False
+
+
+class SortIndex:
+    """
+    Sort orders over the full song list, computed once and reused.
+
+    keys maps a column name to a function giving a song's sort key. A column's keys
+    are computed the first time it is sorted on, and each sort spec's permutation
+    (a list of positions in the song list) is cached, so sorting again, flipping the
+    direction (the cached permutation reversed) or re-filtering cost one pass over
+    the songs instead of a sort. A spec is a sequence of (column, reverse) pairs,
+    most significant first; ties keep the song list's own order.
+
+    Call reset() when the song list is replaced, patch() when songs are added to,
+    dropped from or updated in it, and invalidate(column) when one column's keys
+    change (e.g. tags).
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.reset([])
+
+    def reset(self, songs):
+        self._songs = songs
+        self._columns = {}  # column -> key per song position
+        self._perms = {}    # spec -> permutation
+        self._positions = None  # id(song) -> position, built when patch() needs it
+
+    def patch(self, songs, changed=()):
+        """
+        Follow an edit of the song list without sorting it again. songs is the new
+        list: the current one's songs (some dropped) plus new ones; changed are
+        songs updated in place. Cached keys are carried over, only new and changed
+        songs have theirs computed, and each is placed into the cached permutations
+        by binary search. Returns the columns whose keys changed.
+        """
+        old = self._songs
+        if songs is old:
+            remap = None
+        else:
+            positions = {id(song): i for i, song in enumerate(songs)}
+            remap = [positions.get(id(song), -1) for song in old]
+        self._songs = songs
+        self._positions = positions if remap is not None else self._positions
+        if not self._columns and not self._perms:
+            return set()
+
+        if remap is None:
+            fresh = []
+        else:
+            kept = set(remap)
+            fresh = [i for i in range(len(songs)) if i not in kept]
+        position = self._position_of
+        moved = [i for i in (position(song) for song in changed) if i is not None]
+
+        changed_columns = set()
+        for column, keys in self._columns.items():
+            if remap is not None:
+                carried = [None] * len(songs)
+                for i, j in enumerate(remap):
+                    if j >= 0:
+                        carried[j] = keys[i]
+                keys = self._columns[column] = carried
+            key = self.keys[column]
+            for i in fresh:
+                keys[i] = key(songs[i])
+            for i in moved:
+                value = key(songs[i])
+                if value != keys[i]:
+                    keys[i] = value
+                    changed_columns.add(column)
+
+        for spec, perm in list(self._perms.items()):
+            columns = [column for column, _ in spec]
+            if any(column not in self._columns for column in columns):
+                del self._perms[spec]  # Keys dropped by invalidate(); recomputed on demand
+                continue
+            resort = set(moved) if changed_columns.intersection(columns) else set()
+            if remap is not None:
+                perm = [remap[i] for i in perm if remap[i] >= 0 and remap[i] not in resort]
+            else:
+                for i in resort:
+                    perm.remove(i)
+            keys = [self._columns[column] for column in columns]
+            # Ties keep list order, as in order()
+            reverses = [reverse for _, reverse in spec] + [False]
+            spec_key = lambda i: _SpecKey([column_keys[i] for column_keys in keys] + [i], reverses)
+            for i in fresh + sorted(resort):
+                insort_left(perm, i, key=spec_key)
+            self._perms[spec] = perm
+        return changed_columns
+
+    def place(self, ordered, spec, moved=(), added=()):
+        """
+        ordered (a list sorted by spec, e.g. the filtered view) as a new list with
+        those of moved it holds shifted to where they sort now and added inserted,
+        after patch() has picked up their keys.
+        """
+        result = list(ordered)
+        present = []
+        for song in moved:
+            try:
+                # list.index matches by identity first, and filepaths tell songs apart
+                del result[result.index(song)]
+                present.append(song)
+            except ValueError:
+                pass  # Not in this view
+        keys = [self._column(column) for column, _ in spec]
+        reverses = [reverse for _, reverse in spec] + [False]
+        position = self._position_of
+
+        def spec_key(song):
+            i = position(song)
+            return _SpecKey([column_keys[i] for column_keys in keys] + [i], reverses)
+
+        for song in present + list(added):
+            insort_left(result, song, key=spec_key)
+        return result
+
+    def _position_of(self, song):
+        if self._positions is None:
+            self._positions = {id(s): i for i, s in enumerate(self._songs)}
+        return self._positions.get(id(song))
+
+    def invalidate(self, column):
+        self._columns.pop(column, None)
+        self._perms = {spec: perm for spec, perm in self._perms.items()
+                       if all(name != column for name, _ in spec)}
+
+    def order(self, spec):
+        """Every song, sorted by spec."""
+        spec = tuple(spec)
+        perm = self._perms.get(spec)
+        if perm is None:
+            flipped = self._perms.get(tuple((column, not reverse) for column, reverse in spec))
+            if flipped is not None:
+                perm = flipped[::-1]
+            else:
+                perm = list(range(len(self._songs)))
+                # Stable sorts from the least significant column up
+                for column, reverse in reversed(spec):
+                    perm.sort(key=self._column(column).__getitem__, reverse=reverse)
+            self._perms[spec] = perm
+        songs = self._songs
+        return [songs[i] for i in perm]
+
+    def sort(self, songs, spec):
+        """songs (a subset of the song list, e.g. a filtered view) sorted by spec."""
+        ordered = self.order(spec)
+        if songs is self._songs:
+            return ordered
+        keep = {id(song) for song in songs}
+        result = [song for song in ordered if id(song) in keep]
+        if len(result) != len(songs):
+            # Songs the index hasn't seen go last, in their given order
+            seen = {id(song) for song in result}
+            result.extend(song for song in songs if id(song) not in seen)
+        return result
+
+    def _column(self, column):
+        keys = self._columns.get(column)
+        if keys is None:
+            key = self.keys[column]
+            keys = self._columns[column] = [key(song) for song in self._songs]
+        return keys
@@ -0,0 +1,102 @@
+import os
+
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav')
+
+
+def is_hidden_dir(name):
+    """Dot-directories (e.g. .sunosync, the downloader's store) are not part of the library."""
+    return name.startswith('.')
+
+
+def change_key(st, inode=None):
+    """(size, mtime_ns, inode) identity used to decide whether a file must be re-read."""
+    return (st.st_size, st.st_mtime_ns, inode if inode is not None else st.st_ino)
+
+
+def song_change_key(song):
+    """The change key recorded on a cached song dict, or None for legacy entries."""
+    if song.get('mtime_ns') is None:
+        return None
+    return (song.get('filesize'), song.get('mtime_ns'), song.get('inode'))
+
+
+def walk_library(root, dir_cache, full=False, visited=None, failed=None):
+    """
+    Walk `root` with os.scandir, skipping directories whose mtime has not changed.
+
+    dir_cache maps directory path -> (mtime_ns, [subdirectory names]) from the last
+    walk and is updated in place. A directory's mtime changes whenever an entry is
+    added, removed or renamed in it, so an unchanged directory has the same files
+    as last time and is not listed again. In-place edits to a file do not touch the
+    directory mtime; callers that modify files must drop the directory from
+    dir_cache (or pass full=True) to have them re-read.
+
+    Yields (dirpath, files) for every directory reached:
+        files is None when the directory was skipped, otherwise a list of
+        (filepath, stat_result, inode, has_sidecar) for the audio files in it,
+        with stat results taken from the cached DirEntry data.
+
+    If `visited` is given, every directory path reached is added to it; directories
+    that could not be listed are added to `failed`.
+    """
+    if visited is None:
+        visited = set()
+    if failed is None:
+        failed = set()
+    try:
+        stack = [(root, os.stat(root))]
+    except OSError:
+        return
+
+    while stack:
+        dirpath, dir_stat = stack.pop()
+        visited.add(dirpath)
+        cached = dir_cache.get(dirpath)
+
+        if not full and cached and cached[0] == dir_stat.st_mtime_ns:
+            yield dirpath, None
+            for name in cached[1]:
+                subdir = os.path.join(dirpath, name)
+                try:
+                    stack.append((subdir, os.stat(subdir)))
+                except OSError:
+                    # Removing a subdirectory changes our mtime, so this is a race; relist next time
+                    dir_cache.pop(dirpath, None)
+            continue
+
+        names = set()
+        audio_entries = []
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    names.add(entry.name)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not is_hidden_dir(entry.name):
+                                subdirs.append((entry.name, entry.stat(follow_symlinks=False)))
+                        elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                            audio_entries.append(entry)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Error listing {dirpath}: {e}")
+            dir_cache.pop(dirpath, None)
+            failed.add(dirpath)
+            continue
+
+        files = []
+        for entry in audio_entries:
+            try:
+                st = entry.stat()
+                inode = entry.inode()
+            except OSError:
+                continue
+            sidecar = os.path.splitext(entry.name)[0] + ".txt"
+            files.append((entry.path, st, inode, sidecar in names))
+
+        dir_cache[dirpath] = (dir_stat.st_mtime_ns, [name for name, _ in subdirs])
+        yield dirpath, files
+        for name, sub_stat in subdirs:
+            stack.append((os.path.join(dirpath, name), sub_stat))
@@ -1,35 +1,81 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
-import json
 import threading
+import shutil
 import queue
 import time
-from suno_utils import read_song_metadata, save_lyrics_to_file, open_file
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from suno_utils import (read_song_metadata, read_song_metadata_batch, save_lyrics_to_file, open_file,
+                        create_tooltip, get_unique_filename)
+from library_cache import LibraryCache
+from library_index import SearchIndex, SortIndex, natural_key
+from song_registry import SongRegistry
+from text_index import TextIndexer
+from waveform import PeakIndexer
+from download_index import DownloadIndex
+from tag_store import TagStore
+from lyrics_store import LyricsStore
+from library_scanner import walk_library, change_key, song_change_key
+from library_watcher import LibraryWatcher
+from tk_dispatcher import TkDispatcher
 from theme_manager import ThemeManager
+from suno_widgets import VirtualTreeview
+
+# Songs per UI batch pushed through scan_queue
+SCAN_BATCH_SIZE = 20
+# Cached songs need no parsing, so they are handed over in larger batches
+CACHED_SCAN_BATCH_SIZE = 500
+# Below this many uncached files, starting worker processes costs more than it saves
+PARALLEL_SCAN_MIN_FILES = 64
+# Files handed to a worker process per task
+PARALLEL_SCAN_CHUNK = 32
+# Default cap on cached songs (config key "library_cache_max_entries")
+DEFAULT_CACHE_MAX_ENTRIES = 250000
+# Pause after the last keystroke before the search runs
+SEARCH_DEBOUNCE_MS = 150
+# Batches this large show their progress while they run
+BULK_PROGRESS_MIN = 20
+# Column headings (the tag column's is just the sort arrow)
+COLUMN_HEADINGS = {"tag": "", "title": "Title", "artist": "Artist",
+                   "duration": "Duration", "date": "Date", "size": "Size"}
+# Tag column sort order, ascending
+TAG_SORT_ORDER = {"star": 0, "keep": 1, None: 2, "trash": 3}
 
 
 class LibraryTab(tk.Frame):
     """Library tab for browsing and playing downloaded songs."""
     
-    def __init__(self, parent, config_manager, cache_file=None, tags_file=None, **kwargs):
+    def __init__(self, parent, config_manager, cache_file=None, tag_store=None, **kwargs):
         super().__init__(parent, **kwargs)
         
-        self.config_manager = config_manager
-        self.cache_file = cache_file
-        self.tags_file = tags_file
-        self.download_path = self.config_manager.get("path", "")
+        self._init_scan_state(config_manager, cache_file)
         self.all_songs = []  # Full song list
         self.filtered_songs = []  # Filtered by search
-        self.tags = {}
+        self.tags = tag_store if tag_store is not None else TagStore(None)  # shared with the player
         self.active_filters = {"keep": False, "trash": False, "star": False}
-        self._load_tags()
         
-        # Caching & Threading
-        self.cache = {}
-        self.scan_queue = queue.Queue()
-        self.is_scanning = False
-        self._load_cache()
+        # Live updates: filesystem watcher -> Tk thread
+        self.watcher = None
+        self.dispatcher = TkDispatcher(self)
+        self.view_songs = []  # songs the list shows: filtered_songs, or all_songs mid-scan
+        self.row_values = {}  # song filepath -> display tuple, formatted when first shown
+        self._pending_updates = []  # (updated, removed) that arrived mid-scan
+        self._bulk_running = False  # a delete/move/re-embed batch is in progress
+        self.search_index = SearchIndex()  # title/artist search over all_songs
+        self.registry = SongRegistry()  # path/UUID/view-position lookups, shared with the player
+        self._search_after = None
+        self.search_fulltext = False  # search lyrics/style/prompt instead of title/artist
+        self.search_snippets = {}  # filepath -> matched text, for full-text results
+        self.sort_spec = []  # [(column, reverse)], most significant first; [] = library order
+        self.sort_index = SortIndex({
+            "tag": lambda song: TAG_SORT_ORDER.get(self._song_tag(song), 2),
+            "title": lambda song: natural_key(song['title']),
+            "artist": lambda song: natural_key(song['artist']),
+            "duration": lambda song: song['duration'] or 0,
+            "date": lambda song: song['date'] or '',
+            "size": lambda song: song['filesize'] or 0,
+        })
         
         # Apply theme
         theme = ThemeManager()
@@ -43,6 +89,7 @@ class LibraryTab(tk.Frame):
         self.configure(bg=self.bg_dark)
         
         self.create_widgets()
+        self.tags.subscribe(self._on_tags_changed)
         self.refresh_library()
     
     def create_widgets(self):
@@ -60,12 +107,24 @@ class LibraryTab(tk.Frame):
                 font=("Segoe UI", 12)).pack(side=tk.LEFT, padx=(10, 5))
         
         self.search_var = tk.StringVar()
-        self.search_var.trace_add("write", self.on_search)
+        self.search_var.trace_add("write", self._on_search_typed)
         search_entry = tk.Entry(search_frame, textvariable=self.search_var,
                                bg=self.bg_card, fg=self.fg_primary,
                                font=("Segoe UI", 10), relief="flat", bd=0)
         search_entry.pack(side=tk.LEFT, fill="x", expand=True, padx=(0, 10), pady=8)
         
+        # Full-text toggle: search lyrics, style tags and prompts
+        self.fulltext_btn = tk.Button(search_frame, text="📝 Lyrics", command=self.toggle_fulltext,
+                                      bg=self.bg_card, fg=self.fg_secondary,
+                                      font=("Segoe UI", 9), relief="flat", cursor="hand2",
+                                      padx=8, pady=2)
+        self.fulltext_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        if self.text_index.available:
+            create_tooltip(self.fulltext_btn, "Search lyrics, style tags and prompts")
+        else:
+            self.fulltext_btn.config(state="disabled")
+            create_tooltip(self.fulltext_btn, "Full-text search needs SQLite with FTS5")
+        
         # Filter Buttons
         filter_frame = tk.Frame(toolbar, bg=self.bg_dark)
         filter_frame.pack(side=tk.LEFT, padx=10)
@@ -89,6 +148,8 @@ class LibraryTab(tk.Frame):
                                 relief="flat", cursor="hand2",
                                 padx=20, pady=8)
         self.refresh_btn.pack(side=tk.RIGHT)
+        self.refresh_btn.bind("<Shift-Button-1>", lambda e: self.refresh_library(full=True))
+        create_tooltip(self.refresh_btn, "Shift+Click to re-check every folder")
         
         # Open Folder button (Show in Explorer)
         open_btn = tk.Button(toolbar, text="📂 Show in Explorer", command=self.open_download_folder,
@@ -119,8 +180,13 @@ class LibraryTab(tk.Frame):
                                    fg=self.fg_secondary, font=("Segoe UI", 9), width=15, anchor="e")
         self.count_label.pack(side=tk.RIGHT, padx=10)
         
+        # Matched text of the selected song (full-text search only)
+        self.snippet_label = tk.Label(self, text="", bg=self.bg_dark, fg=self.fg_secondary,
+                                      font=("Segoe UI", 9, "italic"), anchor="w", justify="left")
+        
         # Treeview (file list)
         tree_frame = tk.Frame(self, bg=self.bg_dark)
+        self.tree_frame = tree_frame
         tree_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         # Create Treeview with custom styling
@@ -147,20 +213,18 @@ class LibraryTab(tk.Frame):
         h_scroll = ttk.Scrollbar(tree_frame, orient="horizontal")
         h_scroll.pack(side=tk.BOTTOM, fill="x")
         
-        # Treeview columns
-        self.tree = ttk.Treeview(tree_frame, style="Library.Treeview",
-                                columns=("tag", "title", "artist", "duration", "date", "size"),
-                                show="headings",
-                                yscrollcommand=v_scroll.set,
-                                xscrollcommand=h_scroll.set)
-        
-        # Column headings
-        self.tree.heading("tag", text="", command=lambda: self.sort_column("tag"))
-        self.tree.heading("title", text="Title", command=lambda: self.sort_column("title"))
-        self.tree.heading("artist", text="Artist", command=lambda: self.sort_column("artist"))
-        self.tree.heading("duration", text="Duration", command=lambda: self.sort_column("duration"))
-        self.tree.heading("date", text="Date", command=lambda: self.sort_column("date"))
-        self.tree.heading("size", text="Size", command=lambda: self.sort_column("size"))
+        # Treeview columns (only the visible rows exist; the list scrolls over view_songs)
+        self.song_list = VirtualTreeview(tree_frame, v_scroll, bg=self.bg_dark,
+                                         style="Library.Treeview",
+                                         columns=("tag", "title", "artist", "duration", "date", "size"),
+                                         show="headings",
+                                         xscrollcommand=h_scroll.set)
+        self.tree = self.song_list.tree
+        
+        # Column headings (click sorts, Shift+Click adds a secondary sort)
+        for col, text in COLUMN_HEADINGS.items():
+            self.tree.heading(col, text=text, command=lambda c=col: self.sort_column(c))
+        self.tree.bind("<Shift-Button-1>", self._on_heading_shift_click, add="+")
         
         # Column widths
         self.tree.column("tag", width=50, minwidth=50, anchor="center")
@@ -170,13 +234,12 @@ class LibraryTab(tk.Frame):
         self.tree.column("date", width=100, minwidth=80)
         self.tree.column("size", width=80, minwidth=60)
         
-        self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+        self.song_list.pack(side=tk.LEFT, fill="both", expand=True)
         
-        v_scroll.config(command=self.tree.yview)
         h_scroll.config(command=self.tree.xview)
         
         self.tree.bind("<Double-1>", self.on_double_click)
-        self.tree.bind("<<TreeviewSelect>>", self.on_selection_change)
+        self.song_list.bind("<<ListSelect>>", self.on_selection_change)
         
         # Right-click menu
         self.context_menu = tk.Menu(self, tearoff=0, bg=self.bg_card, fg=self.fg_primary)
@@ -184,111 +247,33 @@ class LibraryTab(tk.Frame):
         self.context_menu.add_command(label="View/Edit Lyrics", command=self.edit_lyrics)
         self.context_menu.add_command(label="Open Folder", command=self.open_folder)
         self.context_menu.add_separator()
-        self.context_menu.add_command(label="Delete", command=self.delete_selected)
+        # Everything below applies to the whole selection
+        tag_menu = tk.Menu(self.context_menu, tearoff=0, bg=self.bg_card, fg=self.fg_primary)
+        tag_menu.add_command(label="👍 Keep", accelerator="1", command=lambda: self.tag_selected("keep"))
+        tag_menu.add_command(label="⭐ Star", accelerator="2", command=lambda: self.tag_selected("star"))
+        tag_menu.add_command(label="🗑️ Trash", accelerator="3", command=lambda: self.tag_selected("trash"))
+        tag_menu.add_command(label="Clear Tag", accelerator="0", command=lambda: self.tag_selected(None))
+        self.context_menu.add_cascade(label="Tag", menu=tag_menu)
+        self.context_menu.add_command(label="Re-embed Lyrics", command=self.reembed_selected)
+        self.context_menu.add_command(label="Move to Folder...", command=self.move_selected)
+        self.context_menu.add_command(label="Delete", accelerator="Del", command=self.delete_selected)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Find Duplicate Songs", command=self.find_duplicates)
+        self.context_menu.add_command(label="Compact Library Cache", command=self.compact_cache)
         
         self.tree.bind("<Button-3>", self.show_context_menu)
+        # Triage keys: tag or delete the whole selection
+        for key, tag in (("1", "keep"), ("2", "star"), ("3", "trash"), ("0", None)):
+            self.tree.bind(f"<Key-{key}>", lambda e, t=tag: self.tag_selected(t))
+        self.tree.bind("<Delete>", lambda e: self.delete_selected())
         
         # Reference to player widget (set by main.py)
         self.player_widget = None
 
-    def _load_tags(self):
-        """Load tags from file."""
-        if self.tags_file and os.path.exists(self.tags_file):
-            try:
-                with open(self.tags_file, 'r', encoding='utf-8') as f:
-                    self.tags = json.load(f)
-            except:
-                self.tags = {}
-    
-    def reload_tags(self):
-        """Reload tags and update UI."""
-        try:
-            # Check if tree exists and is ready
-            if not hasattr(self, 'tree') or not self.tree:
-                return
-            
-            # Preserve current selection before rebuilding tree
-            selected_filepath = None
-            selection = self.tree.selection()
-            if selection:
-                item = selection[0]
-                selected_filepath = self.tree.item(item)['tags'][0]
-                if selected_filepath:
-                    selected_filepath = os.path.normpath(selected_filepath)
-            
-            # Reload tags from file
-            self._load_tags()
-            
-            # Re-apply filters to update the view (this rebuilds the tree)
-            self.on_search()
-            
-            # Restore selection after tree rebuild
-            if selected_filepath:
-                # Use after() to ensure tree is fully updated before restoring selection
-                self.after(50, lambda: self._restore_selection(selected_filepath))
-        except Exception as e:
-            print(f"Error in reload_tags: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    def _restore_selection(self, filepath):
-        """Restore selection to the specified filepath."""
-        try:
-            if not filepath:
-                return
-            
-            # Normalize filepath for comparison
-            filepath = os.path.normpath(filepath)
-            filepath_alt = filepath.replace('\\', '/')
-            
-            # Find and select the item
-            for item in self.tree.get_children():
-                try:
-                    item_tags = self.tree.item(item, "tags")
-                    if item_tags and len(item_tags) > 0:
-                        item_filepath = os.path.normpath(item_tags[0])
-                        item_filepath_alt = item_filepath.replace('\\', '/')
-                        
-                        if item_filepath == filepath or item_filepath == filepath_alt or \
-                           item_filepath_alt == filepath or item_filepath_alt == filepath_alt:
-                            self.tree.selection_set(item)
-                            self.tree.see(item)
-                            # Update player tag UI now that selection is restored
-                            if self.player_widget:
-                                self.player_widget.update_tag_ui()
-                            return
-                except tk.TclError:
-                    continue
-        except Exception as e:
-            print(f"Error in _restore_selection: {e}")
-
     def _get_tag_icon(self, song):
         """Get icon for song tag."""
         try:
-            uuid = song.get('id')
-            if not uuid:
-                # Normalize filepath for consistent lookup
-                filepath = song.get('filepath', '')
-                if not filepath:
-                    return ""
-                uuid = os.path.normpath(filepath)
-            
-            if not uuid:
-                return ""
-            
-            # Try lookup with UUID first
-            tag = self.tags.get(uuid)
-            
-            # If not found and UUID is a filepath, try with forward slashes (for compatibility)
-            if not tag and uuid and os.path.sep in uuid:
-                uuid_alt = uuid.replace('\\', '/')
-                tag = self.tags.get(uuid_alt)
-                if tag:
-                    # Update the tags dict to use normalized path for future lookups
-                    self.tags[uuid] = tag
-                    if uuid_alt in self.tags:
-                        del self.tags[uuid_alt]
-            
+            tag = self._song_tag(song)
             if tag == "keep": return "👍"
             if tag == "trash": return "🗑️"
             if tag == "star": return "⭐"
@@ -297,74 +282,294 @@ class LibraryTab(tk.Frame):
             print(f"Error in _get_tag_icon: {e}")
             return ""
 
+    def _init_scan_state(self, config_manager, cache_file):
+        """
+        Everything the scan thread uses, none of it Tk. Kept out of __init__ so
+        bench_library.py can drive the scan code without a display.
+        """
+        self.config_manager = config_manager
+        self.cache_file = cache_file
+        self.download_path = self.config_manager.get("path", "")
+        
+        # Caching & Threading
+        self.cache = {}  # filepath -> song row (no lyrics), mirrored in cache_db
+        self.cache_db = None
+        self.dir_cache = {}  # dirpath -> (mtime_ns, [subdir names]) from the last scan
+        self.cache_max_entries = self.config_manager.get("library_cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES)
+        self.scan_queue = queue.Queue()
+        self.is_scanning = False
+        self._load_cache()
+
     def _load_cache(self):
-        """Load metadata cache from file."""
-        if self.cache_file and os.path.exists(self.cache_file):
+        """Open the metadata cache database and load its rows."""
+        if self.cache_file:
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.cache = json.load(f)
+                self.cache_db = LibraryCache(self.cache_file)
+                self.cache = self.cache_db.load_all()
+                self.dir_cache = self.cache_db.load_dirs()
             except Exception as e:
                 print(f"Error loading cache: {e}")
+                self.cache_db = None
                 self.cache = {}
+                self.dir_cache = {}
+        self.lyrics = LyricsStore(self.cache_db)
+        self.text_index = TextIndexer(self.cache_db)
+        self.peaks = PeakIndexer(self.cache_db)  # waveforms for the player's seek bar
 
-    def _save_cache(self):
-        """Save metadata cache to file."""
-        if self.cache_file:
+    def _save_cache(self, songs):
+        """Upsert changed songs into the metadata cache database."""
+        if self.cache_db:
             try:
-                with open(self.cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.cache, f)
+                self.cache_db.upsert_many(songs)
             except Exception as e:
                 print(f"Error saving cache: {e}")
 
-    def _scan_thread(self):
-        """Background thread to scan library."""
+    def _scan_thread(self, full=False):
+        """
+        Background thread to scan library.
+        Directories unchanged since the last scan are served straight from the cache;
+        full=True lists and stats every directory regardless.
+        """
         new_songs = []
-        cache_updated = False
+        uncached = []  # (filepath, stat_result, inode, has_sidecar) of files that need parsing
+        cached_by_dir = None
+        seen = set()  # every audio file this scan found, for pruning the cache afterwards
+        visited = set()
+        failed = set()
+        
+        def emit(song_data):
+            nonlocal new_songs
+            seen.add(song_data['filepath'])
+            new_songs.append(song_data)
+            if len(new_songs) >= CACHED_SCAN_BATCH_SIZE:
+                self.scan_queue.put(("batch", new_songs))
+                new_songs = []
+                time.sleep(0) # Yield the GIL to the Tk thread
         
         try:
-            for root, dirs, files in os.walk(self.download_path):
-                for file in files:
-                    if file.lower().endswith(('.mp3', '.wav')):
-                        filepath = os.path.join(root, file)
-                        try:
-                            mtime = os.path.getmtime(filepath)
-                            
-                            # Check cache
-                            cached_data = self.cache.get(filepath)
-                            if cached_data and cached_data.get('mtime') == mtime:
-                                song_data = cached_data
-                            else:
-                                # Parse file
-                                song_data = read_song_metadata(filepath)
-                                if song_data:
-                                    song_data['mtime'] = mtime
-                                    self.cache[filepath] = song_data
-                                    cache_updated = True
-                            
-                            if song_data:
-                                new_songs.append(song_data)
-                                
-                                # Batch update UI every 20 songs
-                                if len(new_songs) >= 20:
-                                    self.scan_queue.put(("batch", list(new_songs)))
-                                    new_songs = []
-                                    time.sleep(0.01) # Yield
-                        except Exception as e:
-                            print(f"Error processing {file}: {e}")
+            dirs_before = dict(self.dir_cache)
+            for dirpath, files in walk_library(self.download_path, self.dir_cache, full=full,
+                                               visited=visited, failed=failed):
+                if files is None:
+                    # Directory unchanged: same files as last scan
+                    if cached_by_dir is None:
+                        cached_by_dir = {}
+                        for song_data in self.cache.values():
+                            cached_by_dir.setdefault(os.path.dirname(song_data['filepath']), []).append(song_data)
+                    for song_data in cached_by_dir.get(dirpath, ()):
+                        emit(song_data)
+                    continue
+                
+                for entry in files:
+                    filepath, st, inode, has_sidecar = entry
+                    cached_data = self.cache.get(filepath)
+                    if cached_data and song_change_key(cached_data) == change_key(st, inode):
+                        emit(cached_data)
+                    else:
+                        seen.add(filepath)
+                        uncached.append(entry)
                                 
-            # Final batch
+            # Final batch of cached songs
             if new_songs:
                 self.scan_queue.put(("batch", new_songs))
-                
-            self.scan_queue.put(("done", None))
             
-            if cache_updated:
-                self._save_cache()
+            # Parse cache misses, streaming results as they complete
+            for songs in self._parse_uncached(uncached):
+                for song_data in songs:
+                    self.cache[song_data['filepath']] = song_data
+                self._save_cache(songs)
+                self.scan_queue.put(("batch", songs))
+            
+            self._prune_cache(seen, visited, failed)
+            self._save_dir_cache(dirs_before)
+            self.scan_queue.put(("done", None))
                 
         except Exception as e:
             print(f"Scan error: {e}")
             self.scan_queue.put(("done", None))
 
+    def _parse_uncached(self, uncached):
+        """
+        Parse metadata for files missing from the cache.
+        Yields lists of song dicts (with change keys set) in completion order.
+        Large first scans are fanned out to a process pool so mutagen parsing
+        uses every core instead of contending for the GIL with the Tk thread.
+        """
+        keys = {filepath: change_key(st, inode) for filepath, st, inode, _ in uncached}
+        items = [(filepath, st, has_sidecar) for filepath, st, _, has_sidecar in uncached]
+        
+        def with_keys(songs):
+            for song_data in songs:
+                _, song_data['mtime_ns'], song_data['inode'] = keys[song_data['filepath']]
+            return songs
+        
+        remaining = items
+        if len(items) >= PARALLEL_SCAN_MIN_FILES:
+            chunks = [items[i:i + PARALLEL_SCAN_CHUNK]
+                      for i in range(0, len(items), PARALLEL_SCAN_CHUNK)]
+            done = set()
+            try:
+                with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+                    futures = {executor.submit(read_song_metadata_batch, chunk): i
+                               for i, chunk in enumerate(chunks)}
+                    for future in as_completed(futures):
+                        songs = future.result()
+                        done.add(futures[future])
+                        yield with_keys(songs)
+                remaining = []
+            except Exception as e:
+                # Pool could not start or a worker died; finish the rest in this thread
+                print(f"Parallel scan unavailable, falling back to serial: {e}")
+                remaining = [item for i, chunk in enumerate(chunks) if i not in done
+                             for item in chunk]
+        
+        for i in range(0, len(remaining), SCAN_BATCH_SIZE):
+            yield with_keys(read_song_metadata_batch(remaining[i:i + SCAN_BATCH_SIZE]))
+
+    def _prune_cache(self, seen, visited, failed):
+        """
+        Drop cache entries for files a completed scan did not find (deleted, moved,
+        renamed or outside the current library folder) in one bulk delete, then
+        enforce the entry cap. Entries under folders that failed to list are kept.
+        """
+        failed_prefixes = tuple(os.path.join(path, '') for path in failed)
+        missing = [filepath for filepath in self.cache
+                   if filepath not in seen and not (failed_prefixes and filepath.startswith(failed_prefixes))]
+        for filepath in missing:
+            del self.cache[filepath]
+        missing.extend(self._evict_over_cap())
+        
+        for path in [path for path in self.dir_cache if path not in visited]:
+            del self.dir_cache[path]
+        
+        if missing and self.cache_db:
+            try:
+                self.cache_db.delete_many(missing)
+            except Exception as e:
+                print(f"Error pruning cache: {e}")
+        return missing
+
+    def _evict_over_cap(self):
+        """
+        Drop the oldest songs once the cache holds more than cache_max_entries.
+        Evicted songs still show in the library; they are just re-read on each scan.
+        Their folders are forgotten too, or the next scan would serve those folders
+        from the cache and miss them.
+        """
+        excess = len(self.cache) - self.cache_max_entries
+        if excess <= 0:
+            return []
+        oldest = sorted(self.cache.values(), key=lambda x: x.get('date') or '')[:excess]
+        evicted = [song_data['filepath'] for song_data in oldest]
+        for filepath in evicted:
+            del self.cache[filepath]
+        dirs = {os.path.normpath(os.path.dirname(filepath)) for filepath in evicted}
+        stale = [path for path in self.dir_cache if os.path.normpath(path) in dirs]
+        for path in stale:
+            del self.dir_cache[path]
+        if stale and self.cache_db:
+            try:
+                self.cache_db.delete_dirs(stale)
+            except Exception as e:
+                print(f"Error saving directory cache: {e}")
+        return evicted
+
+    def compact_cache(self):
+        """Remove cache entries for files that no longer exist and shrink the cache database."""
+        if self.is_scanning or not self.cache_db:
+            return
+        
+        self.config(cursor="watch")
+        self.update_idletasks()
+        try:
+            size_before = self.cache_db.disk_size()
+            missing = [filepath for filepath in self.cache if not os.path.exists(filepath)]
+            for filepath in missing:
+                del self.cache[filepath]
+            missing.extend(self._evict_over_cap())
+            stale_dirs = [path for path in self.dir_cache if not os.path.isdir(path)]
+            for path in stale_dirs:
+                del self.dir_cache[path]
+            
+            self.cache_db.delete_many(missing)
+            self.cache_db.delete_dirs(stale_dirs)
+            self.cache_db.prune_peaks()
+            self.cache_db.vacuum()
+            size_after = self.cache_db.disk_size()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to compact cache:\n{e}")
+            return
+        finally:
+            self.config(cursor="")
+        
+        messagebox.showinfo("Cache Compacted",
+            f"Removed {len(missing)} stale entries.\n"
+            f"{len(self.cache)} songs cached, "
+            f"{self.format_size(size_before)} → {self.format_size(size_after)}")
+
+    def find_duplicates(self):
+        """
+        Report songs whose audio is identical (from the hashes the downloader stored)
+        and offer to list them with the extra copies selected, ready to delete.
+        """
+        try:
+            index = DownloadIndex.open_existing(self.download_path)
+            groups = index.duplicates() if index else []
+            if index:
+                index.close()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read the download index:\n{e}")
+            return
+        groups = [[song for song in map(self.registry.get, group) if song] for group in groups]
+        groups = [group for group in groups if len(group) > 1]
+        if not groups:
+            messagebox.showinfo("No Duplicates", "No downloaded songs have identical audio.")
+            return
+        
+        extras = [song for group in groups for song in group[1:]]
+        # Hard links to the first song's file (how older downloads shared audio) take no space
+        wasted = sum(song.get('filesize') or 0 for group in groups for song in group[1:]
+                     if not song.get('inode') or song.get('inode') != group[0].get('inode'))
+        lines = [" = ".join(os.path.basename(song['filepath']) for song in group) for group in groups[:10]]
+        if len(groups) > 10:
+            lines.append(f"... and {len(groups) - 10} more")
+        if not messagebox.askyesno("Duplicate Songs",
+                f"{len(groups)} songs have identical copies ({len(extras)} extra entries, "
+                f"{self.format_size(wasted)} on disk):\n\n" + "\n".join(lines) +
+                "\n\nList them with the extra copies selected?"):
+            return
+        
+        # Each song followed by its copies (oldest download first); typing a search restores the list
+        self.filtered_songs = [song for group in groups for song in group]
+        self.update_tree()
+        selected = [self.registry.view_index(song['filepath']) for song in extras]
+        selected = [i for i in selected if i is not None]
+        self.song_list.set_rows(len(self.view_songs), self._row_at, selected=selected,
+                                cursor=selected[0] if selected else None)
+        self.count_label.config(text=f"{len(extras)} duplicate copies selected")
+
+    def _save_dir_cache(self, dirs_before):
+        """Persist directory states that changed during a scan."""
+        if not self.cache_db:
+            return
+        changed = {path: state for path, state in self.dir_cache.items()
+                   if dirs_before.get(path) != state}
+        dropped = [path for path in dirs_before if path not in self.dir_cache]
+        try:
+            self.cache_db.save_dirs(changed)
+            self.cache_db.delete_dirs(dropped)
+        except Exception as e:
+            print(f"Error saving directory cache: {e}")
+
+    def _mark_dir_dirty(self, dirpath):
+        """Make the next scan list `dirpath` again (after we modified files in place)."""
+        dirpath = os.path.normpath(dirpath)
+        stale = [path for path in self.dir_cache if os.path.normpath(path) == dirpath]
+        for path in stale:
+            del self.dir_cache[path]
+        if self.cache_db:
+            self.cache_db.delete_dirs(stale)
+
     def _process_scan_queue(self):
         """Process updates from scan thread."""
         try:
@@ -374,7 +579,9 @@ class LibraryTab(tk.Frame):
                 
                 if msg_type == "batch":
                     self.all_songs.extend(data)
-                    self._add_songs_to_tree(data)
+                    self.search_index.add(data)
+                    self.registry.add(data)
+                    self._show_songs(self.all_songs)
                     self.count_label.config(text=f"{len(self.all_songs)} songs")
                     
                 elif msg_type == "done":
@@ -382,8 +589,14 @@ class LibraryTab(tk.Frame):
                     self.refresh_btn.config(state="normal", text="🔄 Refresh")
                     # Final sort
                     self.all_songs.sort(key=lambda x: x['date'], reverse=True)
-                    self.filtered_songs = self.all_songs.copy()
-                    self.update_tree()
+                    self.sort_index.reset(self.all_songs)
+                    self.on_search()
+                    self._start_watcher()
+                    self.text_index.refresh()
+                    self.peaks.refresh()
+                    pending, self._pending_updates = self._pending_updates, []
+                    for updated, removed in pending:
+                        self._apply_song_updates(updated, removed)
                     return # Stop processing
             except queue.Empty:
                 pass
@@ -394,35 +607,63 @@ class LibraryTab(tk.Frame):
         if self.is_scanning or not self.scan_queue.empty():
             self.after(10, self._process_scan_queue)
 
-    def _add_songs_to_tree(self, songs):
-        """Add a batch of songs to the treeview."""
-        try:
-            for song in songs:
-                duration_str = self.format_duration(song['duration'])
-                size_str = self.format_size(song['filesize'])
-                tag_icon = self._get_tag_icon(song)
-                
-                self.tree.insert("", "end", values=(
-                    tag_icon,
-                    song['title'],
-                    song['artist'],
-                    duration_str,
-                    song['date'],
-                    size_str
-                ), tags=(song['filepath'].replace('\\', '/'),))
-        except Exception as e:
-            print(f"Tree insert error: {e}")
+    def _song_values(self, song):
+        """Treeview column values for a song."""
+        return (
+            self._get_tag_icon(song),
+            song['title'],
+            song['artist'],
+            self.format_duration(song['duration']),
+            song['date'],
+            self.format_size(song['filesize'])
+        )
+
+    def _row_at(self, index):
+        """(values, tags) for row `index` of the list; the display tuple is formatted once per song."""
+        song = self.view_songs[index]
+        values = self.row_values.get(song['filepath'])
+        if values is None:
+            values = self.row_values[song['filepath']] = self._song_values(song)
+        return values, ()
+
+    def _show_songs(self, songs):
+        """Point the list at `songs`, keeping selected songs selected if they are still listed."""
+        selected = self.song_list.selected_indexes()
+        cursor = self.song_list.selected_index()
+        if selected and songs is not self.view_songs:
+            # A new list (filter/sort) moves the songs; an appended-to list keeps positions
+            filepaths = [self.view_songs[i]['filepath'] for i in selected if i < len(self.view_songs)]
+            cursor_path = self.view_songs[cursor]['filepath'] if cursor < len(self.view_songs) else None
+            self.registry.set_view(songs)
+            selected = [self.registry.view_index(filepath) for filepath in filepaths]
+            selected = [i for i in selected if i is not None]
+            cursor = self.registry.view_index(cursor_path)
+        else:
+            self.registry.set_view(songs)
+        self.view_songs = songs
+        self.song_list.set_rows(len(songs), self._row_at, selected=selected, cursor=cursor)
 
-    def refresh_library(self):
-        """Scan download folder and populate tree."""
+    def _clear_tree(self):
+        """Empty the list and forget formatted rows."""
+        self.row_values = {}
+        self.song_list.set_rows(0, self._row_at)
+        self.view_songs = []
+        self.registry.set_view(self.view_songs)
+
+    def refresh_library(self, full=False):
+        """Scan download folder and populate tree. full=True re-checks unchanged folders too."""
         if self.is_scanning:
             return
+        self._stop_watcher()
             
         # Clear current
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._clear_tree()
         
         self.all_songs = []
+        self.filtered_songs = []
+        self.search_index.clear()
+        self.registry.clear()
+        self.sort_index.reset(self.all_songs)
         
         # Update path from config
         self.download_path = self.config_manager.get("path", "")
@@ -436,19 +677,170 @@ class LibraryTab(tk.Frame):
         self.refresh_btn.config(state="disabled", text="Scanning...")
         self.count_label.config(text="Scanning...")
         
-        threading.Thread(target=self._scan_thread, daemon=True).start()
+        threading.Thread(target=self._scan_thread, args=(full,), daemon=True).start()
         self._process_scan_queue()
     
-    def update_tree(self):
-        """Update treeview with filtered songs."""
-        # Clear existing
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    # --- Live updates ---
+
+    def _start_watcher(self):
+        """Watch the library folder so changes patch the list instead of forcing a rescan."""
+        self._stop_watcher()
+        if not self.download_path or not os.path.isdir(self.download_path):
+            return
+        try:
+            self.watcher = LibraryWatcher(self.download_path, self._on_fs_changes)
+            self.watcher.start()
+        except Exception as e:
+            print(f"Library watcher unavailable: {e}")
+            self.watcher = None
+
+    def _stop_watcher(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def is_watching(self):
+        """True while the library is kept live by the filesystem watcher."""
+        return bool(self.watcher and self.watcher.is_alive())
+
+    def add_downloaded_song(self, record):
+        """
+        Take a just-downloaded song straight into the library. Safe to call from the
+        download thread. `record` is a complete song dict (see SunoDownloader.song_saved),
+        so the file is not read back.
+        """
+        self.dispatcher.post(self._apply_song_updates, [record], [])
+
+    def sync_after_download(self):
+        """Bring the library up to date after a download run."""
+        if not self.is_watching():
+            self.refresh_library()
+
+    def _on_fs_changes(self, changed, removed, rescan):
+        """Watcher thread: re-read changed files, then hand the results to the Tk thread."""
+        if rescan:
+            self.dispatcher.post(self.refresh_library, key="rescan")
+            return
+        updated = []
+        for filepath in changed:
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue  # Gone again before we got to it
+            cached_data = self.cache.get(filepath)
+            if cached_data and song_change_key(cached_data) == change_key(st):
+                continue  # Already up to date (e.g. we wrote it ourselves)
+            song_data = read_song_metadata(filepath, st, include_lyrics=False)
+            _, song_data['mtime_ns'], song_data['inode'] = change_key(st)
+            updated.append(song_data)
+        if updated or removed:
+            self.dispatcher.post(self._apply_song_updates, updated, removed)
+
+    def _apply_song_updates(self, updated, removed):
+        """
+        Patch the song list, cache and tree with re-read songs and removed paths.
+        A removed path may be a file or a folder (everything under it is dropped).
+        """
+        if self.is_scanning:
+            # The scan may already be past these folders; apply once it is done
+            self._pending_updates.append((updated, removed))
+            return
         
-        # Add songs
-        self._add_songs_to_tree(self.filtered_songs)
+        # Removals: each path is a listed song, else possibly a folder of them
+        gone = []
+        gone_paths = set()
+        for path in removed:
+            song = self.registry.get(path)
+            if song is not None:
+                gone.append(song)
+            else:
+                gone.extend(self.registry.under(path))
+                gone_paths.add(path)  # may still be in the cache
+        gone_paths.update(song['filepath'] for song in gone)
+        
+        # Re-read songs replace the listed ones in place (the player may hold them);
+        # new files go to the top (newest first)
+        changed = []
+        added = []
+        for song in updated:
+            existing = self.registry.get(song['filepath'])
+            if existing is not None:
+                existing.clear()
+                existing.update(song)
+                changed.append(existing)
+            else:
+                added.append(song)
+        updated = changed + added
+        gone_paths.difference_update(song['filepath'] for song in updated)
+        gone_ids = {id(song) for song in gone if song['filepath'] in gone_paths}
+        
+        # Lists are only rebuilt when songs come or go. Rebind rather than mutate:
+        # the player may hold filtered_songs as its playlist
+        if added or gone_ids:
+            self.all_songs = added + [song for song in self.all_songs if id(song) not in gone_ids]
+        query = self.search_var.get().lower()
+        active_tags = [t for t, active in self.active_filters.items() if active]
+        if query and self.search_fulltext:
+            shown = []  # Not in the text index yet; the next search ranks them
+        else:
+            shown = [song for song in added if self._matches_filters(song, query, active_tags)]
+        filtered = self.filtered_songs
+        if gone_ids:
+            filtered = [song for song in filtered if id(song) not in gone_ids]
+        changed_columns = self.sort_index.patch(self.all_songs, changed)
+        # Re-read songs only move if a column the list is sorted on changed
+        moved = changed if changed_columns & {column for column, _ in self.sort_spec} else []
+        if self.sort_spec and (shown or moved):
+            filtered = self.sort_index.place(filtered, self.sort_spec, moved=moved, added=shown)
+        elif shown:
+            filtered = shown + filtered
+        self.filtered_songs = filtered
+        
+        # Cache
+        for filepath in gone_paths:
+            self.cache.pop(filepath, None)
+        for song in updated:
+            self.cache[song['filepath']] = song
+        self.search_index.remove(gone_paths)
+        self.search_index.add(updated)
+        self.registry.remove(gone_paths)
+        self.registry.add(updated)
+        if self.cache_db:
+            try:
+                self.cache_db.delete_many(gone_paths)
+            except Exception as e:
+                print(f"Error pruning cache: {e}")
+        self._save_cache(updated)
+        self.text_index.update(song['filepath'] for song in updated)
+        self.peaks.queue([song['filepath'] for song in updated])
+        for song in updated:
+            # Lyrics (e.g. from a download hand-off) now live in the lyrics store only
+            song.pop('lyrics', None)
+            song.pop('sidecar_mtime_ns', None)
+        
+        # List: drop stale display tuples, then show the patched list
+        for filepath in gone_paths:
+            self.row_values.pop(filepath, None)
+        for song in changed:
+            self.row_values.pop(song['filepath'], None)
+        self.update_tree()
+
+    def destroy(self):
+        self.tags.unsubscribe(self._on_tags_changed)
+        self._stop_watcher()
+        self.text_index.close()
+        self.peaks.close()
+        self.dispatcher.close()
+        super().destroy()
+
+    def update_tree(self):
+        """
+        Show filtered_songs in order. Only the rows on screen exist in the Treeview
+        and each song's display tuple is formatted once, so sorting and filtering
+        cost the same for 100 songs as for 100k.
+        """
+        self._show_songs(self.filtered_songs)
     
-        # self.update_tree()
         self.count_label.config(text=f"{len(self.filtered_songs)} / {len(self.all_songs)} songs")
 
     def toggle_filter(self, tag, color):
@@ -465,78 +857,141 @@ class LibraryTab(tk.Frame):
         # Re-apply filters
         self.on_search()
 
+    def toggle_fulltext(self):
+        """Switch the search box between title/artist and lyrics/style/prompt search."""
+        self.search_fulltext = not self.search_fulltext
+        if self.search_fulltext:
+            self.fulltext_btn.config(bg=self.accent_purple, fg="white")
+            self.snippet_label.pack(fill="x", padx=20, pady=(0, 5), before=self.tree_frame)
+            # Show results by relevance until a column is clicked
+            self.sort_spec = []
+            self._update_sort_headings()
+        else:
+            self.fulltext_btn.config(bg=self.bg_card, fg=self.fg_secondary)
+            self.snippet_label.pack_forget()
+        self.on_search()
+
+    def _update_snippet(self):
+        """Show why the selected song matched a full-text search."""
+        if not self.search_fulltext:
+            return
+        snippet = self.search_snippets.get(self.get_selected_filepath() or "", "")
+        self.snippet_label.config(text=" / ".join(line for line in snippet.splitlines() if line.strip()))
+
+    def _song_tag(self, song):
+        """Tag of a song, looked up by UUID or normalized filepath."""
+        # Get UUID for tag lookup (normalize filepath for consistency)
+        uuid = song.get('id')
+        if not uuid:
+            uuid = os.path.normpath(song.get('filepath', ''))
+        return self.tags.lookup(uuid)
+
+    def _on_tags_changed(self, keys):
+        """Repaint the rows of songs whose tag changed (TagStore subscriber)."""
+        for key in keys:
+            song = self.registry.by_uuid(key) or self.registry.get(key)
+            if song:
+                self.row_values.pop(song['filepath'], None)
+        self.sort_index.invalidate("tag")
+        if any(self.active_filters.values()):
+            # A tag filter may now hide or show these songs
+            self.on_search()
+        else:
+            self.song_list.refresh()
+
+    def _matches_filters(self, song, query, active_tags):
+        """Whether a song passes the active tag filters and search query."""
+        if active_tags and self._song_tag(song) not in active_tags:
+            return False
+        if query and query not in song['title'].lower() and query not in song['artist'].lower():
+            return False
+        return True
+
+    def _on_search_typed(self, *args):
+        """Run the search once typing pauses rather than on every keystroke."""
+        if self._search_after:
+            self.after_cancel(self._search_after)
+        self._search_after = self.after(SEARCH_DEBOUNCE_MS, self.on_search)
+
     def on_search(self, *args):
         """Filter songs by search query and tags."""
+        if self._search_after:
+            self.after_cancel(self._search_after)
+            self._search_after = None
         query = self.search_var.get().lower()
         
-        # Start with all songs
-        candidates = self.all_songs
-        
-        # 1. Apply Tag Filters
-        # If any filter is active, we only show songs that match AT LEAST ONE of the active filters
-        # OR should it be AND? Usually filters are AND, but for tags like "Liked" and "Trash" they are mutually exclusive usually.
-        # Let's assume OR for now if multiple selected, but usually user selects one.
-        # Actually, let's do: if any filter is active, song must have one of the active tags.
-        
+        # If any filter is active, song must have one of the active tags.
         active_tags = [t for t, active in self.active_filters.items() if active]
         
+        candidates = self.all_songs
+        self.search_snippets = {}
+        if query and self.search_fulltext:
+            # Ranked: best match first
+            results = self.text_index.search(query)
+            self.search_snippets = dict(results)
+            candidates = [song for song in (self.registry.get(filepath) for filepath, _ in results) if song]
+        elif query:
+            matches = self.search_index.search(query)
+            candidates = [song for song in candidates if song['filepath'] in matches]
         if active_tags:
-            filtered_by_tags = []
-            for song in candidates:
-                # Get UUID for tag lookup (normalize filepath for consistency)
-                uuid = song.get('id')
-                if not uuid:
-                    uuid = os.path.normpath(song.get('filepath', ''))
-                
-                # Look up tag (try normalized path first, then forward slashes)
-                tag = self.tags.get(uuid)
-                if not tag and uuid and os.path.sep in uuid:
-                    uuid_alt = uuid.replace('\\', '/')
-                    tag = self.tags.get(uuid_alt)
-                
-                if tag in active_tags:
-                    filtered_by_tags.append(song)
-            candidates = filtered_by_tags
-            
-        # 2. Apply Search Query
-        if query:
-            self.filtered_songs = [
-                song for song in candidates
-                if query in song['title'].lower() or query in song['artist'].lower()
-            ]
-        else:
-            self.filtered_songs = list(candidates)
+            candidates = [song for song in candidates if self._song_tag(song) in active_tags]
+        if self.sort_spec:
+            # Full-text results stay ranked by relevance unless a column sort is chosen
+            candidates = self.sort_index.sort(candidates, self.sort_spec)
+        self.filtered_songs = list(candidates)
         
         self.update_tree()
         self.count_label.config(text=f"{len(self.filtered_songs)} / {len(self.all_songs)} songs")
+        self._update_snippet()
     
-    def sort_column(self, col):
-        """Sort tree by column."""
-        # Toggle sort order
-        if not hasattr(self, 'sort_reverse'):
-            self.sort_reverse = {}
-        
-        reverse = self.sort_reverse.get(col, False)
-        self.sort_reverse[col] = not reverse
-        
-        # Sort
-        if col == "duration":
-            self.filtered_songs.sort(key=lambda x: x['duration'], reverse=reverse)
-        elif col == "size":
-            self.filtered_songs.sort(key=lambda x: x['filesize'], reverse=reverse)
-        elif col == "title":
-            self.filtered_songs.sort(key=lambda x: x['title'], reverse=reverse)
-        elif col == "artist":
-            self.filtered_songs.sort(key=lambda x: x['artist'], reverse=reverse)
-        elif col == "date":
-            self.filtered_songs.sort(key=lambda x: x['date'], reverse=reverse)
+    def sort_column(self, col, add=False):
+        """
+        Sort by column; clicking the sorted column again flips its direction.
+        add=True (Shift+Click) adds col as the next tie-breaker instead, or flips it
+        if it is already part of the sort.
+        """
+        columns = [name for name, _ in self.sort_spec]
+        if col in columns and (add or columns == [col]):
+            i = columns.index(col)
+            self.sort_spec[i] = (col, not self.sort_spec[i][1])
+        elif add:
+            self.sort_spec.append((col, False))
+        else:
+            self.sort_spec = [(col, False)]
+        self._update_sort_headings()
         
+        self.filtered_songs = self.sort_index.sort(self.filtered_songs, self.sort_spec)
         self.update_tree()
+
+    def _on_heading_shift_click(self, event):
+        """Shift+Click on a column heading adds it to the sort."""
+        if self.tree.identify_region(event.x, event.y) != "heading":
+            return None
+        column = self.tree.identify_column(event.x)  # "#1", "#2", ...
+        columns = self.tree["columns"]
+        try:
+            col = columns[int(column.lstrip("#")) - 1]
+        except (ValueError, IndexError):
+            return None
+        self.sort_column(col, add=True)
+        return "break"
+
+    def _update_sort_headings(self):
+        """Show each sorted column's direction (and its place in a multi-column sort)."""
+        position = {col: (i, reverse) for i, (col, reverse) in enumerate(self.sort_spec)}
+        for col, text in COLUMN_HEADINGS.items():
+            if col in position:
+                i, reverse = position[col]
+                arrow = "▼" if reverse else "▲"
+                suffix = str(i + 1) if len(self.sort_spec) > 1 else ""
+                text = f"{text} {arrow}{suffix}".strip()
+            self.tree.heading(col, text=text)
     
     def on_selection_change(self, event=None):
         """Handle selection change - update player tag UI."""
         if self.player_widget:
             self.player_widget.update_tag_ui()
+        self._update_snippet()
     
     def on_double_click(self, event):
         """Handle double-click on song."""
@@ -544,15 +999,12 @@ class LibraryTab(tk.Frame):
     
     def play_selected(self):
         """Play the selected song (to be connected to player)."""
-        selection = self.tree.selection()
-        if not selection:
+        index = self.song_list.selected_index()
+        if index is None:
             return
         
-        item = selection[0]
-        filepath = self.tree.item(item)['tags'][0]
-        
         # Normalize filepath
-        filepath = os.path.normpath(filepath)
+        filepath = os.path.normpath(self.view_songs[index]['filepath'])
         
         # Verify file exists
         if not os.path.exists(filepath):
@@ -560,12 +1012,9 @@ class LibraryTab(tk.Frame):
             messagebox.showerror("File Not Found", f"File does not exist:\n{filepath}")
             return
         
-        # Find index in filtered_songs
-        index = -1
-        for i, song in enumerate(self.filtered_songs):
-            if os.path.normpath(song['filepath']) == filepath:
-                index = i
-                break
+        # The list shows filtered_songs except while a scan is still filling it
+        if self.view_songs is not self.filtered_songs:
+            index = -1
         
         if index != -1:
             # Emit event with playlist data
@@ -586,50 +1035,33 @@ class LibraryTab(tk.Frame):
         if not filepath:
             return
         
-        # Normalize filepath for comparison
-        filepath = os.path.normpath(filepath)
-        
-        # Also try with forward slashes for compatibility
-        filepath_alt = filepath.replace('\\', '/')
-            
-        # Find item with matching tag
-        # Since we don't have a direct map, we iterate. 
-        # For large libraries this might be slow, but acceptable for now.
-        for item in self.tree.get_children():
-            try:
-                item_tags = self.tree.item(item, "tags")
-                if item_tags and len(item_tags) > 0:
-                    item_filepath = os.path.normpath(item_tags[0])
-                    item_filepath_alt = item_filepath.replace('\\', '/')
-                    
-                    # Try both normalized paths
-                    if item_filepath == filepath or item_filepath == filepath_alt or \
-                       item_filepath_alt == filepath or item_filepath_alt == filepath_alt:
-                        self.tree.selection_set(item)
-                        self.tree.see(item)
-                        # Update player tag UI
-                        if self.player_widget:
-                            self.player_widget.update_tag_ui()
-                        return
-            except tk.TclError:
-                # Item was deleted, skip it
-                continue
+        # Leave the selection alone if the song is hidden by the current filter
+        index = self.registry.view_index(filepath)
+        if index is not None:
+            self.song_list.select(index)
+            # Update player tag UI
+            if self.player_widget:
+                self.player_widget.update_tag_ui()
 
     def get_selected_filepath(self):
-        """Get filepath of selected song."""
-        selection = self.tree.selection()
-        if not selection:
+        """Get filepath of selected song (the focused one if several are selected)."""
+        index = self.song_list.selected_index()
+        if index is None or index >= len(self.view_songs):
             return None
-        
-        item = selection[0]
-        return self.tree.item(item)['tags'][0]
+        return self.view_songs[index]['filepath']
+    
+    def get_selected_filepaths(self):
+        """Filepaths of every selected song, in list order."""
+        return [self.view_songs[index]['filepath'] for index in self.song_list.selected_indexes()
+                if index < len(self.view_songs)]
     
     def show_context_menu(self, event):
         """Show right-click context menu."""
-        # Select the item under cursor
-        item = self.tree.identify_row(event.y)
-        if item:
-            self.tree.selection_set(item)
+        # Right-clicking outside the selection selects that row; inside, the selection stands
+        index = self.song_list.index_at(event.y)
+        if index is not None:
+            if not self.song_list.is_selected(index):
+                self.song_list.select(index, see=False)
             self.context_menu.post(event.x_root, event.y_root)
     
     def open_download_folder(self):
@@ -648,6 +1080,7 @@ class LibraryTab(tk.Frame):
         if folder:
             self.config_manager.set("path", folder)
             self.config_manager.save_config()
+            # New folder: full scan (which also moves the watcher over)
             self.refresh_library()
 
     def show_about(self):
@@ -675,33 +1108,14 @@ class LibraryTab(tk.Frame):
         # Normalize filepath for comparison
         filepath = os.path.normpath(filepath)
         
-        # Always read fresh metadata from file to get latest lyrics
-        # Don't rely on cache which might be stale
-        try:
-            song_meta = read_song_metadata(filepath)
-            if not song_meta:
-                messagebox.showerror("Error", f"Could not read metadata from file:\n{filepath}")
-                return
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not read file:\n{filepath}\n\nError: {e}")
+        if not os.path.exists(filepath):
+            messagebox.showerror("Error", f"Could not read file:\n{filepath}")
             return
         
-        # Get lyrics - prioritize .txt file if it exists, then metadata
-        current_lyrics = ''
-        txt_path = os.path.splitext(filepath)[0] + ".txt"
-        
-        # First, check for .txt file (most reliable source)
-        if os.path.exists(txt_path):
-            try:
-                with open(txt_path, 'r', encoding='utf-8') as f:
-                    current_lyrics = f.read()
-            except Exception as e:
-                print(f"Error reading lyrics from .txt file: {e}")
-        
-        # If no .txt file or empty, check metadata
-        if not current_lyrics or current_lyrics.strip() == '':
-            current_lyrics = song_meta.get('lyrics', '')
+        # Lyrics are loaded on demand: .txt file first, then metadata (cached until either changes)
+        current_lyrics = self.lyrics.get(filepath)
         
+        song_meta = self.cache.get(filepath) or {}
         song_title = song_meta.get('title', os.path.basename(filepath))
         
         # Create Dialog
@@ -769,8 +1183,10 @@ class LibraryTab(tk.Frame):
             
             if txt_saved:
                 # Update cache
-                if song_meta:
-                    song_meta['lyrics'] = new_lyrics
+                self.lyrics.put(normalized_filepath, new_lyrics)
+                self.text_index.update([normalized_filepath])
+                # The audio file was rewritten in place; have the next scan re-read its folder
+                self._mark_dir_dirty(os.path.dirname(normalized_filepath))
                 
                 # Verify .txt file was written correctly
                 try:
@@ -808,62 +1224,155 @@ class LibraryTab(tk.Frame):
         dialog.deiconify()
 
     def tag_selected(self, tag):
-        """Tag the selected song."""
-        filepath = self.get_selected_filepath()
-        if not filepath:
+        """Tag every selected song (tag None clears), as one tag-store write."""
+        filepaths = self.get_selected_filepaths()
+        if not filepaths:
             messagebox.showwarning("No Selection", "Please select a song first.")
             return
         
-        # Normalize filepath
-        filepath = os.path.normpath(filepath)
+        # Tags are keyed by UUID, or by filepath for songs without one.
+        # One journal append; subscribers (this tab, the player) repaint what changed
+        try:
+            self.tags.set_many({self.registry.tag_key(os.path.normpath(filepath)): tag
+                                for filepath in filepaths})
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save tag: {e}")
+    
+    def delete_selected(self):
+        """Delete the selected songs."""
+        filepaths = self.get_selected_filepaths()
+        if not filepaths or self._bulk_running:
+            return
         
-        # Find song in all_songs to get UUID
-        song = next((s for s in self.all_songs if os.path.normpath(s['filepath']) == filepath), None)
-        if not song:
-            # Try using filepath as UUID if song not found
-            uuid = filepath
+        if len(filepaths) == 1:
+            prompt = f"Delete this file?\n{os.path.basename(filepaths[0])}"
         else:
-            uuid = song.get('id') or os.path.normpath(song['filepath'])
+            prompt = f"Delete {len(filepaths)} files?"
+        if not messagebox.askyesno("Delete", prompt):
+            return
         
-        if tag:
-            self.tags[uuid] = tag
-        else:
-            # Remove tag
-            if uuid in self.tags:
-                del self.tags[uuid]
+        def work(filepath):
+            os.remove(filepath)
+            return os.path.normpath(filepath)
         
-        # Save tags
-        if self.tags_file:
-            try:
-                with open(self.tags_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.tags, f)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save tag: {e}")
-                return
+        def done(deleted, errors):
+            self._apply_song_updates([], deleted)
+            self._report_bulk("Deleted", deleted, errors)
         
-        # Update UI
-        self.update_tree()
+        self._run_bulk("Deleting", filepaths, work, done)
+    
+    def reembed_selected(self):
+        """Write each selected song's current lyrics (.txt sidecar first) back into its tags."""
+        filepaths = self.get_selected_filepaths()
+        if not filepaths or self._bulk_running:
+            return
         
-        # Show confirmation
-        tag_name = {"keep": "👍 Keep", "star": "⭐ Star", "trash": "🗑️ Trash"}.get(tag, tag)
-        if tag:
-            messagebox.showinfo("Tagged", f"Tagged as: {tag_name}")
-        else:
-            messagebox.showinfo("Tag Removed", "Tag removed successfully")
+        def work(filepath):
+            lyrics = self.lyrics.get(filepath)
+            if not lyrics.strip():
+                return None  # Nothing to embed
+            success, message = save_lyrics_to_file(filepath, lyrics)
+            if not success:
+                raise OSError(message)
+            return self._read_song(filepath)
+        
+        def done(updated, errors):
+            updated = [song for song in updated if song]
+            self._apply_song_updates(updated, [])
+            self._report_bulk("Re-embedded lyrics in", updated, errors)
+        
+        self._run_bulk("Re-embedding", filepaths, work, done)
     
-    def delete_selected(self):
-        """Delete selected song."""
-        filepath = self.get_selected_filepath()
-        if not filepath:
+    def move_selected(self):
+        """Move the selected songs (and their .txt lyrics) to another folder."""
+        from tkinter import filedialog
+        filepaths = self.get_selected_filepaths()
+        if not filepaths or self._bulk_running:
+            return
+        target = filedialog.askdirectory(initialdir=self.download_path, title="Move Songs To")
+        if not target:
             return
+        target = os.path.normpath(target)
+        # Songs moved out of the library folder just drop out of the list
+        library_root = os.path.join(os.path.normpath(self.download_path), '') if self.download_path else None
+        in_library = bool(library_root) and os.path.join(target, '').startswith(library_root)
         
-        if messagebox.askyesno("Delete", f"Delete this file?\n{os.path.basename(filepath)}"):
-            try:
-                os.remove(filepath)
-                self.refresh_library()
-                messagebox.showinfo("Deleted", "File deleted successfully")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete file:\n{e}")
+        def work(filepath):
+            filepath = os.path.normpath(filepath)
+            new_path = get_unique_filename(os.path.join(target, os.path.basename(filepath)))
+            if new_path == filepath:
+                return None
+            shutil.move(filepath, new_path)
+            txt_path = os.path.splitext(filepath)[0] + ".txt"
+            if os.path.exists(txt_path):
+                shutil.move(txt_path, os.path.splitext(new_path)[0] + ".txt")
+            return filepath, new_path, self._read_song(new_path) if in_library else None
+        
+        def done(moves, errors):
+            moves = [move for move in moves if move]
+            # Tags keyed by path follow the file (UUID keys need nothing)
+            retag = {}
+            for old_path, new_path, _ in moves:
+                tag = self.tags.get(old_path)
+                if tag:
+                    retag[old_path] = None
+                    retag[new_path] = tag
+            if retag:
+                try:
+                    self.tags.set_many(retag)
+                except Exception as e:
+                    print(f"Error moving tags: {e}")
+            self._apply_song_updates([song for _, _, song in moves if song],
+                                     [old_path for old_path, _, _ in moves])
+            self._report_bulk("Moved", moves, errors)
+        
+        self._run_bulk("Moving", filepaths, work, done)
+    
+    def _read_song(self, filepath):
+        """Fresh library row for a file (worker threads)."""
+        st = os.stat(filepath)
+        song_data = read_song_metadata(filepath, st, include_lyrics=False)
+        _, song_data['mtime_ns'], song_data['inode'] = change_key(st)
+        return song_data
+    
+    def _run_bulk(self, verb, filepaths, work, done):
+        """
+        Run work(filepath) for each file on a worker thread, then done(results, errors)
+        on the Tk thread, so the list, cache and index are patched once per batch.
+        Large batches show their progress in the song count label.
+        """
+        self._bulk_running = True
+        show_progress = len(filepaths) >= BULK_PROGRESS_MIN
+        
+        def progress(i):
+            self.count_label.config(text=f"{verb} {i}/{len(filepaths)}...")
+        
+        def finish(results, errors):
+            self._bulk_running = False
+            self.count_label.config(text=f"{len(self.filtered_songs)} / {len(self.all_songs)} songs")
+            done(results, errors)
+        
+        def run():
+            results, errors = [], []
+            for i, filepath in enumerate(filepaths, 1):
+                try:
+                    results.append(work(filepath))
+                except Exception as e:
+                    errors.append(f"{os.path.basename(filepath)}: {e}")
+                if show_progress:
+                    self.dispatcher.post(progress, i, key="bulk_progress")
+            self.dispatcher.post(finish, results, errors)
+        
+        if show_progress:
+            progress(0)
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _report_bulk(self, verb, succeeded, errors):
+        """Tell the user which files failed; successes just show up in the list."""
+        if errors:
+            shown = "\n".join(errors[:10])
+            more = f"\n...and {len(errors) - 10} more" if len(errors) > 10 else ""
+            messagebox.showerror("Error", f"{verb} {len(succeeded)} file(s); {len(errors)} failed:\n{shown}{more}")
     
     @staticmethod
     def format_duration(seconds):
@@ -0,0 +1,259 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from library_scanner import AUDIO_EXTENSIONS, walk_library, change_key, is_hidden_dir
+
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_DELETE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+class LibraryWatcher:
+    """
+    Reports audio files created, modified, deleted or moved under a library folder.
+
+    Uses inotify on Linux and falls back to polling (a directory-mtime walk every
+    `poll_interval` seconds) elsewhere or when inotify watches run out. Polling sees
+    files added, removed and renamed but not in-place edits.
+
+    Changes are batched: on_changes(changed, removed, rescan) is called from the
+    watcher thread once events have been quiet for `settle` seconds (or after
+    `max_delay` of continuous activity). `changed` holds audio file paths to
+    re-read, `removed` holds file or directory paths whose songs are gone, and
+    `rescan` is True when events were lost and the caller should rescan fully.
+    """
+
+    def __init__(self, root, on_changes, settle=0.5, max_delay=2.0, poll_interval=5.0):
+        self.root = root
+        self.on_changes = on_changes
+        self.settle = settle
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._wake_r = self._wake_w = None
+        self._watches = {}  # wd -> directory path
+
+    def start(self):
+        if _libc is not None and self._init_inotify():
+            self.backend = "inotify"
+            target = self._inotify_loop
+        else:
+            self.backend = "polling"
+            target = self._poll_loop
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"x")
+            except OSError:
+                pass
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    # --- inotify backend ---
+
+    def _init_inotify(self):
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return False
+        self._fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+        if not self._add_tree(self.root):
+            self._close_inotify()
+            return False
+        return True
+
+    def _add_watch(self, path):
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            return False
+        self._watches[wd] = path
+        return True
+
+    def _add_tree(self, top, found=None):
+        """Watch `top` and every directory below it. Audio files seen are added to `found`."""
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [name for name in dirnames if not is_hidden_dir(name)]
+            if not self._add_watch(dirpath):
+                # Usually ENOSPC: fs.inotify.max_user_watches exhausted
+                print(f"inotify watch failed for {dirpath} (errno {ctypes.get_errno()})")
+                return False
+            if found is not None:
+                found.update(os.path.join(dirpath, name) for name in filenames
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+        return True
+
+    def _drop_tree(self, top):
+        prefix = os.path.join(top, '')
+        for wd, path in list(self._watches.items()):
+            if path == top or path.startswith(prefix):
+                _libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def _close_inotify(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._fd = self._wake_r = self._wake_w = None
+
+    def _inotify_loop(self):
+        changed, removed = set(), set()
+        rescan = False
+        first_event = last_event = None
+        try:
+            while not self._stop.is_set():
+                timeout = self.settle if first_event else None
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+                if self._stop.is_set():
+                    break
+                now = time.monotonic()
+                if self._fd in readable:
+                    if self._read_events(changed, removed):
+                        rescan = True
+                    last_event = now
+                    first_event = first_event or now
+                if first_event and (now - last_event >= self.settle or now - first_event >= self.max_delay):
+                    self._flush(changed, removed, rescan)
+                    changed, removed = set(), set()
+                    rescan = False
+                    first_event = last_event = None
+        except Exception as e:
+            print(f"Library watcher error: {e}")
+        finally:
+            self._close_inotify()
+
+    def _read_events(self, changed, removed):
+        """Drain the inotify fd into the pending sets. Returns True if events were lost."""
+        lost = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return lost
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, name_len = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0")
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    lost = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                parent = self._watches.get(wd)
+                if parent is None or not name:
+                    continue
+                path = os.path.join(parent, os.fsdecode(name))
+
+                if mask & IN_ISDIR:
+                    if is_hidden_dir(os.path.basename(path)):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # New folder (e.g. a month folder); its files may already exist
+                        found = set()
+                        if not self._add_tree(path, found):
+                            lost = True
+                        changed |= found
+                        removed.discard(path)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._drop_tree(path)
+                        removed.add(path)
+                    continue
+
+                if not path.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed.discard(path)
+                    removed.add(path)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    removed.discard(path)
+                    changed.add(path)
+                # IN_CREATE on a file is followed by IN_CLOSE_WRITE once it is written
+
+    # --- polling backend ---
+
+    def _poll_loop(self):
+        dir_cache = {}
+        files_by_dir = {}
+        first = True
+        while not self._stop.is_set():
+            try:
+                changed, removed = set(), set()
+                snapshot = {}
+                for dirpath, files in walk_library(self.root, dir_cache):
+                    if files is None:
+                        snapshot[dirpath] = files_by_dir.get(dirpath, {})
+                        continue
+                    current = {filepath: change_key(st, inode) for filepath, st, inode, _ in files}
+                    previous = files_by_dir.get(dirpath, {})
+                    changed.update(path for path, key in current.items() if previous.get(path) != key)
+                    removed.update(path for path in previous if path not in current)
+                    snapshot[dirpath] = current
+                for dirpath in files_by_dir:
+                    if dirpath not in snapshot:
+                        removed.add(dirpath)
+                files_by_dir = snapshot
+                # The first walk only records the baseline the library just scanned
+                if not first:
+                    self._flush(changed, removed, False)
+                first = False
+            except Exception as e:
+                print(f"Library watcher error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _flush(self, changed, removed, rescan):
+        if not (changed or removed or rescan) or self._stop.is_set():
+            return
+        try:
+            self.on_changes(changed, removed, rescan)
+        except Exception as e:
+            print(f"Library watcher callback error: {e}")
@@ -0,0 +1,53 @@
+import os
+
+from suno_utils import read_lyrics
+
+
+def _sidecar_mtime_ns(filepath):
+    try:
+        return os.stat(os.path.splitext(filepath)[0] + ".txt").st_mtime_ns
+    except OSError:
+        return None
+
+
+class LyricsStore:
+    """
+    Lyrics loaded on demand instead of during library scans.
+
+    Lyrics are read from disk (read_lyrics: .txt sidecar, then USLT) the first time
+    they are asked for and kept in the cache database's lyrics table. A cached entry
+    is reused while the .txt sidecar's mtime is unchanged; re-reading a song's row
+    (LibraryCache.upsert_many) drops it, so edits to the audio file are picked up too.
+
+    cache_db may be None, in which case every call reads from disk.
+    """
+
+    def __init__(self, cache_db):
+        self.cache_db = cache_db
+
+    def get(self, filepath):
+        """Lyrics for a song, '' if it has none."""
+        sidecar_mtime_ns = _sidecar_mtime_ns(filepath)
+        if self.cache_db:
+            try:
+                cached = self.cache_db.get_lyrics(filepath)
+            except Exception as e:
+                print(f"Error reading cached lyrics: {e}")
+                cached = None
+            if cached is not None and cached[1] == sidecar_mtime_ns:
+                return cached[0]
+        
+        lyrics = read_lyrics(filepath)
+        self._store(filepath, lyrics, sidecar_mtime_ns)
+        return lyrics
+
+    def put(self, filepath, lyrics):
+        """Record lyrics just saved for a song (after its .txt sidecar was written)."""
+        self._store(filepath, lyrics, _sidecar_mtime_ns(filepath))
+
+    def _store(self, filepath, lyrics, sidecar_mtime_ns):
+        if self.cache_db:
+            try:
+                self.cache_db.set_lyrics(filepath, lyrics, sidecar_mtime_ns)
+            except Exception as e:
+                print(f"Error caching lyrics: {e}")
@@ -4,8 +4,10 @@ from PIL import Image, ImageTk
 import os
 import json
 import sys
+import multiprocessing
 from library_tab import LibraryTab
 from player_widget import PlayerWidget
+from tag_store import TagStore
 from downloader_tab import DownloaderTab
 from config_manager import ConfigManager
 
@@ -16,7 +18,7 @@ if getattr(sys, "frozen", False):
 else:
     base_path = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE = os.path.join(base_path, "config.json")
-CACHE_FILE = os.path.join(base_path, "library_cache.json")
+CACHE_FILE = os.path.join(base_path, "library_cache.db")  # migrates library_cache.json on first run
 TAGS_FILE = os.path.join(base_path, "tags.json")
 
 
@@ -110,18 +112,21 @@ class SunoSyncApp(tk.Tk):
             )
             self.notebook.add(self.downloader, text="  Downloader  ")
 
+            # Tags shared by the library and player (journaled, with change notifications)
+            self.tags = TagStore(TAGS_FILE)
+
             # Tab 2: Library
             self.library = LibraryTab(
                 self.notebook,
                 config_manager=self.config_manager,
                 cache_file=CACHE_FILE,
-                tags_file=TAGS_FILE,
+                tag_store=self.tags,
             )
             self.notebook.add(self.library, text="  Library  ")
 
             # Player widget (bottom, fixed height)
             self.player = PlayerWidget(main_frame)
-            self.player.set_tags_file(TAGS_FILE)
+            self.player.set_tag_store(self.tags)
             self.player.set_library_tab(
                 self.library
             )  # Give player access to library for tagging
@@ -136,13 +141,20 @@ class SunoSyncApp(tk.Tk):
 
             # Connect Library to Player
             self.library.bind("<<PlaySong>>", self.on_play_song)
-            self.player.bind("<<TagsUpdated>>", lambda e: self.on_tags_updated(e))
             self.player.bind("<<TrackChanged>>", self.on_track_changed)
 
             # Connect Downloader to Library (refresh on download complete)
             self.downloader.downloader.signals.download_complete.connect(
                 self.on_download_complete
             )
+            # Waveform work yields the disk and CPU to downloads
+            self.downloader.downloader.signals.download_started.connect(
+                self.library.peaks.pause
+            )
+            # Finished songs go straight into the library without a re-read
+            self.downloader.downloader.signals.song_saved.connect(
+                self.library.add_downloaded_song
+            )
 
             # Style notebook
             style = ttk.Style()
@@ -429,12 +441,15 @@ class SunoSyncApp(tk.Tk):
                 json.dump({"geometry": self.geometry()}, f)
         except:
             pass
+        if hasattr(self, "tags"):
+            self.tags.close()
         self.destroy()
 
     def on_download_complete(self, success):
-        """Refresh library when downloads complete."""
+        """Bring the library up to date when downloads complete (called from the download thread)."""
+        self.library.peaks.resume()
         if success:
-            self.library.refresh_library()
+            self.after(0, self.library.sync_after_download)
 
     def on_play_song(self, event):
         """Handle play song event from library."""
@@ -446,34 +461,6 @@ class SunoSyncApp(tk.Tk):
                 self.library.current_playlist, self.library.current_index
             )
 
-    def on_tags_updated(self, event):
-        """Handle tags updated event from player."""
-        try:
-            # Use after() to ensure we're in the main thread
-            if hasattr(self, "library") and self.library:
-                # Use a longer delay to ensure any ongoing operations complete
-                self.after(200, self._safe_reload_tags)
-        except Exception as e:
-            print(f"Error in on_tags_updated: {e}")
-            import traceback
-
-            traceback.print_exc()
-
-    def _safe_reload_tags(self):
-        """Safely reload tags in library."""
-        try:
-            if (
-                hasattr(self, "library")
-                and self.library
-                and hasattr(self.library, "reload_tags")
-            ):
-                self.library.reload_tags()
-        except Exception as e:
-            print(f"Error in _safe_reload_tags: {e}")
-            import traceback
-
-            traceback.print_exc()
-
     def on_track_changed(self, event):
         """Handle track change from player."""
         try:
@@ -501,5 +488,7 @@ class SunoSyncApp(tk.Tk):
 
 
 if __name__ == "__main__":
+    # Library scans use a process pool; frozen Windows builds need this to spawn workers
+    multiprocessing.freeze_support()
     app = SunoSyncApp()
     app.mainloop()
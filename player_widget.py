@@ -6,11 +6,20 @@ try:
 except (ImportError, OSError):
     VLC_AVAILABLE = False
 import os
+import queue
+from collections import deque
 from threading import Thread
-import time
-import json
 import random
 from suno_utils import open_file
+from tag_store import TagStore
+from tk_dispatcher import TkDispatcher
+from suno_widgets import WaveformSeekBar
+
+
+# Playlist entries loaded and parsed ahead of the current one
+PRELOAD_AHEAD = 2
+# Read size used to pull upcoming files into the OS page cache
+WARM_CHUNK = 1024 * 1024
 
 
 class PlayerWidget(tk.Frame):
@@ -31,14 +40,54 @@ class PlayerWidget(tk.Frame):
         else:
             self.player = None
         
+        # libVLC events arrive on VLC's own threads; they are handed to Tk through this
+        self.dispatcher = TkDispatcher(self)
+        self._media_token = 0  # bumped per play_file(), so late events for old media are ignored
+        # Player events don't say which media they are about. libVLC delivers them in
+        # order, so the media an event belongs to is the last one MediaPlayerMediaChanged
+        # announced: play_file() queues each media's token and that event (on VLC's
+        # thread) moves _event_token on. Late events of the old track keep the old token.
+        self._event_token = 0
+        self._set_media_tokens = deque()
+        if self.player:
+            events = self.player.event_manager()
+            events.event_attach(vlc.EventType.MediaPlayerMediaChanged, self._on_vlc_media_changed)
+            events.event_attach(
+                vlc.EventType.MediaPlayerLengthChanged,
+                lambda event: self._on_vlc_length(self._event_token, event.u.new_length))
+            # Advance as soon as a track ends
+            events.event_attach(
+                vlc.EventType.MediaPlayerEndReached,
+                lambda event: self.dispatcher.post(self._on_end_reached, self._event_token, key="end"))
+            # Seek bar and clock follow playback events; nothing runs while idle or paused
+            events.event_attach(
+                vlc.EventType.MediaPlayerTimeChanged,
+                lambda event: self._on_vlc_progress(self._event_token, time_ms=event.u.new_time))
+            events.event_attach(
+                vlc.EventType.MediaPlayerPositionChanged,
+                lambda event: self._on_vlc_progress(self._event_token, position=event.u.new_position))
+            events.event_attach(
+                vlc.EventType.MediaPlayerPlaying,
+                lambda event: self.dispatcher.post(self._on_vlc_state, self._event_token, True, key="state"))
+            events.event_attach(
+                vlc.EventType.MediaPlayerPaused,
+                lambda event: self.dispatcher.post(self._on_vlc_state, self._event_token, False, key="state"))
+        self._shown_progress = None  # (media token, (seek %, seconds)) last posted, to drop updates that change nothing
+        
+        # Upcoming tracks: chosen in advance (shuffle/repeat aware), parsed and cached
+        self._upcoming = []       # playlist indexes that next_song() will play, in order
+        self._upcoming_for = None # (playlist id, current index, shuffle, repeat) they were picked for
+        self._preloaded = {}      # filepath -> parsed vlc.Media
+        self._warm_queue = queue.Queue()
+        self._warm_thread = None
+        
         # Player state
         self.current_file = None
         self.is_playing = False
         self.duration = 0
         self.playlist = []
         self.current_index = -1
-        self.tags = {}
-        self.tags_file = None
+        self.tags = TagStore(None)  # replaced by the shared store in set_tag_store()
         self.library_tab = None  # Reference to library tab for tag operations
         
         # Playback modes
@@ -60,7 +109,6 @@ class PlayerWidget(tk.Frame):
         self.config(height=160)  # Increased height for better visibility
         
         self.create_widgets()
-        self.start_update_loop()
     
     def create_widgets(self):
         """Create player UI."""
@@ -184,12 +232,13 @@ class PlayerWidget(tk.Frame):
                                    font=("Segoe UI", 8))
         self.time_label.pack(side=tk.LEFT, padx=(0, 5))
         
-        # Seek slider
+        # Seek bar (the song's waveform once its peaks are computed)
         self.seek_var = tk.IntVar(value=0)
-        self.seek_slider = ttk.Scale(seek_frame, from_=0, to=100,
-                                     orient="horizontal",
-                                     variable=self.seek_var,
-                                     command=self.on_seek)
+        self.seek_slider = WaveformSeekBar(seek_frame, variable=self.seek_var,
+                                           command=self.on_seek,
+                                           bg_color=self.bg_card,
+                                           played_color=self.accent_purple,
+                                           height=24)
         self.seek_slider.pack(side=tk.LEFT, fill="x", expand=True)
         
         # Duration time
@@ -202,34 +251,15 @@ class PlayerWidget(tk.Frame):
         if self.player:
             self.player.audio_set_volume(70)
 
-    def set_tags_file(self, filepath):
-        """Set path to tags JSON file and load it."""
-        self.tags_file = filepath
-        self._load_tags()
+    def set_tag_store(self, tag_store):
+        """Use the tag store shared with the library; tag buttons follow its changes."""
+        self.tags.unsubscribe(self._on_tags_changed)
+        self.tags = tag_store
+        self.tags.subscribe(self._on_tags_changed)
+        self.update_tag_ui()
 
-    def _load_tags(self):
-        if self.tags_file and os.path.exists(self.tags_file):
-            try:
-                with open(self.tags_file, 'r', encoding='utf-8') as f:
-                    self.tags = json.load(f)
-            except:
-                self.tags = {}
-
-    def _save_tags(self):
-        if self.tags_file:
-            try:
-                # Ensure directory exists
-                tags_dir = os.path.dirname(self.tags_file)
-                if tags_dir and not os.path.exists(tags_dir):
-                    os.makedirs(tags_dir, exist_ok=True)
-                
-                with open(self.tags_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.tags, f, indent=2)
-            except Exception as e:
-                print(f"Error saving tags to {self.tags_file}: {e}")
-                import traceback
-                traceback.print_exc()
-                raise  # Re-raise so toggle_tag can catch it
+    def _on_tags_changed(self, keys):
+        self.update_tag_ui()
 
     def set_playlist(self, songs, start_index=0):
         """Set the current playlist and start playing."""
@@ -254,6 +284,7 @@ class PlayerWidget(tk.Frame):
         
         if success:
             self.update_tag_ui(song.get('id'))
+            self._plan_upcoming()
             
             # Emit track changed event after a small delay to ensure current_file is set
             self.after(100, lambda: self.event_generate("<<TrackChanged>>"))
@@ -277,14 +308,9 @@ class PlayerWidget(tk.Frame):
             # Try to get from library selection
             filepath = self.library_tab.get_selected_filepath()
             if filepath:
-                # Normalize filepath for comparison
+                # Tags are keyed by UUID, or by filepath for songs without one
                 filepath = os.path.normpath(filepath)
-                # Find song in library to get UUID (normalize both for comparison)
-                song = next((s for s in self.library_tab.all_songs if os.path.normpath(s.get('filepath', '')) == filepath), None)
-                if song:
-                    uuid = song.get('id') or os.path.normpath(song.get('filepath', ''))
-                else:
-                    uuid = filepath
+                uuid = self.library_tab.registry.tag_key(filepath)
         
         if not uuid and not filepath:
             # No song available
@@ -302,22 +328,12 @@ class PlayerWidget(tk.Frame):
         if os.path.sep in uuid:
             uuid = os.path.normpath(uuid)
             
-        current_tag = self.tags.get(uuid)
-        
-        if current_tag == tag:
-            # Untag
-            if uuid in self.tags:
-                del self.tags[uuid]
-        else:
-            # Set tag
-            self.tags[uuid] = tag
+        current_tag = self.tags.lookup(uuid)
         
         try:
-            self._save_tags()
-            self.update_tag_ui(uuid)
-            
-            # Notify library to update UI (use after() with delay to ensure thread safety)
-            self.after(100, lambda: self.event_generate("<<TagsUpdated>>"))
+            # Clicking the current tag removes it. The store notifies the library
+            # and this widget, so only the changed row and the buttons repaint.
+            self.tags.set(uuid, None if current_tag == tag else tag)
         except Exception as e:
             import tkinter.messagebox as messagebox
             import traceback
@@ -335,29 +351,13 @@ class PlayerWidget(tk.Frame):
             elif hasattr(self, 'library_tab') and self.library_tab:
                 filepath = self.library_tab.get_selected_filepath()
                 if filepath:
-                    # Normalize filepath for comparison
-                    filepath = os.path.normpath(filepath)
-                    song = next((s for s in self.library_tab.all_songs if os.path.normpath(s.get('filepath', '')) == filepath), None)
-                    if song:
-                        uuid = song.get('id') or filepath
-                    else:
-                        uuid = filepath
+                    uuid = self.library_tab.registry.tag_key(filepath)
         
         # Normalize UUID if it's a filepath
         if uuid and os.path.sep in str(uuid):
             uuid = os.path.normpath(uuid)
         
-        current_tag = self.tags.get(uuid) if uuid else None
-        
-        # If we still don't have a tag, try with alternative path format
-        if not current_tag and uuid and os.path.sep in str(uuid):
-            uuid_alt = str(uuid).replace('\\', '/')
-            current_tag = self.tags.get(uuid_alt)
-            if current_tag:
-                # Update tags dict to use normalized path
-                self.tags[uuid] = current_tag
-                if uuid_alt in self.tags:
-                    del self.tags[uuid_alt]
+        current_tag = self.tags.lookup(uuid)
         
         for tag, btn in self.tag_btns.items():
             if tag == current_tag:
@@ -393,13 +393,21 @@ class PlayerWidget(tk.Frame):
             if self.is_playing:
                 self.player.stop()
             
-            # Load media
-            media = self.instance.media_new(filepath)
+            # Load media (already created and parsed if it was preloaded)
+            media = self._preloaded.pop(filepath, None) or self.instance.media_new(filepath)
             if not media:
                 import tkinter.messagebox as messagebox
                 messagebox.showerror("Media Error", f"Failed to load media from:\n{filepath}")
                 return False
+            
+            # Duration: parsed or cached value now, libVLC's once it has parsed the file
+            self._media_token += 1
+            self._shown_progress = None
+            parsed_ms = media.get_duration()
+            self.duration = parsed_ms // 1000 if parsed_ms > 0 else self._cached_duration(filepath)
+            self._parse_async(media, self._media_token)
                 
+            self._set_media_tokens.append(self._media_token)
             self.player.set_media(media)
             
             # Start playback
@@ -412,16 +420,6 @@ class PlayerWidget(tk.Frame):
             self.is_playing = True
             self.play_btn.config(text="⏸")
             
-            # Wait for media to parse (with timeout)
-            for _ in range(50):  # 5 seconds max
-                time.sleep(0.1)
-                length = self.player.get_length()
-                if length > 0:
-                    self.duration = length // 1000
-                    break
-            else:
-                self.duration = 0
-            
             # Update UI
             filename = os.path.basename(filepath)
             title = os.path.splitext(filename)[0].replace('_', ' ')
@@ -430,6 +428,7 @@ class PlayerWidget(tk.Frame):
             
             # Update duration label
             self.duration_label.config(text=self.format_time(self.duration))
+            self._show_waveform(filepath, self._media_token)
             return True
         except Exception as e:
             import tkinter.messagebox as messagebox
@@ -439,6 +438,178 @@ class PlayerWidget(tk.Frame):
             print(f"PLAYBACK ERROR: {error_msg}")  # Also print to console
             return False
     
+    def _cached_duration(self, filepath):
+        """Duration in seconds from the library cache, or 0 if the song isn't there."""
+        if self.library_tab:
+            song = self.library_tab.registry.get(filepath)
+            if song and song.get('duration'):
+                return int(song['duration'])
+        return 0
+
+    def _parse_async(self, media, token):
+        """Have libVLC parse the file in the background; the duration arrives by event."""
+        try:
+            media.event_manager().event_attach(
+                vlc.EventType.MediaDurationChanged,
+                lambda event: self._on_vlc_length(token, media.get_duration()))
+            if hasattr(media, 'parse_with_options'):
+                media.parse_with_options(vlc.MediaParseFlag.local, 0)
+            else:
+                media.parse_async()
+        except Exception as e:
+            # Playback reports the length too (MediaPlayerLengthChanged)
+            print(f"Media parse error: {e}")
+
+    def _show_waveform(self, filepath, token):
+        """Draw the song's peaks on the seek bar, computing them first if the library hasn't yet."""
+        peak_index = self.library_tab.peaks if self.library_tab else None
+        peaks = peak_index.get(filepath) if peak_index else None
+        self.seek_slider.set_peaks(peaks)
+        if peaks is None and peak_index and peak_index.available:
+            peak_index.request(filepath, lambda filepath, peaks: self.dispatcher.post(
+                self._set_waveform, token, peaks, key="waveform"))
+
+    def _set_waveform(self, token, peaks):
+        if token == self._media_token:
+            self.seek_slider.set_peaks(peaks)
+
+    def _on_end_reached(self, token):
+        if token != self._media_token:
+            return
+        self.is_playing = False
+        self.play_btn.config(text="▶")
+        self.next_song()  # Auto-play next
+
+    # --- Preloading ---
+
+    def _pick_next(self, index):
+        """Playlist index that follows `index` under the current shuffle/repeat modes, or None."""
+        if not self.playlist:
+            return None
+        if self.repeat_mode == 2:  # Repeat One
+            return index
+        if self.shuffle_mode:
+            # Pick random index
+            new_index = random.randint(0, len(self.playlist) - 1)
+            # Try not to pick same song unless playlist is size 1
+            if len(self.playlist) > 1 and new_index == index:
+                new_index = (new_index + 1) % len(self.playlist)
+            return new_index
+        new_index = index + 1
+        if new_index >= len(self.playlist):
+            if self.repeat_mode == 1:  # Loop all
+                return 0
+            return None  # Stop at end
+        return new_index
+
+    def _plan_upcoming(self):
+        """Choose the next PRELOAD_AHEAD tracks now and start loading them."""
+        upcoming = []
+        index = self.current_index
+        for _ in range(PRELOAD_AHEAD):
+            index = self._pick_next(index)
+            if index is None:
+                break
+            upcoming.append(index)
+        self._upcoming = upcoming
+        self._upcoming_for = (id(self.playlist), self.current_index, self.shuffle_mode, self.repeat_mode)
+        self._preload([os.path.normpath(self.playlist[i]['filepath']) for i in upcoming])
+
+    def _preload(self, filepaths):
+        """Create and parse Media for these files (dropping older preloads) and warm their data."""
+        if not self.player or not self.instance:
+            return
+        for filepath in list(self._preloaded):
+            if filepath not in filepaths:
+                self._preloaded.pop(filepath).release()
+        for filepath in filepaths:
+            if filepath in self._preloaded or filepath == self.current_file or not os.path.exists(filepath):
+                continue
+            try:
+                media = self.instance.media_new(filepath)
+                if hasattr(media, 'parse_with_options'):
+                    media.parse_with_options(vlc.MediaParseFlag.local, 0)
+                else:
+                    media.parse_async()
+                self._preloaded[filepath] = media
+            except Exception as e:
+                print(f"Preload error: {e}")
+                continue
+            self._warm(filepath)
+
+    def _warm(self, filepath):
+        """Read a file on a background thread so it is in the OS page cache when it plays."""
+        if self._warm_thread is None:
+            self._warm_thread = Thread(target=self._warm_loop, daemon=True)
+            self._warm_thread.start()
+        self._warm_queue.put(filepath)
+
+    def _warm_loop(self):
+        while True:
+            filepath = self._warm_queue.get()
+            if filepath is None:
+                return
+            try:
+                # A plain read (not just fadvise) so network mounts fetch the data too
+                with open(filepath, 'rb') as f:
+                    while f.read(WARM_CHUNK):
+                        pass
+            except OSError:
+                pass
+
+    def _on_vlc_media_changed(self, event):
+        """libVLC thread: events from here on are about the media set by the oldest pending play_file()."""
+        try:
+            self._event_token = self._set_media_tokens.popleft()
+        except IndexError:
+            pass
+
+    def _on_vlc_progress(self, token, position=None, time_ms=None):
+        """libVLC thread: playback moved. Posts only when the seek bar or clock would change."""
+        duration = self.duration
+        if position is None:
+            if not duration:
+                return
+            position = time_ms / 1000.0 / duration
+        seconds = int(time_ms // 1000) if time_ms is not None else int(position * duration)
+        shown = (int(position * 100), seconds)
+        if (token, shown) == self._shown_progress:
+            return
+        self._shown_progress = (token, shown)
+        self.dispatcher.post(self._show_progress, token, shown, key="progress")
+
+    def _show_progress(self, token, shown):
+        if token != self._media_token:
+            return
+        percent, seconds = shown
+        self.seek_var.set(max(0, min(100, percent)))
+        self.time_label.config(text=self.format_time(seconds))
+
+    def _on_vlc_state(self, token, playing):
+        """Keep the play button in step with libVLC (e.g. playback resumed elsewhere)."""
+        if token != self._media_token or playing == self.is_playing:
+            return
+        self.is_playing = playing
+        self.play_btn.config(text="⏸" if playing else "▶")
+
+    def _on_vlc_length(self, token, length_ms):
+        """libVLC thread: a length became known for the media loaded as `token`."""
+        if length_ms and length_ms > 0:
+            self.dispatcher.post(self._set_duration, token, length_ms // 1000, key="duration")
+
+    def _set_duration(self, token, seconds):
+        if token != self._media_token or seconds == self.duration:
+            return
+        self.duration = seconds
+        self.duration_label.config(text=self.format_time(seconds))
+
+    def destroy(self):
+        self.dispatcher.close()
+        self._warm_queue.put(None)
+        if self.player:
+            self.player.stop()
+        super().destroy()
+
     def toggle_playback(self):
         """Toggle play/pause."""
         if not self.player: return
@@ -462,6 +633,7 @@ class PlayerWidget(tk.Frame):
         self.player.stop()
         self.is_playing = False
         self.play_btn.config(text="▶")
+        self._shown_progress = None
         self.seek_var.set(0)
         self.time_label.config(text="0:00")
     
@@ -490,6 +662,8 @@ class PlayerWidget(tk.Frame):
             self.shuffle_btn.config(fg=self.accent_purple)
         else:
             self.shuffle_btn.config(fg=self.fg_secondary)
+        if 0 <= self.current_index < len(self.playlist):
+            self._plan_upcoming()
 
     def toggle_repeat(self):
         """Toggle repeat mode: Off -> All -> One -> Off."""
@@ -501,6 +675,8 @@ class PlayerWidget(tk.Frame):
             self.repeat_btn.config(text="🔁", fg=self.accent_purple)
         elif self.repeat_mode == 2: # One
             self.repeat_btn.config(text="🔂", fg=self.accent_purple)
+        if 0 <= self.current_index < len(self.playlist):
+            self._plan_upcoming()
 
     def previous_song(self):
         """Play previous song."""
@@ -530,56 +706,17 @@ class PlayerWidget(tk.Frame):
         """Play next song."""
         if not self.playlist: return
         
-        if self.repeat_mode == 2: # Repeat One
-            self.play_song_at_index(self.current_index)
-            return
-
-        if self.shuffle_mode:
-            # Pick random index
-            new_index = random.randint(0, len(self.playlist) - 1)
-            # Try not to pick same song unless playlist is size 1
-            if len(self.playlist) > 1 and new_index == self.current_index:
-                new_index = (new_index + 1) % len(self.playlist)
-            self.play_song_at_index(new_index)
-            return
-
-        new_index = self.current_index + 1
-        if new_index >= len(self.playlist):
-            if self.repeat_mode == 1: # Loop all
-                new_index = 0
-            else:
-                return # Stop at end
+        # Use the track picked (and preloaded) in advance if nothing changed since
+        planned_for = (id(self.playlist), self.current_index, self.shuffle_mode, self.repeat_mode)
+        if self._upcoming and self._upcoming_for == planned_for:
+            new_index = self._upcoming[0]
+        else:
+            new_index = self._pick_next(self.current_index)
+        if new_index is None or new_index >= len(self.playlist):
+            return # Stop at end
                 
         self.play_song_at_index(new_index)
     
-    def start_update_loop(self):
-        """Start the UI update loop using after() for thread safety."""
-        self._update_ui()
-        
-    def _update_ui(self):
-        """Update UI elements. Must run on main thread."""
-        if self.is_playing and self.duration > 0 and self.player:
-            try:
-                # Update seek bar and time
-                position = self.player.get_position()
-                if position >= 0:
-                    current_time = int(position * self.duration)
-                    # Only update if not dragging (optional optimization, but simple set is fine)
-                    self.seek_var.set(int(position * 100))
-                    self.time_label.config(text=self.format_time(current_time))
-                
-                # Check if song ended
-                state = self.player.get_state()
-                if state == vlc.State.Ended:
-                    self.is_playing = False
-                    self.play_btn.config(text="▶")
-                    self.next_song()  # Auto-play next
-            except Exception:
-                pass
-        
-        # Schedule next update
-        self.after(500, self._update_ui)
-    
     @staticmethod
     def format_time(seconds):
         """Format time as M:SS."""
@@ -0,0 +1,93 @@
+import os
+
+
+def _key(filepath):
+    return os.path.normpath(filepath)
+
+
+class SongRegistry:
+    """
+    Lookup tables for the songs in the library, shared by the library tab and player.
+
+    Songs are found by filepath (normalized, so separator differences don't matter)
+    or by SUNO UUID, and by their position in the list currently on screen. The
+    position table is filled in the first time it is needed after the view changes,
+    so re-filtering costs nothing until something is looked up.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._by_path)
+
+    def __contains__(self, filepath):
+        return self.get(filepath) is not None
+
+    def clear(self):
+        self._by_path = {}   # normalized filepath -> song
+        self._by_uuid = {}   # SUNO UUID -> song
+        self.set_view([])
+
+    def add(self, songs):
+        """Register songs, replacing any already registered under the same filepath."""
+        for song in songs:
+            key = _key(song['filepath'])
+            old = self._by_path.get(key)
+            if old is not None and old.get('id') and self._by_uuid.get(old['id']) is old:
+                del self._by_uuid[old['id']]
+            self._by_path[key] = song
+            if song.get('id'):
+                self._by_uuid[song['id']] = song
+
+    def remove(self, filepaths):
+        for filepath in filepaths:
+            song = self._by_path.pop(_key(filepath), None)
+            if song is not None and song.get('id') and self._by_uuid.get(song['id']) is song:
+                del self._by_uuid[song['id']]
+
+    def get(self, filepath):
+        """Song at filepath, or None."""
+        if not filepath:
+            return None
+        song = self._by_path.get(_key(filepath))
+        if song is None and '\\' in filepath:
+            song = self._by_path.get(_key(filepath.replace('\\', '/')))
+        return song
+
+    def under(self, folder):
+        """Songs whose file is somewhere inside folder."""
+        prefix = os.path.join(_key(folder), '')
+        return [song for key, song in self._by_path.items() if key.startswith(prefix)]
+
+    def by_uuid(self, uuid):
+        return self._by_uuid.get(uuid) if uuid else None
+
+    def tag_key(self, filepath):
+        """Key a song's tag is stored under: its UUID, else its normalized filepath."""
+        song = self.get(filepath)
+        if song is not None and song.get('id'):
+            return song['id']
+        return _key(song['filepath'] if song is not None else filepath)
+
+    def set_view(self, songs):
+        """Record the list now on screen (positions are indexed lazily)."""
+        self._view = songs
+        self._positions = {}  # id(song) -> position; paths were normalized when songs were added
+        self._indexed = 0  # view entries already in _positions
+
+    def view_index(self, filepath):
+        """Position of a song in the current view, or None if it isn't shown."""
+        if not filepath:
+            return None
+        view = self._view
+        if self._indexed < len(view):
+            # Index new entries (the view may be a list a scan is still appending to)
+            positions = self._positions
+            for i in range(self._indexed, len(view)):
+                positions.setdefault(id(view[i]), i)
+            self._indexed = len(view)
+        song = self.get(filepath)
+        if song is None:
+            return None
+        return self._positions.get(id(song))
@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+
+from download_index import DATA_DIR
+from suno_utils import get_unique_filename
+
+
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+
+def _link(src, dst):
+    """
+    Make dst show src: a hard link, else a relative symlink, else a copy.
+    Created under a temporary name and renamed into place, so watchers see one
+    complete file appear. Returns the kind of entry made.
+    """
+    tmp = dst + ".link"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        kind = "hardlink"
+    except (OSError, NotImplementedError):
+        try:
+            # Relative, so the whole download folder can be moved
+            os.symlink(os.path.relpath(src, os.path.dirname(dst)), tmp)
+            kind = "symlink"
+        except (OSError, NotImplementedError):
+            shutil.copy2(src, tmp)
+            kind = "copy"
+    os.replace(tmp, dst)
+    return kind
+
+
+class SongStore:
+    """
+    One copy of every downloaded song, shown in as many folders as it belongs in.
+
+    Finished downloads are kept in .sunosync/store/<uuid><ext> inside the download
+    folder (the library doesn't scan dot-directories). The month/track layout and
+    any workspace or playlist folders get views of that file: hard links, so a song
+    in five playlists is downloaded once and stored once, and tags embedded into it
+    show up everywhere. Where hard links aren't possible (another drive, FAT/exFAT)
+    views are symlinks, failing that copies; if a song's first view can't be a link
+    the file itself is moved there and becomes its canonical copy.
+
+    Canonical paths and views are recorded in the DownloadIndex. prune() deletes
+    store files whose views (of every clip recorded against them) have all been
+    deleted, so removing a song from the library frees its space and lets a later
+    sync fetch it again.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.directory = index.directory
+        self.path = os.path.join(self.directory, STORE_DIR)
+        # Choosing a view's name and creating it must not interleave between download threads
+        self._lock = threading.Lock()
+
+    def add(self, part_path, uuid, ext):
+        """Move a finished download into the store; returns its canonical path."""
+        os.makedirs(self.path, exist_ok=True)
+        store_path = os.path.join(self.path, uuid + ext)
+        os.replace(part_path, store_path)
+        return store_path
+
+    def add_view(self, uuid, canonical, view_path):
+        """
+        Show the clip at view_path (made unique if taken) unless a view of it already
+        exists in that folder. Returns the view's path.
+        """
+        folder = os.path.normpath(os.path.dirname(view_path))
+        with self._lock:
+            for path, kind in self.index.views(uuid):
+                if os.path.normpath(os.path.dirname(path)) == folder and os.path.exists(path):
+                    return path
+            os.makedirs(folder, exist_ok=True)
+            view_path = get_unique_filename(view_path)
+            in_store = os.path.dirname(canonical) == self.path
+            if in_store and not self.index.views_of(canonical) and not self._can_hardlink(canonical, folder):
+                # No hard links here: let the first view be the file rather than a second copy
+                os.replace(canonical, view_path)
+                self.index.move_canonical(canonical, view_path)
+                kind = "canonical"
+            else:
+                kind = _link(canonical, view_path)
+            self.index.add_view(uuid, view_path, kind)
+        return view_path
+
+    def _can_hardlink(self, src, folder):
+        probe = os.path.join(folder, ".sunosync-link-probe")
+        try:
+            if os.path.lexists(probe):
+                os.remove(probe)
+            os.link(src, probe)
+            os.remove(probe)
+            return True
+        except (OSError, NotImplementedError):
+            return False
+
+    def prune(self):
+        """Delete store files nothing shows any more. Returns the number removed."""
+        if not os.path.isdir(self.path):
+            return 0
+        removed = 0
+        for entry in os.scandir(self.path):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                if entry.stat().st_nlink > 1:
+                    continue  # Still hard-linked from a view (wherever it has been moved to)
+                # Named after the clip it was downloaded for, but older downloads linked
+                # clips with the same audio to it: any of their symlinks or copies keeps it
+                views = self.index.views_of(entry.path)
+                if any(kind != "hardlink" and os.path.lexists(path) for _, path, kind in views):
+                    continue
+                os.remove(entry.path)
+                self.index.forget_views_of(entry.path)
+                removed += 1
+            except OSError as e:
+                print(f"Error pruning {entry.path}: {e}")
+        return removed
@@ -1,15 +1,64 @@
 import os
+import errno
+import shutil
 import time
+import hashlib
 import traceback
 import requests
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import zip_longest
 from urllib.parse import urlparse
 import threading
 import re
 
-from suno_utils import RateLimiter, get_downloaded_uuids, embed_metadata, sanitize_filename, get_unique_filename
+from suno_utils import RateLimiter, build_uuid_cache, embed_metadata, sanitize_filename, get_unique_filename
+from download_index import DownloadIndex, HASH_SIZE
+from song_store import SongStore
 
 GEN_API_BASE = "https://studio-api.prod.suno.com"
+# Minimum gap between list-page requests, shared by all the sources of a run
+PAGE_INTERVAL = 1.0
+# Sources whose next page is fetched at the same time
+PAGE_FETCHERS = 4
+# Clips waiting on the download pool before listing pauses for it to catch up
+DOWNLOAD_BACKLOG = 20
+# Batch size estimates: past downloads of the format needed before their average is used,
+# else songs sampled with HEAD requests, else bytes per second of audio
+MIN_SIZE_HISTORY = 5
+HEAD_SAMPLE = 8
+MP3_BYTES_PER_SECOND = 24000     # 192 kbps
+WAV_BYTES_PER_SECOND = 192000    # 48 kHz 16-bit stereo
+DEFAULT_DURATION = 180
+# Left free on the download drive after a batch
+FREE_SPACE_RESERVE = 100 * 1024 * 1024
+
+
+def _format_size(size):
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:,.1f} GB"
+    return f"{size / 1024 ** 2:,.1f} MB"
+
+
+class TokenExpired(Exception):
+    """The API rejected the token (401); the whole run stops."""
+
+
+class SyncSource:
+    """A feed, workspace or playlist being listed by a sync run, and how far it has got."""
+
+    def __init__(self, source, base_url, paged, page, collection):
+        self.type = source.get("type", "library")
+        self.name = source.get("name") or source.get("id") or self.type
+        self.base_url = base_url
+        self.paged = paged          # playlists come back in one response
+        self.page = page
+        self.collection = collection  # folder its songs are also shown in, or None
+        self.done = False
+        self.found_new = False
+        self.skipped_pages = 0      # pages in a row with nothing new (Smart Resume)
+
+    def url(self):
+        return f"{self.base_url}{self.page}" if self.paged else self.base_url
 
 
 class Signal:
@@ -36,6 +85,7 @@ class DownloaderSignals:
         self.status_changed = Signal(str)       # msg
         self.log_message = Signal((str, str))   # msg, type (info, error, success, downloading)
         self.progress_updated = Signal(int)     # percentage (optional usage)
+        self.download_started = Signal()        # run() began; download_complete follows
         self.download_complete = Signal(bool)   # success
         self.error_occurred = Signal(str)       # error message
         self.thumbnail_fetched = Signal((bytes, str)) # data, title/id context
@@ -44,6 +94,7 @@ class DownloaderSignals:
         self.song_started = Signal((str, str, bytes, dict)) # uuid, title, thumbnail_data, metadata
         self.song_updated = Signal((str, str, int))   # uuid, status, progress
         self.song_finished = Signal((str, bool, str)) # uuid, success, filepath
+        self.song_saved = Signal((dict,))             # library record for a finished file
         self.song_found = Signal((dict,))             # metadata (for preload)
 
 
@@ -59,11 +110,25 @@ class SunoDownloader:
         self.stop_event = threading.Event()
         self.config = {}
         self.rate_limiter = RateLimiter(0.0)
+        self.index = None  # DownloadIndex of the current download folder
+        self.store = None  # SongStore in that folder
+        # Held while a finished download is matched against the index and stored
+        self._finish_lock = threading.Lock()
+        self._bytes_downloaded = 0  # this run's, for the throughput summary
+        # This run's disk space check: free space when it started, bytes queued since
+        self._free_at_start = None
+        self._bytes_committed = 0
+        self._sampled_size = None  # mean HEAD size of a few of the run's MP3s, 0 if none answered
 
     def configure(self, token, directory, max_pages, start_page, 
                   organize_by_month, embed_metadata_enabled, prefer_wav, download_delay, 
                   filter_settings=None, scan_only=False, target_songs=None, save_lyrics=True,
-                  organize_by_track=False, stems_only=False, smart_resume=False):
+                  organize_by_track=False, stems_only=False, smart_resume=False, sources=None):
+        """
+        sources: feeds, workspaces and playlists to sync in one run, as dicts with
+        "type" ("library", "public", "workspace" or "playlist"), "id" and "name".
+        If not given, the one selected by filter_settings.
+        """
         self.config = {
             "token": token,
             "directory": directory,
@@ -79,7 +144,8 @@ class SunoDownloader:
             "target_songs": target_songs or [], # List of dicts or UUIDs
             "organize_by_track": organize_by_track,
             "stems_only": stems_only,
-            "smart_resume": smart_resume
+            "smart_resume": smart_resume,
+            "sources": sources or [],
         }
         self.rate_limiter = RateLimiter(self.config["download_delay"])
 
@@ -99,6 +165,12 @@ class SunoDownloader:
 
     def run(self):
         self.stop_event.clear()
+        self.signals.download_started.emit()
+        self._bytes_downloaded = 0
+        self._free_at_start = None
+        self._bytes_committed = 0
+        self._sampled_size = None
+        started = time.monotonic()
         print(f"DEBUG: Starting download/preload run()")
         print(f"DEBUG: Config keys: {list(self.config.keys())}")
         
@@ -140,12 +212,29 @@ class SunoDownloader:
         filters = self.config.get("filter_settings", {})
         
         headers = {"Authorization": f"Bearer {token}"}
-        existing_uuids = get_downloaded_uuids(directory)
+        self._open_index(directory)
+        if self.store:
+            # Songs deleted from every folder they were shown in can be fetched again
+            pruned = self.store.prune()
+            if pruned:
+                self._log(f"Removed {pruned} stored songs no longer shown in any folder.", "info")
+        # Read once per run, however many sources it lists
+        self.signals.status_changed.emit("Scanning...")
+        self._log("Scanning existing files...", "info")
+        existing_uuids = build_uuid_cache(directory)
+        if self.index:
+            existing_uuids |= self.index.uuids()
+        self._log(f"Found {len(existing_uuids)} existing songs.", "info")
 
         # Mode 1: Download Specific Songs (from Preload)
         if target_songs:
             self.signals.status_changed.emit(f"Downloading {len(target_songs)} selected songs...")
             self._log(f"Starting download of {len(target_songs)} selected songs...", "info")
+            to_fetch = [song for song in target_songs if song.get("id") not in existing_uuids]
+            if not self._check_free_space(directory, to_fetch, headers):
+                self.signals.status_changed.emit("Error")
+                self.signals.download_complete.emit(False)
+                return
             
             with ThreadPoolExecutor(max_workers=3) as executor:
                 futures = []
@@ -160,6 +249,7 @@ class SunoDownloader:
                             token,
                             existing_uuids,
                             self.rate_limiter,
+                            song_data.get("_collections"),
                         )
                     )
                 
@@ -171,11 +261,11 @@ class SunoDownloader:
                     try:
                         future.result()
                     except Exception as e:
-                        import traceback
                         error_msg = f"Download error: {str(e)}\n{traceback.format_exc()}"
                         self._log(error_msg, "error")
                         print(error_msg)  # Also print for debug log
             
+            self._log_throughput(started)
             if self.is_stopped():
                 self.signals.status_changed.emit("Stopped")
             else:
@@ -183,426 +273,493 @@ class SunoDownloader:
             self.signals.download_complete.emit(True)
             return
 
-        # Mode 2: Scan/Download from Feed/Workspace
-        self.signals.status_changed.emit("Scanning...")
-        self._log("Scanning existing files...", "info")
-        self._log(f"Found {len(existing_uuids)} existing songs.", "info")
+        # Mode 2: Scan/Download from Feed/Workspaces/Playlists
+        sources = self._sources(filters)
+        self.signals.status_changed.emit("Fetching List...")
+        self._log(f"Fetching song list from {len(sources)} source(s)...", "info")
+
+        success = True
+        try:
+            success = self._sync(sources, directory, headers, token, existing_uuids, filters, scan_only)
+        except Exception as exc:
+            tb = traceback.format_exc()
+            self._log(f"Critical Error: {exc}\n{tb}", "error")
+            self.signals.error_occurred.emit(f"Critical Error: {exc}")
+            success = False
+
+        self._log_throughput(started)
+        if self.is_stopped():
+            self.signals.status_changed.emit("Stopped")
+        elif success:
+            self.signals.status_changed.emit("Complete")
+        else:
+            self.signals.status_changed.emit("Error")
+            
+        self.signals.download_complete.emit(success)
 
-        # --- URL Selection Logic ---
+    def _sources(self, filters):
+        """The sources this run lists: the configured ones, else the one the filters select."""
+        sources = [source for source in self.config.get("sources") or []
+                   if source.get("id") or source.get("type") in ("library", "public")]
+        if sources:
+            return sources
         workspace_id = filters.get("workspace_id")
-        is_public = filters.get("is_public", False)
-        
+        if workspace_id:
+            kind = "playlist" if filters.get("type") == "playlist" else "workspace"
+            return [{"type": kind, "id": workspace_id, "name": filters.get("workspace_name") or workspace_id}]
+        if filters.get("is_public"):
+            return [{"type": "public", "name": "Public Feed"}]
+        return [{"type": "library", "name": "My Library"}]
+
+    def _source_url(self, source, filters):
+        """(base_url, paged) for listing a source; paged URLs end in 'page=' for the page number."""
         params = []
         # Common params
         if filters.get("liked"): params.append("liked=true")
         if filters.get("trashed"): params.append("trashed=true")
-        
-        if workspace_id:
-            # Workspace/Project Endpoint
-            # User correction: Use /api/project/{id} (no /clips, no trailing slash before ?)
-            if workspace_id == "default":
-                # Assuming default project ID is "default"
-                base_url = "https://studio-api.prod.suno.com/api/project/default"
-            else:
-                # Check if it is a playlist or project
-                if filters.get("type") == "playlist":
-                     # Playlists might not support pagination, so we'll try without page parameter first
-                     base_url = f"https://studio-api.prod.suno.com/api/playlist/{workspace_id}/"
-                else:
-                     base_url = f"https://studio-api.prod.suno.com/api/project/{workspace_id}"
-            
-            self._log(f"Fetching from {filters.get('type', 'Project')}: {filters.get('workspace_name', workspace_id)}", "info")
-        elif is_public:
+
+        kind = source.get("type")
+        if kind == "playlist":
+            base_url = f"{GEN_API_BASE}/api/playlist/{source['id']}/"
+        elif kind == "workspace":
+            # Workspace/Project Endpoint (no /clips, no trailing slash before ?)
+            base_url = f"{GEN_API_BASE}/api/project/{source['id']}"
+        elif kind == "public":
             # Public Feed (v2)
-            base_url = "https://studio-api.prod.suno.com/api/feed/v2"
+            base_url = f"{GEN_API_BASE}/api/feed/v2"
             params.append("is_public=true")
-            self._log("Fetching from Public Feed", "info")
         else:
             # My Library (v1) - Default
-            base_url = "https://studio-api.prod.suno.com/api/feed/"
-            self._log("Fetching from My Library", "info")
-            
-        # Append params to base_url
+            base_url = f"{GEN_API_BASE}/api/feed/"
+
         if params:
             separator = "&" if "?" in base_url else "?"
             base_url += separator + "&".join(params)
-        
-        # Check if this is a playlist (playlists might not support pagination)
-        is_playlist = filters and filters.get("type") == "playlist"
-        
-        # Ensure URL ends with page= for the loop (unless it's a playlist)
-        if not is_playlist:
+        # Playlists don't support pagination
+        paged = kind != "playlist"
+        if paged:
             separator = "&" if "?" in base_url else "?"
             base_url += f"{separator}page="
+        return base_url, paged
+
+    def _smart_resume_threshold(self, library_size):
+        """Pages in a row with no new songs before Smart Resume stops, scaled with library size."""
+        if library_size < 100:
+            return 2
+        if library_size < 1000:
+            return 5
+        if library_size < 5000:
+            return 10
+        return 20
+
+    def _sync(self, sources, directory, headers, token, known, filters, scan_only):
+        """
+        List every source and download (or, when scan_only, report) the clips not in known.
+
+        Sources are listed in rounds: each round fetches the next page of every source
+        still going, concurrently but no more often than PAGE_INTERVAL between them,
+        then hands the new clips to one download pool taking a clip from each source
+        in turn, so a huge source can't hold the others up. The next round is fetched
+        while those clips download, until DOWNLOAD_BACKLOG of them are waiting. A clip
+        listed by several sources is downloaded once and shown in each of their
+        folders. Returns False if a source couldn't be listed.
+        """
+        max_pages = self.config.get("max_pages", 0)
+        start_page = self.config.get("start_page", 1)
+        smart_resume = self.config.get("smart_resume")
+        threshold = self._smart_resume_threshold(len(known))
+        if smart_resume:
+            self._log(f"Smart Resume: Will stop a source after {threshold} consecutive pages with no new songs (library size: {len(known)} songs).", "info")
+
+        cursors = []
+        for source in sources:
+            base_url, paged = self._source_url(source, filters)
+            cursor = SyncSource(source, base_url, paged, start_page, self._collection_dir(directory, source))
+            cursor.done = max_pages > 0 and start_page > max_pages
+            cursors.append(cursor)
+            self._log(f"Fetching from {cursor.name}: {base_url}...", "info")
+
+        page_limiter = RateLimiter(PAGE_INTERVAL)
+        claimed = {}  # uuid -> folders to show it in, for every clip queued this run
+        pages = []  # the round being fetched: [(cursor, future)]
+        downloading = {}  # future -> (clip, number of folders it was queued with)
+        success = True
+        with ThreadPoolExecutor(max_workers=3) as executor, \
+                ThreadPoolExecutor(max_workers=PAGE_FETCHERS) as fetcher:
+            while not self.is_stopped():
+                active = [cursor for cursor in cursors if not cursor.done]
+                if not pages and active and len(downloading) < DOWNLOAD_BACKLOG:
+                    for cursor in active:
+                        self._log(f"{cursor.name}: page {cursor.page}...", "info")
+                    pages = [(cursor, fetcher.submit(self._fetch_page, cursor, headers, page_limiter))
+                             for cursor in active]
+                if not pages and not downloading:
+                    break
 
-        self._log(f"API URL: {base_url}...", "info")
+                if not pages or not all(future.done() for _, future in pages):
+                    # Wait for the round's pages or a download, whichever comes first
+                    done, _ = wait([future for _, future in pages if not future.done()] + list(downloading),
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in downloading:
+                            self._finish_download(future, *downloading.pop(future), claimed)
+                    continue
 
-        max_pages = self.config.get("max_pages", 0)
-        page_num = self.config.get("start_page", 1)
+                queues = []
+                for cursor, future in pages:
+                    try:
+                        data = future.result()
+                    except TokenExpired:
+                        self._log("Error: Token expired.", "error")
+                        self.signals.error_occurred.emit("Token expired. Please get a new token.")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        return False
+                    if data is None:
+                        cursor.done = True
+                        success = False
+                        continue
+                    queues.append(self._take_new(cursor, data, filters, scan_only, known, claimed))
+                    self._advance(cursor, max_pages, threshold if smart_resume else 0)
+                pages = []
+
+                # Round-robin: first new clip of each source, then the second of each, ...
+                clips = [clip for turn in zip_longest(*queues) for clip in turn if clip is not None]
+                if scan_only:
+                    for clip in clips:
+                        if self.is_stopped(): break
+                        # Kept with the clip so downloading it from the preload list adds the same views
+                        clip["_collections"] = claimed.get(clip.get("id"), [])
+                        self.signals.song_found.emit(clip)
+                    continue
 
-        success = True
+                if not self._check_free_space(directory, clips, headers):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return False
+                for clip in clips:
+                    if self.is_stopped(): break
+                    collections = claimed.get(clip.get("id"), [])
+                    future = executor.submit(
+                        self.download_single_song,
+                        clip,
+                        directory,
+                        headers,
+                        token,
+                        known,
+                        self.rate_limiter,
+                        collections,
+                    )
+                    downloading[future] = (clip, len(collections))
+
+            if self.is_stopped():
+                executor.shutdown(wait=False, cancel_futures=True)
+        return success
+
+    def _finish_download(self, future, clip, shown, claimed):
+        """
+        After a clip's download: show it in any folders of sources that listed it while
+        it was downloading, which may have come too late for its views.
+        """
+        uuid = clip.get("id")
         try:
-            self.signals.status_changed.emit("Fetching List...")
-            self._log("Fetching song list...", "info")
-            
-            # Build UUID cache from existing files for duplicate detection
-            self._log("Building UUID cache from existing files...", "info")
-            from suno_utils import build_uuid_cache
-            uuid_cache = build_uuid_cache(directory)
-            self._log(f"Found {len(uuid_cache)} existing songs in cache.", "info")
-            
-            consecutive_skipped_pages = 0
-            # Adaptive threshold: scale with library size
-            # For small libraries (< 100 songs): 2 pages
-            # For medium libraries (100-1000 songs): 5 pages  
-            # For large libraries (1000-5000 songs): 10 pages
-            # For very large libraries (> 5000 songs): 20 pages
-            library_size = len(uuid_cache)
-            if library_size < 100:
-                smart_resume_threshold = 2
-            elif library_size < 1000:
-                smart_resume_threshold = 5
-            elif library_size < 5000:
-                smart_resume_threshold = 10
+            future.result()
+        except Exception as e:
+            error_msg = f"Download error: {str(e)}\n{traceback.format_exc()}"
+            self._log(error_msg, "error")
+            print(error_msg)  # Also print for debug log
+            self.signals.song_updated.emit(uuid, "Error", 0)
+            return
+        late = claimed.get(uuid, [])[shown:]
+        if late:
+            self._show_in_collection(uuid, clip.get("title") or uuid, late)
+
+    def _estimate_batch(self, clips, headers):
+        """(bytes, basis): roughly how much downloading these clips will write, and how that was worked out."""
+        ext = ".wav" if self.config.get("prefer_wav") else ".mp3"
+        count, average = self.index.average_size(ext) if self.index else (0, None)
+        if count >= MIN_SIZE_HISTORY:
+            return int(average * len(clips)), f"average of {count} past {ext} downloads"
+
+        if ext == ".mp3":
+            if self._sampled_size is None:
+                # The list's audio_url is the MP3 stream itself; ask a few for their size, once a run
+                urls = [clip.get("audio_url") for clip in clips if clip.get("audio_url")][:HEAD_SAMPLE]
+                with ThreadPoolExecutor(max_workers=HEAD_SAMPLE) as pool:
+                    sizes = [size for size in pool.map(lambda url: self._content_length(url, headers), urls) if size]
+                self._sampled_size = sum(sizes) / len(sizes) if sizes else 0
+            if self._sampled_size:
+                return int(self._sampled_size * len(clips)), "sampled song sizes"
+
+        # WAVs are converted on request, so there is nothing to ask yet: go by duration
+        seconds = 0
+        for clip in clips:
+            try:
+                seconds += float((clip.get("metadata") or {}).get("duration") or DEFAULT_DURATION)
+            except (TypeError, ValueError):
+                seconds += DEFAULT_DURATION
+        rate = WAV_BYTES_PER_SECOND if ext == ".wav" else MP3_BYTES_PER_SECOND
+        return int(seconds * rate), "song durations"
+
+    def _content_length(self, url, headers):
+        try:
+            r = requests.head(url, headers=headers, timeout=10, allow_redirects=True)
+            if r.status_code == 200:
+                return int(r.headers.get("content-length", 0))
+        except Exception:
+            pass
+        return 0
+
+    def _check_free_space(self, directory, clips, headers):
+        """
+        Estimate a batch's size before downloading it; False (and an error) if it and
+        the batches already queued this run won't fit in the space free when the run began.
+        """
+        if not clips:
+            return True
+        needed, basis = self._estimate_batch(clips, headers)
+        if self._free_at_start is None:
+            try:
+                self._free_at_start = shutil.disk_usage(directory).free
+            except OSError as e:
+                self._log(f"Could not check free space: {e}", "warning")
+                return True
+        free = self._free_at_start
+        committed = self._bytes_committed + needed
+        self._log(f"{len(clips)} songs to download: about {_format_size(needed)} (from {basis}); "
+                  f"{_format_size(committed)} this run of {_format_size(free)} free.", "info")
+        if committed + FREE_SPACE_RESERVE > free:
+            error_msg = (f"Not enough disk space: this run's songs need about {_format_size(committed)}, "
+                         f"but only {_format_size(free)} is free in {directory}.")
+            self._log(error_msg, "error")
+            self.signals.error_occurred.emit(error_msg)
+            return False
+        self._bytes_committed = committed
+        return True
+
+    def _log_throughput(self, started):
+        elapsed = time.monotonic() - started
+        if self._bytes_downloaded and elapsed > 0:
+            self._log(f"Downloaded {_format_size(self._bytes_downloaded)} in {elapsed:.0f}s "
+                      f"({self._bytes_downloaded / (1024 * 1024) / elapsed:.1f} MB/s).", "info")
+
+    def _fetch_page(self, cursor, headers, page_limiter):
+        """A source's current page of results, or None if it couldn't be fetched. Raises TokenExpired."""
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                page_limiter.wait()
+                r = requests.get(cursor.url(), headers=headers, timeout=30)
+
+                # 404 Fallback Logic: Project -> Playlist
+                if r.status_code == 404:
+                    if "/api/project/" in cursor.base_url:
+                        self._log(f"{cursor.name}: Project endpoint 404. Switching to Playlist endpoint...", "warning")
+                        # /api/project/ID?...page= -> /api/playlist/ID/?... (playlists aren't paged)
+                        cursor.base_url = re.sub(r"[?&]page=$", "", cursor.base_url)
+                        cursor.base_url = re.sub(r"/api/project/([^?&]+)", r"/api/playlist/\1/", cursor.base_url)
+                        cursor.paged = False
+                        continue # Retry immediately with new URL
+                    self._log(f"{cursor.name}: Resource not found (404).", "error")
+                    return None
+
+                if r.status_code == 401:
+                    raise TokenExpired()
+                r.raise_for_status()
+                return r.json()
+            except TokenExpired:
+                raise
+            except Exception as exc:
+                if attempt < max_retries - 1:
+                    self._log(f"Connection error on {cursor.name} page {cursor.page} (Attempt {attempt+1}/{max_retries}): {exc}. Retrying...", "warning")
+                    time.sleep(2)
+                else:
+                    self._log(f"Request failed after {max_retries} attempts: {exc}", "error")
+                    self.signals.error_occurred.emit(f"Network error on {cursor.name} page {cursor.page}: {exc}")
+        return None
+
+    def _extract_items(self, data):
+        """
+        The entries of a list response, whichever shape it has:
+        Project/Workspace: {"project_clips": [{"clip": {...}}, ...]}
+        Main Library: [{"id": ...}, ...] or {"clips": [...]}
+        Playlist: {"playlist_clips": [...]}, possibly nested under "playlist"
+        """
+        if isinstance(data, list):
+            return data
+        if not isinstance(data, dict):
+            return []
+        for key in ("project_clips", "playlist_clips", "clips", "items", "songs", "tracks"):
+            if key in data:
+                return data[key] or []
+        playlist = data.get("playlist")
+        if isinstance(playlist, dict):
+            for key in ("playlist_clips", "clips", "items"):
+                if key in playlist:
+                    return playlist[key] or []
+        return []
+
+    def _take_new(self, cursor, data, filters, scan_only, known, claimed):
+        """
+        Clips on a source's page that pass the filters and aren't downloaded or queued
+        yet. Already-downloaded clips get a view in the source's folder; clips another
+        source has queued get its folder added to their views instead.
+        """
+        raw_items = self._extract_items(data)
+        if not raw_items:
+            if cursor.type == "playlist":
+                self._log(f"WARNING: No items found in playlist response. Response type: {type(data)}, Keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}", "warning")
+            # An empty page is the end of the list
+            cursor.done = True
+            return []
+
+        new = []
+        unseen = 0
+        for clip in self._filter_clips(raw_items, filters, scan_only):
+            uuid = clip.get("id")
+            title = clip.get("title") or uuid
+            if uuid and uuid in known:
+                self._log(f"Skipping {title} (already downloaded)", "info")
+                if cursor.collection and not scan_only:
+                    self._show_in_collection(uuid, title, [cursor.collection])
+                continue
+            unseen += 1
+            if uuid and uuid in claimed:
+                # Listed by another source as well: downloaded once, shown in both folders
+                if cursor.collection and cursor.collection not in claimed[uuid]:
+                    claimed[uuid].append(cursor.collection)
+                continue
+            if uuid:
+                claimed[uuid] = [cursor.collection] if cursor.collection else []
+            new.append(clip)
+
+        if unseen:
+            cursor.found_new = True
+            cursor.skipped_pages = 0
+        else:
+            self._log(f"{cursor.name} page {cursor.page}: All songs filtered out or skipped.", "info")
+            # Only count skipped pages once new songs have turned up, so a source
+            # isn't stopped on its first, already-downloaded pages
+            if cursor.found_new:
+                cursor.skipped_pages += 1
+        return new
+
+    def _advance(self, cursor, max_pages, smart_resume_threshold):
+        """Move a source on to its next page, or mark it done."""
+        if cursor.done:
+            return
+        if not cursor.paged:
+            cursor.done = True
+        elif smart_resume_threshold and cursor.found_new and cursor.skipped_pages >= smart_resume_threshold:
+            self._log(f"Smart Resume: {cursor.name} had new songs earlier, but none in the last {smart_resume_threshold} consecutive pages. Stopping it.", "success")
+            cursor.done = True
+        elif max_pages > 0 and cursor.page >= max_pages:
+            self._log(f"{cursor.name}: Reached max pages limit ({max_pages}).", "info")
+            cursor.done = True
+        cursor.page += 1
+
+    def _filter_clips(self, raw_items, filters, scan_only):
+        """The clips among a page's entries that pass the UI filters."""
+        filtered_clips = []
+
+        # Setup Filter Flags from UI
+        filter_liked_only = filters.get("liked", False)
+        filter_hide_stems = filters.get("hide_gen_stems", False)
+        filter_exclude_trash = not filters.get("trashed", False)
+        filter_hide_disliked = filters.get("hide_disliked", False)
+        filter_public_only = filters.get("is_public", False)
+        filter_hide_studio = filters.get("hide_studio_clips", False)
+        filter_type = filters.get("type", "all")
+        search_text = filters.get("search_text", "").strip().lower()
+
+        # Override: If Stems Only is active, disable Hide Stems
+        if self.config.get("stems_only"):
+            filter_hide_stems = False
+
+        for item in raw_items:
+            # A. UNWRAP STRATEGY
+            if isinstance(item, dict) and "clip" in item:
+                song_data = item["clip"]
             else:
-                smart_resume_threshold = 20
-            
-            # Track if we've found ANY new songs yet (to avoid stopping on initial already-downloaded pages)
-            found_new_songs = False
-            
-            if self.config.get("smart_resume"):
-                self._log(f"Smart Resume: Will stop after {smart_resume_threshold} consecutive pages with no new songs (library size: {library_size} songs).", "info")
-            
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                while not self.is_stopped():
-                    if max_pages > 0 and page_num > max_pages:
-                        self._log(f"Reached max pages limit ({max_pages}). Stopping.", "info")
-                        break
+                song_data = item
 
-                    self._log(f"Page {page_num}...", "info")
-                    # Retry logic for fetching page
-                    max_retries = 3
-                    for attempt in range(max_retries):
-                        try:
-                            # For playlists, don't append page number
-                            if is_playlist:
-                                url = base_url
-                            else:
-                                url = f"{base_url}{page_num}"
-                            # Increased timeout to 30s and added retry loop
-                            r = requests.get(url, headers=headers, timeout=30)
-                            
-                            # 404 Fallback Logic: Project -> Playlist
-                            if r.status_code == 404:
-                                if "/api/project/" in base_url:
-                                    self._log("Project endpoint 404. Switching to Playlist endpoint...", "warning")
-                                    # Regex replace /api/project/ID -> /api/playlist/ID/
-                                    base_url = re.sub(r"/api/project/([^?&]+)", r"/api/playlist/\1/", base_url)
-                                    continue # Retry immediately with new URL
-                                else:
-                                    self._log("Error: Resource not found (404).", "error")
-                                    success = False
-                                    break
-
-                            if r.status_code == 401:
-                                self._log("Error: Token expired.", "error")
-                                self.signals.error_occurred.emit("Token expired. Please get a new token.")
-                                success = False
-                                break # Break retry loop, outer loop will also break due to success=False
-                            r.raise_for_status()
-                            data = r.json()
-                            
-                            # Debug: Log response structure for playlists
-                            if is_playlist:
-                                print(f"\n=== PLAYLIST API DEBUG ===")
-                                print(f"URL: {url}")
-                                print(f"Response Status: {r.status_code}")
-                                print(f"Response Type: {type(data)}")
-                                if isinstance(data, dict):
-                                    print(f"Response Keys: {list(data.keys())}")
-                                    # Check for various possible keys
-                                    for key in ["playlist_clips", "clips", "items", "songs", "tracks", "playlist"]:
-                                        if key in data:
-                                            items = data[key]
-                                            if isinstance(items, list):
-                                                print(f"Found '{key}' with {len(items)} items")
-                                                if len(items) > 0:
-                                                    print(f"First item keys: {list(items[0].keys()) if isinstance(items[0], dict) else 'Not a dict'}")
-                                            elif isinstance(items, dict):
-                                                print(f"Found '{key}' as dict with keys: {list(items.keys())}")
-                                elif isinstance(data, list):
-                                    print(f"Response is a list with {len(data)} items")
-                                    if len(data) > 0:
-                                        print(f"First item type: {type(data[0])}")
-                                        if isinstance(data[0], dict):
-                                            print(f"First item keys: {list(data[0].keys())}")
-                                print(f"Full Response (first 1000 chars): {str(data)[:1000]}")
-                                print(f"=== END PLAYLIST DEBUG ===\n")
-                                
-                                self._log(f"Playlist API Response Keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}", "info")
-                            
-                            # If successful, break the retry loop
-                            break 
-                        except Exception as exc:
-                            if attempt < max_retries - 1:
-                                self._log(f"Connection error on page {page_num} (Attempt {attempt+1}/{max_retries}): {exc}. Retrying...", "warning")
-                                time.sleep(2)
-                                continue
-                            else:
-                                self._log(f"Request failed after {max_retries} attempts: {exc}", "error")
-                                self.signals.error_occurred.emit(f"Network error on page {page_num}: {exc}")
-                                success = False
-                                break # Break retry loop
-                    
-                    if not success:
-                        break # Break page loop
+            if not song_data:
+                continue
 
-                    # Handle different API response structures and robustly unwrap clips
-                    # 1. Project/Workspace: {"project_clips": [{"clip": {...}}, ...]}
-                    # 2. Main Library: [{"id": ...}, ...] or {"clips": [...]}
-                    
-                    # --- WORKSPACE PARSING LOGIC ---
-                    
-                    # 1. Identify the list source
-                    raw_data = data
-                    raw_items = []
-                    
-                    if isinstance(raw_data, dict):
-                        # Try various possible keys for playlist/workspace data
-                        if "project_clips" in raw_data:
-                            raw_items = raw_data["project_clips"]
-                        elif "playlist_clips" in raw_data:
-                            raw_items = raw_data["playlist_clips"]
-                        elif "clips" in raw_data:
-                            raw_items = raw_data["clips"]
-                        elif "items" in raw_data:
-                            raw_items = raw_data["items"]
-                        elif "songs" in raw_data:
-                            raw_items = raw_data["songs"]
-                        elif "tracks" in raw_data:
-                            raw_items = raw_data["tracks"]
-                        elif "playlist" in raw_data and isinstance(raw_data["playlist"], dict):
-                            # Nested playlist structure
-                            playlist_data = raw_data["playlist"]
-                            if "playlist_clips" in playlist_data:
-                                raw_items = playlist_data["playlist_clips"]
-                            elif "clips" in playlist_data:
-                                raw_items = playlist_data["clips"]
-                            elif "items" in playlist_data:
-                                raw_items = playlist_data["items"]
-                    elif isinstance(raw_data, list):
-                        # Direct list of items
-                        raw_items = raw_data
-                    
-                    if is_playlist:
-                        print(f"Parsed {len(raw_items)} items from playlist response")
-                        self._log(f"Parsed {len(raw_items)} items from playlist response", "info")
-                        if len(raw_items) == 0:
-                            print(f"\n!!! WARNING: No items found in playlist response !!!")
-                            print(f"Response type: {type(data)}")
-                            if isinstance(data, dict):
-                                print(f"Response keys: {list(data.keys())}")
-                                # Print full response structure
-                                import json as json_module
-                                try:
-                                    response_str = json_module.dumps(data, indent=2)
-                                    print(f"Full Response:\n{response_str}")
-                                except Exception as e:
-                                    print(f"Could not serialize response: {e}")
-                                    print(f"Response repr: {repr(data)[:1000]}")
-                            print(f"!!! END WARNING !!!\n")
-                            
-                            self._log(f"WARNING: No items found in playlist response. Response type: {type(data)}, Keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}", "warning")
-
-                    filtered_clips = []
-
-                    # 2. Setup Filter Flags from UI
-                    filter_liked_only = filters.get("liked", False)
-                    filter_hide_stems = filters.get("hide_gen_stems", False)
-                    filter_exclude_trash = not filters.get("trashed", False)
-                    filter_hide_disliked = filters.get("hide_disliked", False)
-                    filter_public_only = filters.get("is_public", False)
-                    filter_hide_studio = filters.get("hide_studio_clips", False)
-                    filter_type = filters.get("type", "all")
-                    search_text = filters.get("search_text", "").strip().lower()
-
-                    # Override: If Stems Only is active, disable Hide Stems
-                    if self.config.get("stems_only"):
-                        filter_hide_stems = False
-
-                    for index, item in enumerate(raw_items):
-                        # A. UNWRAP STRATEGY
-                        if isinstance(item, dict) and "clip" in item:
-                            song_data = item["clip"]
-                        else:
-                            song_data = item
-
-                        if not song_data:
-                            continue
-
-                        # B. EXTRACT VARIABLES
-                        title = song_data.get("title", "") or "Unknown Title"
-                        
-                        # Robust Liked Check
-                        is_liked_bool = song_data.get("is_liked", False)
-                        reaction = song_data.get("reaction", {}) 
-                        if reaction is None: reaction = {} 
-                        reaction_type = reaction.get("reaction_type", "")
-                        vote = song_data.get("vote", "") or song_data.get("metadata", {}).get("vote", "")
-                        
-                        # It is liked if Boolean is True OR Reaction is 'L' OR Vote is 'up'
-                        is_liked = is_liked_bool or (reaction_type == "L") or (vote == "up")
-
-                        # Extract metadata for filters
-                        metadata = song_data.get("metadata", {}) or {}
-                        if metadata is None: metadata = {}
-                        clip_type = metadata.get("type", "")
-
-                        is_stem = self._is_stem(song_data)
-
-                        # Trash Check
-                        is_trashed = song_data.get("is_trashed", False)
-                        
-                        # Public Check
-                        is_public = song_data.get("is_public", False)
-                        
-                        # Audio URL
-                        audio_url = song_data.get("audio_url")
-
-                        # D. APPLY FILTERS
-                        
-                        # 0. Audio URL (Critical)
-                        if not audio_url and not scan_only:
-                            continue
-
-                        # 1. Trash Filter
-                        if filter_exclude_trash and is_trashed:
-                            continue
-
-                        # 2. Stem Filter
-                        if filter_hide_stems and is_stem:
-                            continue
-
-                        # 2b. Stems Only Filter
-                        if self.config.get("stems_only") and not is_stem:
-                            continue
-
-                        # 3. Liked Filter
-                        if filter_liked_only:
-                            if not is_liked:
-                                continue
-                        
-                        # 4. Hide Disliked
-                        if filter_hide_disliked and (vote == "down" or reaction_type == "D"):
-                            continue
-
-                        # 5. Public Only
-                        if filter_public_only and not is_public:
-                            continue
-                            
-                        # 6. Hide Studio
-                        if filter_hide_studio and clip_type == "studio_clip":
-                            continue
-                            
-                        # 7. Type Filter
-                        if filter_type == "uploads" and clip_type != "upload":
-                            continue
-                            
-                        # 8. Search Text
-                        if search_text:
-                            tags = metadata.get("tags", "") or ""
-                            prompt = metadata.get("prompt", "") or ""
-                            searchable_content = f"{title_lower} {tags.lower()} {prompt.lower()}"
-                            if search_text not in searchable_content:
-                                continue
-
-                        # Extract UUID
-                        uuid = song_data.get("id")
-
-                        # 9. Duplicate Check (Metadata-Based)
-                        if uuid and uuid in uuid_cache:
-                            self._log(f"Skipping {title} (UUID found in cache)", "info")
-                            continue
-
-                        # E. SUCCESS
-                        filtered_clips.append(song_data)
-
-
-                    if not filtered_clips:
-                        self._log(f"Page {page_num}: All songs filtered out or skipped.", "info")
-                    
-                    # Track if we found new songs on this page
-                    if filtered_clips:
-                        found_new_songs = True
-                        consecutive_skipped_pages = 0  # Reset counter when we find new songs
-                    else:
-                        # Only count skipped pages if we've already found some new songs
-                        # This prevents stopping on initial pages of already-downloaded content
-                        if found_new_songs:
-                            consecutive_skipped_pages += 1
-                        # If we haven't found any new songs yet, don't count skipped pages
-                        # This allows scanning through already-downloaded pages at the start
-                         
-                    # Smart Resume: Only stop if we've found new songs before, then hit threshold
-                    # This ensures we scan past initial already-downloaded pages
-                    if self.config.get("smart_resume") and found_new_songs and consecutive_skipped_pages >= smart_resume_threshold:
-                        self._log(f"Smart Resume: Found new songs earlier, but no new songs in last {smart_resume_threshold} consecutive pages. Stopping scan.", "success")
-                        success = True
-                        break
-                    
-                    if scan_only:
-                        for clip in filtered_clips:
-                            if self.is_stopped(): break
-                            self.signals.song_found.emit(clip)
-                    else:
-                        futures = []
-                        for clip in filtered_clips:
-                            if self.is_stopped(): break
-                            futures.append(
-                                executor.submit(
-                                    self.download_single_song,
-                                    clip,
-                                    directory,
-                                    headers,
-                                    token,
-                                    existing_uuids,
-                                    self.rate_limiter,
-                                )
-                            )
-
-                        for future in futures:
-                            if self.is_stopped():
-                                executor.shutdown(wait=False, cancel_futures=True)
-                                break
-                            try:
-                                future.result()
-                            except Exception:
-                                pass
-
-                    # For playlists, only fetch once (no pagination)
-                    if is_playlist:
-                        break
-                    
-                    # Check if stopped before continuing to next page
-                    if self.is_stopped():
-                        break
-                    
-                    page_num += 1
-                    time.sleep(1)
-        except Exception as exc:
-            tb = traceback.format_exc()
-            self._log(f"Critical Error: {exc}\n{tb}", "error")
-            self.signals.error_occurred.emit(f"Critical Error: {exc}")
-            success = False
+            # B. EXTRACT VARIABLES
+            title = song_data.get("title", "") or "Unknown Title"
 
-        if self.is_stopped():
-            self.signals.status_changed.emit("Stopped")
-        elif success:
-            self.signals.status_changed.emit("Complete")
-        else:
-            self.signals.status_changed.emit("Error")
-            
-        self.signals.download_complete.emit(success)
+            # Robust Liked Check
+            is_liked_bool = song_data.get("is_liked", False)
+            reaction = song_data.get("reaction", {})
+            if reaction is None: reaction = {}
+            reaction_type = reaction.get("reaction_type", "")
+            vote = song_data.get("vote", "") or song_data.get("metadata", {}).get("vote", "")
+
+            # It is liked if Boolean is True OR Reaction is 'L' OR Vote is 'up'
+            is_liked = is_liked_bool or (reaction_type == "L") or (vote == "up")
+
+            # Extract metadata for filters
+            metadata = song_data.get("metadata", {}) or {}
+            clip_type = metadata.get("type", "")
+
+            is_stem = self._is_stem(song_data)
+
+            # Trash Check
+            is_trashed = song_data.get("is_trashed", False)
+
+            # Public Check
+            is_public = song_data.get("is_public", False)
+
+            # Audio URL
+            audio_url = song_data.get("audio_url")
+
+            # C. APPLY FILTERS
+
+            # 0. Audio URL (Critical)
+            if not audio_url and not scan_only:
+                continue
+
+            # 1. Trash Filter
+            if filter_exclude_trash and is_trashed:
+                continue
+
+            # 2. Stem Filter
+            if filter_hide_stems and is_stem:
+                continue
+
+            # 2b. Stems Only Filter
+            if self.config.get("stems_only") and not is_stem:
+                continue
+
+            # 3. Liked Filter
+            if filter_liked_only and not is_liked:
+                continue
+
+            # 4. Hide Disliked
+            if filter_hide_disliked and (vote == "down" or reaction_type == "D"):
+                continue
+
+            # 5. Public Only
+            if filter_public_only and not is_public:
+                continue
+
+            # 6. Hide Studio
+            if filter_hide_studio and clip_type == "studio_clip":
+                continue
+
+            # 7. Type Filter
+            if filter_type == "uploads" and clip_type != "upload":
+                continue
+
+            # 8. Search Text
+            if search_text:
+                tags = metadata.get("tags", "") or ""
+                prompt = metadata.get("prompt", "") or ""
+                searchable_content = f"{title.lower()} {tags.lower()} {prompt.lower()}"
+                if search_text not in searchable_content:
+                    continue
+
+            filtered_clips.append(song_data)
+        return filtered_clips
 
     def fetch_workspaces(self, token):
         """Fetch list of workspaces (projects) using the correct endpoint with pagination."""
@@ -678,13 +835,28 @@ class SunoDownloader:
         
         return all_playlists
 
-    def download_single_song(self, clip, directory, headers, token, existing_uuids, rate_limiter):
+    def _open_index(self, directory):
+        """Open (or keep) the download index for this folder; None if it can't be created."""
+        if self.index is not None and self.index.directory == directory:
+            return
+        try:
+            self.index = DownloadIndex(directory)
+            self.store = SongStore(self.index)
+        except Exception as e:
+            self._log(f"Download index unavailable: {e}", "warning")
+            self.index = self.store = None
+
+    def download_single_song(self, clip, directory, headers, token, existing_uuids, rate_limiter,
+                             collections=None):
+        """Download one clip; collections are the workspace/playlist folders to also show it in."""
         if self.is_stopped():
             return
 
+        collections = collections or []
         uuid = clip.get("id")
         if uuid in existing_uuids:
             self._log(f"Skipping: {clip.get('title') or uuid} (already downloaded)", "info")
+            self._show_in_collection(uuid, clip.get("title") or uuid, collections)
             return
 
         title = clip.get("title") or uuid
@@ -755,8 +927,8 @@ class SunoDownloader:
         ext = file_ext or ".mp3"
         fname = sanitize_filename(title) + ext
         out_path = os.path.join(target_dir, fname)
-        if os.path.exists(out_path):
-            out_path = get_unique_filename(out_path)
+        # Streamed to a per-clip temporary file; the final name is picked once it is complete
+        part_path = f"{out_path}.{uuid}.part"
 
         self._log(f"Downloading: {title}", "downloading", thumbnail_data=thumb_data)
         self.signals.song_updated.emit(uuid, "Downloading", 0)
@@ -770,39 +942,73 @@ class SunoDownloader:
                     r_dl.raise_for_status()
                     total_size = int(r_dl.headers.get('content-length', 0))
                     downloaded = 0
+                    # Hash the audio as it streams past, so it never has to be read back
+                    hasher = hashlib.blake2b(digest_size=HASH_SIZE)
                     
-                    with open(out_path, "wb") as f:
+                    with open(part_path, "wb") as f:
+                        preallocated = total_size > 0 and self._preallocate(f, total_size)
                         for chunk in r_dl.iter_content(chunk_size=8192):
                             if self.is_stopped():
                                 f.close()
-                                os.remove(out_path)
+                                os.remove(part_path)
                                 return
                             f.write(chunk)
+                            hasher.update(chunk)
                             downloaded += len(chunk)
                             if total_size > 0:
                                 percent = int(downloaded * 100 / total_size)
                                 self.signals.song_updated.emit(uuid, "Downloading", percent)
+                        if preallocated:
+                            f.truncate(downloaded)  # In case the server sent less than it said
                 break
             except Exception as exc:
+                if isinstance(exc, OSError) and exc.errno == errno.ENOSPC:
+                    # Retrying won't help, nor will the rest of the batch
+                    self._log(f"Disk full while downloading {title}; stopping.", "error")
+                    self.signals.song_updated.emit(uuid, "Error", 0)
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    with self._finish_lock:
+                        first = not self.is_stopped()
+                        self.stop()
+                    if first:
+                        self.signals.error_occurred.emit(f"The download drive is full ({directory}).")
+                    return
                 if attempt < max_retries - 1:
                     self._log(f"  Retry {attempt+1}/{max_retries}...", "info")
                     time.sleep(2)
                 else:
                     self._log(f"Failed: {title} - {exc}", "error")
                     self.signals.song_updated.emit(uuid, "Error", 0)
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
                     return
 
+        audio_hash = hasher.hexdigest()
+        with self._finish_lock:
+            # Kept as its own file all the same: it carries this clip's tags, and the
+            # library's duplicate report lists the two for the user to choose between
+            identical = self.index.find_hash(audio_hash) if self.index else None
+            if self.store:
+                canonical = self.store.add(part_path, uuid, ext)
+            else:
+                out_path = get_unique_filename(out_path)
+                os.replace(part_path, out_path)
+                canonical = out_path
+            self._bytes_downloaded += downloaded
+            if self.index:
+                try:
+                    self.index.add(uuid, canonical, downloaded, audio_hash)
+                except Exception as e:
+                    self._log(f"Download index error: {e}", "warning")
+
         try:
-            if lyrics and self.config.get("save_lyrics", True):
-                txt_path = os.path.splitext(out_path)[0] + ".txt"
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(lyrics)
-            
-            # Always embed metadata if enabled, or at least embed lyrics
+            # Tags go into the one stored file before any views of it are made
+            tags_embedded = False
             if self.config.get("embed_metadata"):
                 # Full metadata embedding
-                embed_metadata(
-                    audio_path=out_path,
+                tags_embedded = embed_metadata(
+                    audio_path=canonical,
                     image_url=image_url,
                     title=title,
                     artist=display_name,
@@ -816,7 +1022,7 @@ class SunoDownloader:
             elif lyrics:
                 # Only embed lyrics even if full metadata is disabled
                 embed_metadata(
-                    audio_path=out_path,
+                    audio_path=canonical,
                     lyrics=lyrics,
                     metadata_options={
                         'title': False, 'artist': False, 'genre': False, 'year': False,
@@ -824,13 +1030,108 @@ class SunoDownloader:
                     }
                 )
             
+            view_paths = [canonical]
+            if self.store:
+                view_paths = self._add_views(uuid, canonical, out_path, fname, collections)
+            out_path = view_paths[0]
+            
+            if lyrics and self.config.get("save_lyrics", True):
+                for view_path in view_paths:
+                    txt_path = os.path.splitext(view_path)[0] + ".txt"
+                    with open(txt_path, "w", encoding="utf-8") as f:
+                        f.write(lyrics)
+            
             existing_uuids.add(uuid)
             self._log(f"✓ {title}", "success", thumbnail_data=thumb_data)
+            if identical:
+                self._log(f"= {title} has the same audio as {os.path.basename(identical)} "
+                          "(see Find Duplicate Songs in the library)", "info")
             self.signals.song_finished.emit(uuid, True, out_path)
+            if tags_embedded:
+                # The file's tags are exactly what we know, so the library can skip reading it
+                record = self._library_record(out_path, uuid, title, display_name, metadata, lyrics)
+                if record:
+                    self.signals.song_saved.emit(record)
         except Exception as exc:
             self._log(f"  Metadata error: {exc}", "error")
             self.signals.song_finished.emit(uuid, True, out_path) # Still success even if metadata fails
 
+    def _preallocate(self, f, size):
+        """
+        Reserve a download's full size before writing it, so concurrent downloads don't
+        interleave their blocks and a full disk fails now rather than mid-stream.
+        Returns whether space was reserved; raises OSError (ENOSPC) if it doesn't fit.
+        """
+        if not hasattr(os, "posix_fallocate"):
+            return False  # Windows/macOS: written as it arrives
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return True
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            return False  # Filesystem doesn't support it
+
+    def _collection_dir(self, directory, source):
+        """Folder a workspace or playlist source also shows its songs in, or None."""
+        name = source.get("name")
+        kind = {"workspace": "Workspaces", "playlist": "Playlists"}.get(source.get("type"))
+        if not name or not kind or not source.get("id"):
+            return None
+        return os.path.join(directory, kind, sanitize_filename(name))
+
+    def _add_views(self, uuid, canonical, out_path, fname, collections):
+        """Show a stored clip in its layout folder and its workspace/playlist folders; returns the paths."""
+        view_paths = [self.store.add_view(uuid, canonical, out_path)]
+        for collection in collections:
+            canonical = self.index.canonical(uuid) or canonical  # the first view may have taken the file
+            view_paths.append(self.store.add_view(uuid, canonical, os.path.join(collection, fname)))
+        return view_paths
+
+    def _show_in_collection(self, uuid, title, collections):
+        """A clip that is already downloaded gets a view in these workspace/playlist folders."""
+        canonical = self.index.canonical(uuid) if self.store and collections else None
+        if not canonical:
+            return
+        fname = sanitize_filename(title) + os.path.splitext(canonical)[1]
+        for collection in collections:
+            try:
+                self.store.add_view(uuid, canonical, os.path.join(collection, fname))
+            except OSError as e:
+                self._log(f"Could not add {title} to {os.path.basename(collection)}: {e}", "warning")
+
+    def _library_record(self, out_path, uuid, title, artist, metadata, lyrics):
+        """
+        Library entry for a file we just wrote, built from what we embedded so the
+        library does not have to read it back. None if the duration is unknown.
+        """
+        duration = metadata.get("duration")
+        if not duration:
+            return None
+        try:
+            st = os.stat(out_path)
+        except OSError:
+            return None
+        return {
+            'title': title,
+            'artist': artist or 'Unknown Artist',
+            'duration': int(duration),
+            'date': time.strftime('%Y-%m-%d', time.localtime(st.st_mtime)),
+            'filepath': out_path,
+            'filesize': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'inode': st.st_ino,
+            'lyrics': lyrics or '',
+            'sidecar_mtime_ns': self._sidecar_mtime_ns(out_path),
+            'id': uuid,
+        }
+
+    def _sidecar_mtime_ns(self, out_path):
+        try:
+            return os.stat(os.path.splitext(out_path)[0] + ".txt").st_mtime_ns
+        except OSError:
+            return None
+
     def _is_stem(self, song_data):
         """Check if song is a stem."""
         metadata = song_data.get("metadata", {}) or {}
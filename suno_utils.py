@@ -7,6 +7,7 @@ import math
 from mutagen.id3 import ID3, APIC, TIT2, TPE1, TCON, COMM, TDRC, TYER, USLT, TXXX, error
 from mutagen.mp3 import MP3
 from mutagen.wave import WAVE
+from tag_reader import read_tags
 import platform
 import subprocess
 
@@ -30,6 +31,10 @@ def get_uuid_from_file(filepath):
     Returns None if UUID not found or file cannot be read.
     """
     try:
+        tags = read_tags(filepath, duration=False)
+        if tags is not None:
+            return tags['uuid']
+        
         ext = os.path.splitext(filepath)[1].lower()
         if ext == ".wav":
             audio = WAVE(filepath)
@@ -40,19 +45,22 @@ def get_uuid_from_file(filepath):
         
         if not hasattr(audio, 'tags') or audio.tags is None:
             return None
-        
-        # Look for SUNO_UUID in TXXX tags
-        for key in audio.tags.keys():
-            if key.startswith("TXXX:"):
-                tag = audio.tags[key]
-                if hasattr(tag, 'desc') and tag.desc == "SUNO_UUID":
-                    return str(tag.text[0]) if tag.text else None
-        
-        return None
+        return _uuid_from_tags(audio.tags)
     except Exception:
         return None
 
 
+def _uuid_from_tags(tags):
+    """SUNO_UUID from a loaded mutagen ID3 tag, or None."""
+    # Look for SUNO_UUID in TXXX tags
+    for key in tags.keys():
+        if key.startswith("TXXX:"):
+            tag = tags[key]
+            if hasattr(tag, 'desc') and tag.desc == "SUNO_UUID":
+                return str(tag.text[0]) if tag.text else None
+    return None
+
+
 def build_uuid_cache(directory):
     """
     Scan directory recursively and build a set of all UUIDs found in audio files.
@@ -73,10 +81,17 @@ def build_uuid_cache(directory):
     return uuid_cache
 
 
-def read_song_metadata(filepath):
+def read_song_metadata(filepath, stat_result=None, has_sidecar=None, include_lyrics=True):
     """
     Reads metadata from MP3/WAV file for library display.
     
+    stat_result and has_sidecar may be passed in by a directory scan that already
+    knows them, saving an os.stat() and an os.path.exists() per file.
+    With include_lyrics=False the result has no 'lyrics' key and neither USLT
+    frames nor the .txt sidecar are read (see read_lyrics()); the file is then
+    read with tag_reader.read_tags, which skips cover art and other frames, and
+    only falls back to a full mutagen parse for tags it cannot handle.
+    
     Returns: {
         'title': str,
         'artist': str,
@@ -92,16 +107,34 @@ def read_song_metadata(filepath):
         'duration': 0,
         'date': '',
         'filepath': filepath,
-        'filesize': 0,
-        'lyrics': ''
+        'filesize': 0
     }
+    if include_lyrics:
+        result['lyrics'] = ''
     
     try:
         # Get file stats
-        stat = os.stat(filepath)
+        stat = stat_result if stat_result is not None else os.stat(filepath)
         result['filesize'] = stat.st_size
         result['date'] = time.strftime('%Y-%m-%d', time.localtime(stat.st_mtime))
         
+        # Fast path: header, title/artist/UUID frames and length only
+        tags = None if include_lyrics else read_tags(filepath)
+        if tags is not None:
+            if tags['duration'] is not None:
+                result['duration'] = int(tags['duration'])
+            if tags['has_tags']:
+                if tags['title'] is not None:
+                    result['title'] = tags['title']
+                else:
+                    # Same filename fallback as below
+                    name = os.path.splitext(os.path.basename(filepath))[0]
+                    result['title'] = name.replace('_', ' ')
+                if tags['artist'] is not None:
+                    result['artist'] = tags['artist']
+            result['id'] = tags['uuid']
+            return result
+        
         # Read audio metadata
         ext = os.path.splitext(filepath)[1].lower()
         audio = None
@@ -111,7 +144,7 @@ def read_song_metadata(filepath):
         elif ext == '.mp3':
             audio = MP3(filepath, ID3=ID3)
         
-        if audio:
+        if audio is not None:  # mutagen files are falsy when untagged
             # Duration
             if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
                 result['duration'] = int(audio.info.length)
@@ -127,12 +160,8 @@ def read_song_metadata(filepath):
                     result['artist'] = str(audio.tags['TPE1'].text[0])
                 
                 # Lyrics (USLT) - check all USLT frames and use the first non-empty one
-                for key in audio.tags.keys():
-                    if key.startswith('USLT'):
-                        lyrics_text = str(audio.tags[key].text)
-                        if lyrics_text and lyrics_text.strip():
-                            result['lyrics'] = lyrics_text
-                            break
+                if include_lyrics:
+                    result['lyrics'] = _first_uslt(audio.tags)
                 
                 # Fallback to filename if no title tag
                 if result['title'] == os.path.basename(filepath) and 'TIT2' not in audio.tags:
@@ -141,17 +170,17 @@ def read_song_metadata(filepath):
                     result['title'] = name.replace('_', ' ')
         
         # If no lyrics in metadata, check for .txt file
-        if not result['lyrics'] or result['lyrics'].strip() == '':
+        if include_lyrics and (not result['lyrics'] or result['lyrics'].strip() == ''):
             txt_path = os.path.splitext(filepath)[0] + ".txt"
-            if os.path.exists(txt_path):
+            if has_sidecar if has_sidecar is not None else os.path.exists(txt_path):
                 try:
                     with open(txt_path, 'r', encoding='utf-8') as f:
                         result['lyrics'] = f.read()
                 except Exception:
                     pass  # Silently fail if .txt file can't be read
         
-        # Get UUID
-        result['id'] = get_uuid_from_file(filepath)
+        # Get UUID (from the tags already loaded, not a second open)
+        result['id'] = _uuid_from_tags(audio.tags) if audio is not None and audio.tags else None
     
     except Exception as e:
         # On any error, fallback to filename
@@ -160,6 +189,108 @@ def read_song_metadata(filepath):
     return result
 
 
+def read_song_metadata_batch(items):
+    """
+    Read metadata for several files in one call.
+    Used as the unit of work for process-pool library scans, so a chunk of files
+    costs one round trip between processes instead of one per song.
+    items: (filepath, stat_result, has_sidecar) tuples, as produced by a library scan.
+    Returns a list of read_song_metadata() results (without lyrics) in the same order.
+    """
+    return [read_song_metadata(filepath, stat_result, has_sidecar, include_lyrics=False)
+            for filepath, stat_result, has_sidecar in items]
+
+
+def _first_uslt(tags):
+    """Text of the first non-empty USLT frame, or ''."""
+    for key in tags.keys():
+        if key.startswith('USLT'):
+            lyrics_text = str(tags[key].text)
+            if lyrics_text and lyrics_text.strip():
+                return lyrics_text
+    return ''
+
+
+def read_lyrics(filepath):
+    """
+    Read a song's lyrics: the .txt sidecar if it has content (what the lyrics
+    editor saves to), otherwise the embedded USLT frame. Returns '' if none.
+    """
+    txt_path = os.path.splitext(filepath)[0] + ".txt"
+    try:
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            lyrics = f.read()
+        if lyrics.strip():
+            return lyrics
+    except OSError:
+        pass
+    except Exception as e:
+        print(f"Error reading lyrics from .txt file: {e}")
+    
+    try:
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext == '.wav':
+            audio = WAVE(filepath)
+        elif ext == '.mp3':
+            audio = MP3(filepath, ID3=ID3)
+        else:
+            return ''
+        if audio.tags:
+            return _first_uslt(audio.tags)
+    except Exception:
+        pass
+    return ''
+
+
+def read_text_fields(filepath):
+    """
+    Read the searchable text of a song: {'lyrics', 'style', 'prompt'}.
+    Lyrics come from the .txt sidecar if it has content, else USLT; style is the
+    TCON genre and prompt the COMM comment. Missing fields are ''.
+    """
+    fields = {'lyrics': '', 'style': '', 'prompt': ''}
+    txt_path = os.path.splitext(filepath)[0] + ".txt"
+    try:
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            fields['lyrics'] = f.read()
+    except OSError:
+        pass
+    except Exception as e:
+        print(f"Error reading lyrics from .txt file: {e}")
+    
+    try:
+        # Fast path skips cover art; mutagen handles the unusual layouts
+        tags = read_tags(filepath, duration=False, text=True)
+        if tags is not None:
+            found = {key: tags[key] or '' for key in fields}
+        else:
+            ext = os.path.splitext(filepath)[1].lower()
+            if ext == '.wav':
+                audio = WAVE(filepath)
+            elif ext == '.mp3':
+                audio = MP3(filepath, ID3=ID3)
+            else:
+                return fields
+            found = {'lyrics': '', 'style': '', 'prompt': ''}
+            if audio.tags:
+                found['lyrics'] = _first_uslt(audio.tags)
+                if 'TCON' in audio.tags and audio.tags['TCON'].text:
+                    found['style'] = str(audio.tags['TCON'].text[0])
+                for key in audio.tags.keys():
+                    if key.startswith('COMM') and audio.tags[key].text:
+                        comment = str(audio.tags[key].text[0])
+                        if comment.strip():
+                            found['prompt'] = comment
+                            break
+        if not fields['lyrics'].strip():
+            fields['lyrics'] = found['lyrics']
+        fields['style'] = found['style']
+        fields['prompt'] = found['prompt']
+    except Exception:
+        pass
+    return fields
+
+
 def save_lyrics_to_file(filepath, lyrics):
     """Update lyrics in the audio file."""
     try:
@@ -245,24 +376,6 @@ def get_unique_filename(filename):
         counter += 1
 
 
-def get_downloaded_uuids(directory):
-    uuids = set()
-    if not os.path.exists(directory):
-        return uuids
-
-    for root, dirs, files in os.walk(directory):
-        for fname in files:
-            if fname.lower().endswith(".mp3"):
-                try:
-                    audio = ID3(os.path.join(root, fname))
-                    for frame in audio.getall("TXXX"):
-                        if frame.desc == "SUNO_UUID":
-                            uuids.add(frame.text[0])
-                except:
-                    pass
-    return uuids
-
-
 class RateLimiter:
     """Simple token-style rate limiter that enforces a minimum delay between calls."""
 
@@ -303,6 +416,8 @@ def embed_metadata(
     
     metadata_options: dict with keys 'title', 'artist', 'genre', 'year', 
                      'comment', 'lyrics', 'album_art', 'uuid' (all bool)
+    
+    Returns True if the tags were saved.
     """
     if metadata_options is None:
         # Default: include all metadata
@@ -391,8 +506,10 @@ def embed_metadata(
             audio.save()
         else:
             audio.save(v2_version=3)
+        return True
     except Exception as e:
         print(f"Metadata error: {e}")
+        return False
 
 
 # --- GUI UTILS ---
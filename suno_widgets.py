@@ -1,4 +1,5 @@
 import math
+from array import array
 import tkinter as tk
 from tkinter import ttk, font
 from io import BytesIO
@@ -954,3 +955,337 @@ class EmptyStateWidget(tk.Frame):
             bg=self.cget("bg")
         )
         subtitle_label.pack(pady=(8, 0))
+
+
+class VirtualTreeview(tk.Frame):
+    """
+    A ttk.Treeview that only holds the rows currently on screen.
+
+    The rows come from a model: a row count and get_row(index) -> (values, tags).
+    The Treeview keeps a small pool of items that are refilled as the list scrolls,
+    and `yscrollbar` is driven from the model length instead of the pool, so showing
+    100k songs costs the same as showing 30.
+
+    Selection is a set of model indexes plus a cursor (the row last clicked or moved
+    to), so it can span rows that are not on screen. Click selects one row,
+    Ctrl+Click toggles, Shift+Click/Shift+arrows select a range and Ctrl+A selects
+    everything. Changes are reported with a <<ListSelect>> event on this frame.
+
+    Use .tree for headings, columns, styles and mouse bindings, and the methods here
+    instead of the Treeview's item/selection/yview calls.
+    """
+    def __init__(self, parent, yscrollbar, bg=None, **tree_kwargs):
+        super().__init__(parent, bg=bg)
+        self.yscrollbar = yscrollbar
+        self.tree = ttk.Treeview(self, selectmode="extended", **tree_kwargs)
+        self.tree.pack(fill="both", expand=True)
+        yscrollbar.config(command=self.yview)
+        
+        self._count = 0
+        self._get_row = None
+        self._top = 0             # model index of the first visible row
+        self._visible_rows = 1
+        self._pool = []           # tree items, one per visible row
+        self._slot_rows = []      # (index, values, tags) last written to each pool item
+        self._attached = 0        # pool items currently attached
+        self._selection = set()   # selected model indexes
+        self._cursor = None       # model index of the focused row
+        self._anchor = None       # where a Shift range starts
+        
+        self.tree.bind("<Configure>", lambda e: self._render(measure=True))
+        self.tree.bind("<Button-1>", lambda e: self._on_click(e, "set"), add="+")
+        self.tree.bind("<Control-Button-1>", lambda e: self._on_click(e, "toggle"), add="+")
+        self.tree.bind("<Shift-Button-1>", lambda e: self._on_click(e, "range"), add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self._move_cursor(-1))
+        self.tree.bind("<Down>", lambda e: self._move_cursor(1))
+        self.tree.bind("<Shift-Up>", lambda e: self._move_cursor(-1, extend=True))
+        self.tree.bind("<Shift-Down>", lambda e: self._move_cursor(1, extend=True))
+        self.tree.bind("<Prior>", lambda e: self._move_cursor(-self._page()))
+        self.tree.bind("<Next>", lambda e: self._move_cursor(self._page()))
+        self.tree.bind("<Home>", lambda e: self._select_key(0))
+        self.tree.bind("<End>", lambda e: self._select_key(self._count - 1))
+        self.tree.bind("<Shift-Home>", lambda e: self._select_key(0, extend=True))
+        self.tree.bind("<Shift-End>", lambda e: self._select_key(self._count - 1, extend=True))
+        self.tree.bind("<Control-a>", lambda e: self._select_all())
+    
+    # --- model ---
+    
+    def set_rows(self, count, get_row, selected=(), cursor=None):
+        """
+        Show a new model of `count` rows, keeping the scroll position where possible.
+        selected: model indexes to select; cursor: the focused one (defaults to the first).
+        """
+        self._count = count
+        self._get_row = get_row
+        self._selection = {index for index in selected if 0 <= index < count}
+        if cursor not in self._selection:
+            cursor = min(self._selection) if self._selection else None
+        self._cursor = self._anchor = cursor
+        self._slot_rows = [None] * len(self._pool)
+        self._render()
+    
+    def refresh(self):
+        """Re-read the visible rows from the model (after their data changed)."""
+        self._slot_rows = [None] * len(self._pool)
+        self._render()
+    
+    def __len__(self):
+        return self._count
+    
+    # --- selection / position ---
+    
+    def selected_index(self):
+        """The focused selected row, or None if nothing is selected."""
+        if self._cursor in self._selection:
+            return self._cursor
+        return min(self._selection) if self._selection else None
+    
+    def selected_indexes(self):
+        """Every selected row, in list order."""
+        return sorted(self._selection)
+    
+    def is_selected(self, index):
+        return index in self._selection
+    
+    def select(self, index, see=True):
+        """Select just one model row (None clears the selection)."""
+        if index is not None and not 0 <= index < self._count:
+            return
+        self._set_selection(set() if index is None else {index}, index, index, see)
+    
+    def select_all(self):
+        self._select_all()
+    
+    def see(self, index):
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + self._visible_rows:
+            self._top = index - self._visible_rows + 1
+        self._render()
+    
+    def index_at(self, y):
+        """Model index of the row at a y coordinate of .tree, or None."""
+        item = self.tree.identify_row(y)
+        if item in self._pool:
+            slot = self._pool.index(item)
+            if slot < self._attached:
+                return self._top + slot
+        return None
+    
+    def yview(self, *args):
+        """Scrollbar command: scroll the model, not the pool."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * self._count)
+        elif args[0] == "scroll":
+            step = self._page() if args[2] == "pages" else 1
+            self._top += int(args[1]) * step
+        self._render()
+    
+    # --- rendering ---
+    
+    def _page(self):
+        return max(1, self._visible_rows - 1)
+    
+    def _measure(self):
+        """
+        Set the number of whole rows that fit in the Treeview's current height.
+        Returns False if the row height had to be guessed (no row on screen yet).
+        """
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return True
+        bbox = self.tree.bbox(self._pool[0]) if self._attached else ""
+        if bbox:
+            heading, rowheight = bbox[1], bbox[3]
+        else:
+            style = self.tree.cget("style") or "Treeview"
+            rowheight = int(ttk.Style().lookup(style, "rowheight") or 20)
+            heading = rowheight + 4
+        self._visible_rows = max(1, (height - heading) // max(1, rowheight))
+        return bool(bbox)
+    
+    def _render(self, measure=False, retry=True):
+        guessed = measure and not self._measure()
+        max_top = max(0, self._count - self._visible_rows)
+        self._top = max(0, min(self._top, max_top))
+        n = max(0, min(self._visible_rows, self._count - self._top))
+        
+        while len(self._pool) < n:
+            self._pool.append(self.tree.insert("", "end"))
+            self._slot_rows.append(None)
+        for slot in range(n):
+            index = self._top + slot
+            values, tags = self._get_row(index)
+            if self._slot_rows[slot] != (index, values, tags):
+                self._slot_rows[slot] = (index, values, tags)
+                self.tree.item(self._pool[slot], values=values, tags=tags)
+        if n != self._attached:
+            self.tree.set_children("", *self._pool[:n])
+            self._attached = n
+        
+        # Highlight whichever pool items show selected rows
+        wanted = tuple(self._pool[slot] for slot in range(n) if self._top + slot in self._selection)
+        if self.tree.selection() != wanted:
+            self.tree.selection_set(wanted)
+        cursor_slot = None if self._cursor is None else self._cursor - self._top
+        if cursor_slot is not None and 0 <= cursor_slot < n:
+            self.tree.focus(self._pool[cursor_slot])
+        self.tree.yview_moveto(0)
+        
+        if self._count:
+            self.yscrollbar.set(self._top / self._count, min(1.0, (self._top + n) / self._count))
+        else:
+            self.yscrollbar.set(0.0, 1.0)
+        if guessed and self._attached and retry:
+            # Measured with a guessed row height; measure once more now that a row is on screen
+            self.after_idle(self._render, True, False)
+    
+    # --- events ---
+    
+    def _set_selection(self, selection, cursor, anchor, see=True):
+        changed = selection != self._selection or cursor != self._cursor
+        self._selection = selection
+        self._cursor = cursor
+        self._anchor = anchor
+        if see and cursor is not None:
+            self.see(cursor)
+        else:
+            self._render()
+        if changed:
+            self.event_generate("<<ListSelect>>")
+    
+    def _on_click(self, event, mode):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # Headings and column separators keep their own behaviour
+        self.tree.focus_set()
+        index = self.index_at(event.y)
+        if index is None:
+            return "break"
+        if mode == "toggle":
+            selection = set(self._selection)
+            selection.symmetric_difference_update((index,))
+            self._set_selection(selection, index, index, see=False)
+        elif mode == "range" and self._anchor is not None:
+            low, high = sorted((self._anchor, index))
+            self._set_selection(set(range(low, high + 1)), index, self._anchor, see=False)
+        else:
+            self._set_selection({index}, index, index, see=False)
+        return "break"
+    
+    def _scroll_rows(self, rows):
+        self._top += rows
+        self._render()
+        return "break"
+    
+    def _on_mousewheel(self, event):
+        steps = -(event.delta // 120) if abs(event.delta) >= 120 else -event.delta
+        return self._scroll_rows(steps * 3)
+    
+    def _move_cursor(self, offset, extend=False):
+        if not self._count:
+            return "break"
+        if self._cursor is None:
+            current = self._top - 1 if offset > 0 else self._top + self._visible_rows
+        else:
+            current = self._cursor
+        return self._select_key(max(0, min(self._count - 1, current + offset)), extend)
+    
+    def _select_key(self, index, extend=False):
+        if not self._count:
+            return "break"
+        if extend and self._anchor is not None:
+            low, high = sorted((self._anchor, index))
+            self._set_selection(set(range(low, high + 1)), index, self._anchor)
+        else:
+            self.select(index)
+        return "break"
+    
+    def _select_all(self):
+        if self._count:
+            self._set_selection(set(range(self._count)), self._cursor, self._anchor, see=False)
+        return "break"
+
+
+class WaveformSeekBar(tk.Canvas):
+    """
+    Seek bar drawn as the song's waveform, the played part in the accent colour.
+
+    Stands in for a horizontal 0-100 ttk.Scale: the position is read from and
+    written to `variable`, and command(value) is called when the user clicks or
+    drags. set_peaks() takes a peaks blob (see waveform.compute_peaks) or None for
+    a flat bar. Bars are drawn once per song/resize; moving the position only
+    recolours the bars it passes.
+    """
+
+    BAR_STEP = 3  # pixels per bar: 2 wide, 1 gap
+
+    def __init__(self, parent, variable, command=None, bg_color="#2d2d2d",
+                 wave_color="#4b5563", played_color="#8b5cf6", height=28, **kwargs):
+        super().__init__(parent, height=height, bg=bg_color, highlightthickness=0,
+                         borderwidth=0, cursor="hand2", **kwargs)
+        self.variable = variable
+        self.command = command
+        self.wave_color = wave_color
+        self.played_color = played_color
+        self._peaks = None  # array('b') of min, max pairs
+        self._bars = []     # canvas line ids, left to right
+        self._played = 0    # bars currently drawn in played_color
+        self.bind("<Configure>", lambda event: self.draw())
+        self.bind("<Button-1>", self._on_drag)
+        self.bind("<B1-Motion>", self._on_drag)
+        self.variable.trace_add("write", lambda *args: self._show_position())
+
+    def set_peaks(self, peaks):
+        self._peaks = array('b', peaks) if peaks else None
+        self.draw()
+
+    def draw(self):
+        self.delete("all")
+        width, height = self.winfo_width(), self.winfo_height()
+        count = max(1, width // self.BAR_STEP)
+        mid = height / 2
+        peaks = self._peaks
+        if peaks:
+            bins = len(peaks) // 2
+            loudest = max(1, max(peaks), -min(peaks))
+            scale = (mid - 1) / loudest
+        self._bars = []
+        for i in range(count):
+            if peaks:
+                # Each bar covers a run of peak bins; draw their overall extent
+                start, end = i * bins // count, max((i + 1) * bins // count, i * bins // count + 1)
+                low, high = min(peaks[2 * start:2 * end:2]), max(peaks[2 * start + 1:2 * end:2])
+                top, bottom = mid - high * scale, mid - low * scale
+            else:
+                top, bottom = mid - 1, mid + 1
+            x = i * self.BAR_STEP + 1
+            self._bars.append(self.create_line(x, top, x, max(bottom, top + 1) + 1,
+                                               fill=self.wave_color, width=self.BAR_STEP - 1))
+        self._played = 0
+        self._show_position()
+
+    def _show_position(self):
+        try:
+            value = float(self.variable.get())
+        except (tk.TclError, ValueError):
+            return
+        played = round(max(0.0, min(100.0, value)) / 100 * len(self._bars))
+        low, high = sorted((self._played, played))
+        color = self.played_color if played > self._played else self.wave_color
+        for item in self._bars[low:high]:
+            self.itemconfig(item, fill=color)
+        self._played = played
+
+    def _on_drag(self, event):
+        width = self.winfo_width()
+        if width <= 1:
+            return
+        value = max(0.0, min(100.0, event.x / width * 100))
+        self.variable.set(int(value))
+        if self.command:
+            self.command(value)
@@ -0,0 +1,318 @@
+import os
+import struct
+
+
+# ID3v2.2 frame ids for the frames we read, mapped to their v2.3/2.4 names
+_V22_FRAMES = {b"TT2": b"TIT2", b"TP1": b"TPE1", b"TXX": b"TXXX",
+               b"TCO": b"TCON", b"COM": b"COMM", b"ULT": b"USLT"}
+_WANTED_FRAMES = (b"TIT2", b"TPE1", b"TXXX")
+# Searchable text: style tags, the prompt comment and embedded lyrics
+_TEXT_FRAMES = (b"TCON", b"COMM", b"USLT")
+_TEXT_KEYS = {b"TCON": 'style', b"COMM": 'prompt', b"USLT": 'lyrics'}
+_TEXT_CODECS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+# MPEG audio header tables (bitrates in kbit/s, index 1-14)
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_BITRATES[(2, 3)] = _BITRATES[(2, 2)]
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+
+class _Unsupported(Exception):
+    """The file uses a feature the fast path does not handle; use mutagen instead."""
+
+
+def read_tags(filepath, duration=True, text=False):
+    """
+    Read title, artist, SUNO_UUID and duration from an MP3/WAV without loading it.
+
+    Only the ID3 header and the TIT2/TPE1/TXXX frames are read; every other frame
+    (notably APIC cover art) is skipped with a seek, as are the WAV chunks other than
+    fmt/data/id3. Duration comes from the Xing/Info (with LAME delay/padding) or
+    VBRI header, the CBR frame size, or the WAV fmt/data chunks, computed the same
+    way mutagen does so cached values agree.
+
+    Returns {'title', 'artist', 'uuid', 'duration', 'has_tags'} with None for anything
+    missing ('duration' is also None when not requested), or None if the file needs
+    a full mutagen parse (unsynchronised/compressed tags, ID3v1-only, unusual
+    layouts). Raises OSError if the file cannot be read.
+
+    With text=True the result also has 'style' (TCON), 'prompt' (first non-empty
+    COMM) and 'lyrics' (first non-empty USLT).
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    wanted = _WANTED_FRAMES + _TEXT_FRAMES if text else _WANTED_FRAMES
+    with open(filepath, "rb") as f:
+        try:
+            if ext == ".mp3":
+                return _read_mp3(f, duration, wanted)
+            if ext == ".wav":
+                return _read_wav(f, duration, wanted)
+        except (_Unsupported, struct.error, UnicodeDecodeError, ValueError, KeyError, IndexError):
+            pass
+    return None
+
+
+def _empty_result():
+    return {'title': None, 'artist': None, 'uuid': None, 'duration': None, 'has_tags': False,
+            'style': None, 'prompt': None, 'lyrics': None}
+
+
+# --- ID3v2 ---
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_text(encoding, data):
+    """First value of an ID3 text payload."""
+    codec = _TEXT_CODECS.get(encoding)
+    if codec is None:
+        raise _Unsupported("text encoding")
+    if encoding in (1, 2) and len(data) % 2:
+        data = data[:-1]
+    return data.decode(codec).split("\x00")[0]
+
+
+def _split_terminated(encoding, data):
+    """Split an encoded, null-terminated string off the front of data."""
+    if encoding in (1, 2):
+        for i in range(0, len(data) - 1, 2):
+            if data[i:i + 2] == b"\x00\x00":
+                return data[:i], data[i + 2:]
+        return data, b""
+    head, _, rest = data.partition(b"\x00")
+    return head, rest
+
+
+def _read_id3(f, result, wanted=_WANTED_FRAMES):
+    """
+    Parse the `wanted` frames of an ID3v2 tag starting at the current position into result.
+    Returns the offset just past the tag, or None if there is no tag here.
+    """
+    start = f.tell()
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return None
+    major, _revision, flags = header[3], header[4], header[5]
+    if major not in (2, 3, 4):
+        raise _Unsupported("ID3 version")
+    if flags & 0x80 and major < 4:
+        # Whole-tag unsynchronisation; frame data would need un-escaping
+        raise _Unsupported("unsynchronised tag")
+    end = start + 10 + _syncsafe(header[6:10])
+    tag_end = end + (10 if major == 4 and flags & 0x10 else 0)  # footer
+
+    if flags & 0x40 and major >= 3:
+        ext = f.read(4)
+        ext_size = _syncsafe(ext) - 4 if major == 4 else struct.unpack(">I", ext)[0]
+        f.seek(ext_size, 1)
+
+    frames = 0
+    header_size = 6 if major == 2 else 10
+    while f.tell() + header_size <= end:
+        frame_header = f.read(header_size)
+        if frame_header[0] == 0:
+            break  # Padding
+        if major == 2:
+            frame_id = frame_header[:3]
+            size = int.from_bytes(frame_header[3:6], "big")
+            frame_flags = 0
+        else:
+            frame_id = frame_header[:4]
+            size = (_syncsafe(frame_header[4:8]) if major == 4
+                    else struct.unpack(">I", frame_header[4:8])[0])
+            frame_flags = frame_header[9]
+        if not frame_id.isalnum() or frame_id.upper() != frame_id:
+            raise _Unsupported("bad frame id")
+        if f.tell() + size > end:
+            raise _Unsupported("frame overruns tag")
+        frames += 1
+        if major == 2:
+            frame_id = _V22_FRAMES.get(frame_id, frame_id)
+
+        if frame_id not in wanted:
+            f.seek(size, 1)
+            continue
+        if frame_flags:
+            # Compressed, encrypted, grouped or unsynchronised frame data
+            raise _Unsupported("frame format flags")
+        data = f.read(size)
+        if not data:
+            continue
+        encoding, payload = data[0], data[1:]
+        if frame_id == b"TIT2":
+            result['title'] = _decode_text(encoding, payload)
+        elif frame_id == b"TPE1":
+            result['artist'] = _decode_text(encoding, payload)
+        elif frame_id == b"TCON":
+            result['style'] = _decode_text(encoding, payload)
+        elif frame_id in (b"COMM", b"USLT"):
+            # Language, description, then the text itself
+            _desc, value = _split_terminated(encoding, payload[3:])
+            key = _TEXT_KEYS[frame_id]
+            value = _decode_text(encoding, value)
+            if not result[key] and value.strip():
+                result[key] = value
+        else:
+            desc, value = _split_terminated(encoding, payload)
+            if _decode_text(encoding, desc) == "SUNO_UUID":
+                result['uuid'] = _decode_text(encoding, value) or None
+
+    result['has_tags'] = result['has_tags'] or frames > 0
+    return tag_end
+
+
+# --- MP3 ---
+
+def _read_mp3(f, want_duration, wanted):
+    result = _empty_result()
+    audio_start = 0
+    tag_end = _read_id3(f, result, wanted)
+    # Some writers stack several ID3v2 tags; mutagen reads the first and skips the rest
+    while tag_end is not None:
+        audio_start = tag_end
+        f.seek(audio_start)
+        tag_end = _read_id3(f, _empty_result())
+
+    if not result['has_tags']:
+        f.seek(-128, 2)
+        if f.read(3) == b"TAG":
+            raise _Unsupported("ID3v1 tag")  # mutagen maps these to v2 frames
+    if want_duration:
+        result['duration'] = _mpeg_duration(f, audio_start)
+    return result
+
+
+def _mpeg_duration(f, offset):
+    """Length of the MPEG stream whose first frame is at offset."""
+    f.seek(offset)
+    head = f.read(4)
+    if len(head) < 4 or head[0] != 0xFF or head[1] & 0xE0 != 0xE0:
+        raise _Unsupported("no frame at audio start")
+    version_bits = (head[1] >> 3) & 0x3
+    layer_bits = (head[1] >> 1) & 0x3
+    bitrate_index = head[2] >> 4
+    rate_index = (head[2] >> 2) & 0x3
+    mode = head[3] >> 6
+    if version_bits == 1 or layer_bits == 0 or rate_index == 3 or bitrate_index in (0, 15):
+        raise _Unsupported("invalid frame header")
+
+    version = [2.5, None, 2, 1][version_bits]
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        frame_size = 384
+    elif version >= 2 and layer == 3:
+        frame_size = 576
+    else:
+        frame_size = 1152
+
+    if layer == 3:
+        if version == 1:
+            xing_offset = 21 if mode == 3 else 36
+        else:
+            xing_offset = 13 if mode == 3 else 21
+        f.seek(offset + xing_offset)
+        samples = _xing_samples(f, frame_size)
+        if samples is not None:
+            return float(samples) / sample_rate
+        f.seek(offset + 36)
+        vbri = f.read(26)
+        if len(vbri) == 26 and vbri[:4] == b"VBRI" and struct.unpack(">H", vbri[4:6])[0] == 1:
+            frames = struct.unpack(">I", vbri[14:18])[0]
+            return float(frame_size * frames) / sample_rate
+
+    # CBR: estimate from the stream size, like mutagen
+    f.seek(0, 2)
+    return 8 * (f.tell() - offset) / float(bitrate)
+
+
+def _xing_samples(f, frame_size):
+    """Sample count from a Xing/Info header at the current position, or None."""
+    data = f.read(8)
+    if len(data) != 8 or data[:4] not in (b"Xing", b"Info"):
+        return None
+    flags = struct.unpack(">I", data[4:8])[0]
+    frames = None
+    if flags & 0x1:
+        frames = struct.unpack(">I", f.read(4))[0]
+    skip = (4 if flags & 0x2 else 0) + (100 if flags & 0x4 else 0) + (4 if flags & 0x8 else 0)
+    f.seek(skip, 1)
+    if frames is None:
+        return None
+
+    samples = frame_size * frames
+    delay, padding = _lame_delay_padding(f)
+    samples -= delay + padding
+    return max(samples, 0)
+
+
+def _lame_delay_padding(f):
+    """Encoder delay/padding from a LAME extended header at the current position."""
+    data = f.read(20)
+    if len(data) != 20 or not data.startswith((b"LAME", b"L3.99")):
+        return 0, 0
+    version = data.lstrip(b"EMAL")
+    major, rest = version[0:1], version[1:].lstrip(b".")
+    minor = b""
+    for c in rest:
+        if not chr(c).isdigit():
+            break
+        minor += bytes([c])
+    rest = rest[len(minor):]
+    try:
+        major, minor = int(major.decode("ascii")), int(minor.decode("ascii"))
+    except ValueError:
+        return 0, 0
+    if (major, minor) < (3, 90) or ((major, minor) == (3, 90) and rest[-11:-10] == b"("):
+        return 0, 0  # No extended header before 3.90
+    if len(rest) < 11:
+        return 0, 0
+    # The extended header starts 9 bytes into the version string
+    payload = data[9:] + f.read(16)
+    if len(payload) != 27 or payload[0] >> 4 != 0:
+        return 0, 0
+    delay = (payload[12] << 4) | (payload[13] >> 4)
+    padding = ((payload[13] & 0x0F) << 8) | payload[14]
+    return delay, padding
+
+
+# --- WAV ---
+
+def _read_wav(f, want_duration, wanted):
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise _Unsupported("not RIFF/WAVE")
+    result = _empty_result()
+    block_align = sample_rate = data_size = None
+    id3_offset = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:8])[0]
+        start = f.tell()
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            _audio_format, _channels, sample_rate, _byte_rate, block_align = struct.unpack("<HHIIH", fmt[:14])
+        elif chunk_id == b"data":
+            data_size = size
+        elif chunk_id in (b"id3 ", b"ID3 "):
+            id3_offset = start
+        f.seek(start + size + (size & 1))
+
+    if id3_offset is not None:
+        f.seek(id3_offset)
+        _read_id3(f, result, wanted)
+    if want_duration:
+        if not (block_align and sample_rate and data_size is not None):
+            raise _Unsupported("missing fmt/data chunk")
+        result['duration'] = int(data_size / block_align) / sample_rate
+    return result
@@ -0,0 +1,168 @@
+import json
+import os
+
+
+# Journal entries replayed on top of the snapshot before it is rewritten
+COMPACT_AFTER = 500
+
+
+class TagStore:
+    """
+    Song tags (keep/star/trash) keyed by SUNO UUID or normalized filepath, shared by
+    the library and the player.
+
+    tags.json holds a snapshot in the same format older versions wrote. Each change
+    is appended as one JSON line to a journal next to it (tags.journal) instead of
+    rewriting the snapshot; on load the journal is replayed over the snapshot. After
+    COMPACT_AFTER entries, and on close(), the snapshot is rewritten atomically and
+    the journal emptied. A torn last line (crash mid-append) is ignored.
+
+    Subscribers are called with the set of keys whose tag changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal" if path else None
+        self._tags = {}
+        self._journal = None
+        self._journal_entries = 0
+        self._subscribers = []
+        self._load()
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __contains__(self, key):
+        return key in self._tags
+
+    def get(self, key, default=None):
+        return self._tags.get(key, default)
+
+    def lookup(self, key):
+        """Tag for key, also trying the forward-slash form of a filepath key."""
+        if not key:
+            return None
+        tag = self._tags.get(key)
+        if tag is None and os.path.sep in key:
+            tag = self._tags.get(key.replace('\\', '/'))
+        return tag
+
+    def items(self):
+        return self._tags.items()
+
+    def set(self, key, tag):
+        """Tag one song (tag None/'' removes it)."""
+        self.set_many({key: tag})
+
+    def set_many(self, changes):
+        """Apply {key: tag or None} with one journal append and one notification."""
+        changes = dict(changes)
+        for key in list(changes):
+            alt = key.replace('\\', '/')
+            if alt != key and alt in self._tags and alt not in changes:
+                changes[alt] = None  # Forward-slash form of a path key, replaced by the normalized one
+        entries = [{"k": key, "t": tag or None} for key, tag in changes.items()
+                   if self._tags.get(key) != (tag or None)]
+        if not entries:
+            return
+        # Journal first: if the write fails (OSError) nothing changes
+        self._append(entries)
+        for entry in entries:
+            if entry["t"] is None:
+                del self._tags[entry["k"]]
+            else:
+                self._tags[entry["k"]] = entry["t"]
+        if self._journal_entries >= COMPACT_AFTER:
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting tags: {e}")
+        self._notify({entry["k"] for entry in entries})
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def compact(self):
+        """Rewrite the snapshot with every change so far and empty the journal."""
+        if not self.path:
+            return
+        tags_dir = os.path.dirname(self.path)
+        if tags_dir and not os.path.exists(tags_dir):
+            os.makedirs(tags_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._tags, f, indent=2)
+        os.replace(tmp_path, self.path)
+        # The snapshot now includes the journal, so replaying it again would be harmless
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._journal_entries = 0
+
+    def close(self):
+        try:
+            if self._journal_entries:
+                self.compact()
+        except Exception as e:
+            print(f"Error compacting tags: {e}")
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _load(self):
+        if not self.path:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    tags = json.load(f)
+                if isinstance(tags, dict):
+                    self._tags = tags
+            except Exception as e:
+                print(f"Error loading tags from {self.path}: {e}")
+        torn = False
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            torn = True  # Torn write at the end
+                            break
+                        if entry.get("t"):
+                            self._tags[entry["k"]] = entry["t"]
+                        else:
+                            self._tags.pop(entry["k"], None)
+                        self._journal_entries += 1
+            except Exception as e:
+                print(f"Error replaying tag journal: {e}")
+        if torn or self._journal_entries >= COMPACT_AFTER:
+            # Start a clean journal so new entries aren't appended after a torn line
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting tags: {e}")
+
+    def _append(self, entries):
+        if not self.path:
+            return
+        if self._journal is None:
+            tags_dir = os.path.dirname(self.journal_path)
+            if tags_dir and not os.path.exists(tags_dir):
+                os.makedirs(tags_dir, exist_ok=True)
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._journal.flush()
+        self._journal_entries += len(entries)
+
+    def _notify(self, keys):
+        for callback in list(self._subscribers):
+            try:
+                callback(keys)
+            except Exception as e:
+                print(f"Tag subscriber error: {e}")
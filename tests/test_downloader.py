@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import namedtuple
+
+import suno_downloader
+from suno_downloader import SunoDownloader
+
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+AUDIO = b"ID3" + bytes(range(256)) * 40
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", data=None, before_body=None):
+        self.status_code = status_code
+        self.content = content
+        self.data = data
+        self.before_body = before_body
+        self.headers = {"content-length": str(len(content))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        if self.before_body:
+            self.before_body()
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def json(self):
+        return self.data if self.data is not None else {}
+
+
+def _serve(audio_by_url):
+    """requests.get stand-in: the given audio, 404 for the clip detail/thumbnail lookups."""
+    def get(url, **kwargs):
+        if url in audio_by_url:
+            return FakeResponse(content=audio_by_url[url])
+        return FakeResponse(status_code=404)
+    return get
+
+
+def _url(uuid):
+    return f"https://cdn.example/{uuid}.mp3"
+
+
+def _clip(uuid, title):
+    return {"id": uuid, "title": title, "audio_url": _url(uuid),
+            "metadata": {}, "created_at": "2024-05-01T00:00:00Z"}
+
+
+def _downloader(directory):
+    downloader = SunoDownloader()
+    downloader.configure("token", directory, max_pages=1, start_page=1, organize_by_month=False,
+                         embed_metadata_enabled=False, prefer_wav=False, download_delay=0)
+    downloader._open_index(directory)
+    return downloader
+
+
+def test_clips_with_identical_audio_are_kept_and_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(suno_downloader.requests, "get",
+                        _serve({_url("uuid-a"): AUDIO, _url("uuid-b"): AUDIO}))
+    directory = str(tmp_path)
+    downloader = _downloader(directory)
+    known = set()
+    for clip in (_clip("uuid-a", "First"), _clip("uuid-b", "Second")):
+        downloader.download_single_song(clip, directory, {}, "token", known, None)
+
+    index = downloader.index
+    assert known == {"uuid-a", "uuid-b"}
+    # Each clip keeps a file of its own, for its own tags
+    assert index.canonical("uuid-a") != index.canonical("uuid-b")
+    assert sorted(os.listdir(os.path.join(directory, ".sunosync", "store"))) == ["uuid-a.mp3", "uuid-b.mp3"]
+    assert [os.path.basename(path) for path, _ in index.views("uuid-a")] == ["First.mp3"]
+    assert [os.path.basename(path) for path, _ in index.views("uuid-b")] == ["Second.mp3"]
+    assert index.duplicates() == [[os.path.join(directory, "First.mp3"),
+                                   os.path.join(directory, "Second.mp3")]]
+    index.close()
+
+
+def test_distinct_audio_is_not_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(suno_downloader.requests, "get",
+                        _serve({_url("uuid-a"): AUDIO, _url("uuid-b"): AUDIO[::-1]}))
+    directory = str(tmp_path)
+    downloader = _downloader(directory)
+    for clip in (_clip("uuid-a", "First"), _clip("uuid-b", "Second")):
+        downloader.download_single_song(clip, directory, {}, "token", set(), None)
+
+    index = downloader.index
+    assert index.canonical("uuid-a") != index.canonical("uuid-b")
+    assert index.duplicates() == []
+    index.close()
+
+
+def test_listing_continues_while_a_download_is_slow(tmp_path, monkeypatch):
+    monkeypatch.setattr(suno_downloader, "PAGE_INTERVAL", 0)
+    pages = [[_clip(f"uuid-{page}{n}", f"Song {page}{n}") for n in range(2)] for page in range(1, 4)]
+    last_page_listed = threading.Event()
+    slow_waited = []
+
+    def get(url, **kwargs):
+        if "/api/feed/" in url:
+            page = int(url.rsplit("page=", 1)[1])
+            if page == len(pages):
+                last_page_listed.set()
+            return FakeResponse(data=pages[page - 1] if page <= len(pages) else [])
+        if url == _url("uuid-10"):
+            # Held until the last page has been listed; the lockstep sync never got there
+            return FakeResponse(content=AUDIO, before_body=lambda: slow_waited.append(last_page_listed.wait(10)))
+        if url.startswith("https://cdn.example/"):
+            return FakeResponse(content=AUDIO + url.encode())
+        return FakeResponse(status_code=404)
+
+    monkeypatch.setattr(suno_downloader.requests, "get", get)
+    monkeypatch.setattr(suno_downloader.requests, "head", get)
+    directory = str(tmp_path)
+    downloader = _downloader(directory)
+    downloader.config["max_pages"] = 0
+    finished = []
+    downloader.signals.song_finished.connect(lambda uuid, ok, path: finished.append(uuid))
+    downloader.run()
+
+    assert slow_waited == [True]
+    assert sorted(finished) == sorted(clip["id"] for page in pages for clip in page)
+    downloader.index.close()
+
+
+def test_unexpected_download_failure_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(suno_downloader, "PAGE_INTERVAL", 0)
+    page = [_clip("uuid-a", "First")]
+    monkeypatch.setattr(suno_downloader.requests, "get", lambda url, **kwargs: FakeResponse(
+        data=page if url.endswith("page=1") else []))
+    monkeypatch.setattr(suno_downloader.requests, "head", lambda url, **kwargs: FakeResponse(content=AUDIO))
+    directory = str(tmp_path)
+    downloader = _downloader(directory)
+    downloader.config["max_pages"] = 0
+
+    def fail(*args):
+        raise OSError("read-only folder")
+
+    monkeypatch.setattr(downloader, "download_single_song", fail)
+    statuses, errors = [], []
+    downloader.signals.song_updated.connect(lambda uuid, status, percent: statuses.append((uuid, status)))
+    downloader.signals.log_message.connect(
+        lambda message, kind, thumb: errors.append(message) if kind == "error" else None)
+    downloader.run()
+
+    assert statuses == [("uuid-a", "Error")]
+    assert any("read-only folder" in message for message in errors)
+    downloader.index.close()
+
+
+def test_free_space_check_counts_every_round_of_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(suno_downloader, "PAGE_INTERVAL", 0)
+    pages = [[_clip(f"uuid-{page}{n}", f"Song {page}{n}") for n in range(2)] for page in range(1, 4)]
+    song_size = 40 * 1024 * 1024
+    heads = []
+
+    def get(url, **kwargs):
+        if "/api/feed/" in url:
+            page = int(url.rsplit("page=", 1)[1])
+            return FakeResponse(data=pages[page - 1] if page <= len(pages) else [])
+        return FakeResponse(content=AUDIO + url.encode())
+
+    def head(url, **kwargs):
+        heads.append(url)
+        response = FakeResponse()
+        response.headers["content-length"] = str(song_size)
+        return response
+
+    # Room for a round of two songs, not for two rounds
+    free = suno_downloader.FREE_SPACE_RESERVE + 3 * song_size
+    monkeypatch.setattr(suno_downloader.shutil, "disk_usage", lambda path: DiskUsage(free, 0, free))
+    monkeypatch.setattr(suno_downloader.requests, "get", get)
+    monkeypatch.setattr(suno_downloader.requests, "head", head)
+    directory = str(tmp_path)
+    downloader = _downloader(directory)
+    downloader.config["max_pages"] = 0
+    errors = []
+    downloader.signals.error_occurred.connect(errors.append)
+    downloader.run()
+
+    assert len(errors) == 1 and "Not enough disk space" in errors[0]
+    assert downloader.index.uuids() <= {clip["id"] for clip in pages[0]}
+    assert len(heads) == len(pages[0])  # sampled once, not every round
+    downloader.index.close()
@@ -0,0 +1,18 @@
+from bench_library import HeadlessLibrary, generate_library
+
+
+def test_evicted_songs_stay_in_the_library(tmp_path):
+    library = str(tmp_path / "library")
+    cache_file = str(tmp_path / "cache.db")
+    count = generate_library(library, 40, art_kb=0, lyrics_lines=2, months=3, wav_ratio=0)
+
+    # Fewer cache entries than songs: every scan evicts some
+    first = HeadlessLibrary(library, cache_file, cache_max_entries=10)
+    assert first.scan() == count
+    assert first.scan() == count
+    first.tab.cache_db.close()
+
+    # A fresh start reads the cache and folder states back from disk
+    second = HeadlessLibrary(library, cache_file, cache_max_entries=10)
+    assert second.scan() == count
+    assert len(second.tab.cache) == 10
@@ -0,0 +1,53 @@
+import os
+
+from download_index import DownloadIndex
+from song_store import SongStore
+
+
+def _shared_store_file(tmp_path):
+    """Clips A and B recorded against one store file, named after A, as older downloads did."""
+    index = DownloadIndex(str(tmp_path))
+    store = SongStore(index)
+    part = tmp_path / "a.mp3.part"
+    part.write_bytes(b"audio")
+    canonical = store.add(str(part), "A", ".mp3")
+    index.add("A", canonical, 5, "hash")
+    index.add("B", canonical, 5, "hash")
+    return index, store, canonical
+
+
+def _symlink_view(index, uuid, canonical, view_path):
+    os.makedirs(os.path.dirname(view_path), exist_ok=True)
+    os.symlink(canonical, view_path)
+    index.add_view(uuid, view_path, "symlink")
+
+
+def test_prune_keeps_file_another_clip_still_shows(tmp_path):
+    index, store, canonical = _shared_store_file(tmp_path)
+    a_view = str(tmp_path / "2024-01" / "A.mp3")
+    b_view = str(tmp_path / "Playlist" / "B.mp3")
+    _symlink_view(index, "A", canonical, a_view)
+    _symlink_view(index, "B", canonical, b_view)
+
+    os.remove(a_view)
+    assert store.prune() == 0
+    assert os.path.exists(canonical)
+    assert index.canonical("B") == canonical
+
+    os.remove(b_view)
+    assert store.prune() == 1
+    assert not os.path.exists(canonical)
+    assert index.views_of(canonical) == []
+    index.close()
+
+
+def test_first_view_moves_file_for_every_clip_sharing_it(tmp_path, monkeypatch):
+    index, store, canonical = _shared_store_file(tmp_path)
+    # As on a drive without hard links
+    monkeypatch.setattr(SongStore, "_can_hardlink", lambda self, src, folder: False)
+
+    view = store.add_view("B", canonical, str(tmp_path / "Playlist" / "B.mp3"))
+    assert not os.path.exists(canonical)
+    assert index.canonical("A") == view
+    assert index.canonical("B") == view
+    index.close()
@@ -0,0 +1,115 @@
+import os
+import queue
+import re
+import threading
+
+from suno_utils import read_text_fields
+
+
+# Songs read and written per transaction, so searches never wait long for the lock
+BATCH_SIZE = 200
+
+_REFRESH = object()
+_STOP = object()
+
+
+def _sidecar_mtime_ns(filepath):
+    try:
+        return os.stat(os.path.splitext(filepath)[0] + ".txt").st_mtime_ns
+    except OSError:
+        return None
+
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for what the user typed: every word must match, and the
+    last one may be a prefix (it is usually still being typed). None if no words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class TextIndexer:
+    """
+    Keeps the cache database's full-text index (lyrics, style tags, prompts) current.
+
+    Files are read on a background thread with read_text_fields(). refresh() finds
+    songs whose file or .txt sidecar changed since they were indexed (or were never
+    indexed) after a scan; update() re-reads specific songs, e.g. after a download
+    or a lyrics edit. Searches go straight to SQLite and take milliseconds.
+
+    on_progress(done, total), if given, is called from the indexer thread.
+    """
+
+    def __init__(self, cache_db, on_progress=None):
+        self.cache_db = cache_db
+        self.on_progress = on_progress
+        self.available = bool(cache_db and cache_db.has_text_search)
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.available:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def refresh(self):
+        """Index every song that is new or changed since it was last indexed."""
+        if self.available:
+            self._queue.put(_REFRESH)
+
+    def update(self, filepaths):
+        """Re-read the searchable text of these songs."""
+        filepaths = list(filepaths)
+        if self.available and filepaths:
+            self._queue.put(filepaths)
+
+    def search(self, text, limit=500):
+        """[(filepath, snippet)] for songs matching text, best match first."""
+        match = fts_query(text)
+        if not self.available or match is None:
+            return []
+        try:
+            return self.cache_db.search_text(match, limit)
+        except Exception as e:
+            print(f"Full-text search error: {e}")
+            return []
+
+    def close(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._queue.put(_STOP)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if self._stopped.is_set():
+                return
+            try:
+                if item is _REFRESH:
+                    self._index(self.cache_db.text_index_state(), only_stale=True)
+                else:
+                    self._index(self.cache_db.text_index_state(item), only_stale=False)
+            except Exception as e:
+                print(f"Text index error: {e}")
+
+    def _index(self, rows, only_stale):
+        todo = []
+        for filepath, mtime_ns, indexed_mtime_ns, indexed_sidecar_mtime_ns in rows:
+            sidecar_mtime_ns = _sidecar_mtime_ns(filepath)
+            if (only_stale and indexed_mtime_ns is not None and indexed_mtime_ns == mtime_ns
+                    and indexed_sidecar_mtime_ns == sidecar_mtime_ns):
+                continue
+            todo.append((filepath, mtime_ns, sidecar_mtime_ns))
+
+        for start in range(0, len(todo), BATCH_SIZE):
+            if self._stopped.is_set():
+                return
+            entries = [(filepath, read_text_fields(filepath), mtime_ns, sidecar_mtime_ns)
+                       for filepath, mtime_ns, sidecar_mtime_ns in todo[start:start + BATCH_SIZE]]
+            self.cache_db.set_text_many(entries)
+            if self.on_progress:
+                self.on_progress(min(start + BATCH_SIZE, len(todo)), len(todo))
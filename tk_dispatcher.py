@@ -0,0 +1,73 @@
+import threading
+import time
+import traceback
+import tkinter as tk
+
+
+class TkDispatcher:
+    """
+    Runs callbacks on the Tk thread, posted from any thread, without polling.
+
+    post() never touches Tk, so it is safe to call from threads that hold other
+    locks (libVLC event callbacks, watcher threads). A relay thread wakes only
+    when something was posted and schedules one drain on the Tk loop for the
+    whole burst; nothing runs while there is nothing to deliver.
+
+    Posts that share a `key` are coalesced: only the latest callback and
+    arguments for that key run, in the position of the first post.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (callback, args); dicts keep first-insertion order
+        self._wake = threading.Event()
+        self._scheduled = False
+        self._closed = False
+        self._relay = threading.Thread(target=self._relay_loop, daemon=True)
+        self._relay.start()
+
+    def post(self, callback, *args, key=None):
+        """Queue callback(*args) to run on the Tk thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._calls[key if key is not None else object()] = (callback, args)
+            if not self._scheduled:
+                self._scheduled = True
+                self._wake.set()
+
+    def close(self):
+        """Stop delivering callbacks; pending ones are dropped."""
+        with self._lock:
+            self._closed = True
+            self._calls.clear()
+        self._wake.set()
+
+    def _relay_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                # Marshalled onto the Tk thread by tkinter; may block until it is free
+                self.widget.after(0, self._drain)
+            except RuntimeError:
+                # Main loop not running yet; try again shortly
+                time.sleep(0.1)
+                self._wake.set()
+            except tk.TclError:
+                # Widget destroyed
+                return
+
+    def _drain(self):
+        with self._lock:
+            calls = list(self._calls.values())
+            self._calls.clear()
+            self._scheduled = False
+        for callback, args in calls:
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,255 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# (min, max) pairs per song, one signed byte each: 2 KB per song
+PEAK_BINS = 1024
+# Sample rate ffmpeg decodes compressed files to; plenty for a picture of the loudness
+DECODE_RATE = 8000
+DECODE_TIMEOUT = 120
+# Songs sent to the pool at a time; pausing or closing waits for at most one batch
+BATCH_SIZE = 16
+
+FFMPEG = shutil.which("ffmpeg")
+WAV_EXTENSIONS = ('.wav', '.wave')
+
+# Maps unsigned 8-bit PCM onto signed
+_FLIP_SIGN = bytes(i ^ 0x80 for i in range(256))
+
+
+def can_decode(filepath):
+    """Whether compute_peaks() has a decoder for this file (WAV directly, anything else via ffmpeg)."""
+    return bool(FFMPEG) or filepath.lower().endswith(WAV_EXTENSIONS)
+
+
+def _to_int16(data, sampwidth):
+    """Little-endian PCM of any sample width as native 16-bit samples (the top two bytes of each)."""
+    out = bytearray(len(data) // sampwidth * 2)
+    if sampwidth == 1:
+        out[1::2] = data.translate(_FLIP_SIGN)
+    else:
+        out[0::2] = data[sampwidth - 2::sampwidth]
+        out[1::2] = data[sampwidth - 1::sampwidth]
+    if NUMPY_AVAILABLE:
+        return np.frombuffer(bytes(out), dtype='<i2')
+    samples = array('h', bytes(out))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def _extremes(samples):
+    if not len(samples):
+        return 0, 0
+    if NUMPY_AVAILABLE:
+        return int(samples.min()), int(samples.max())
+    return min(samples), max(samples)
+
+
+def _pack(extremes):
+    return array('b', [value >> 8 for pair in extremes for value in pair]).tobytes()
+
+
+def _wav_peaks(filepath):
+    with wave.open(filepath, 'rb') as w:
+        sampwidth, nframes = w.getsampwidth(), w.getnframes()
+        if not nframes:
+            return None
+        extremes = []
+        start = 0
+        for i in range(PEAK_BINS):
+            # One bin's frames at a time, so long WAVs never sit in memory whole
+            end = (i + 1) * nframes // PEAK_BINS
+            extremes.append(_extremes(_to_int16(w.readframes(end - start), sampwidth)))
+            start = end
+    return _pack(extremes)
+
+
+def _ffmpeg_peaks(filepath):
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+    result = subprocess.run(
+        [FFMPEG, '-v', 'error', '-nostdin', '-i', filepath,
+         '-ac', '1', '-ar', str(DECODE_RATE), '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=DECODE_TIMEOUT, **kwargs)
+    samples = _to_int16(result.stdout, 2)
+    if not len(samples):
+        return None
+    count = len(samples)
+    return _pack(_extremes(samples[i * count // PEAK_BINS:(i + 1) * count // PEAK_BINS])
+                 for i in range(PEAK_BINS))
+
+
+def compute_peaks(filepath):
+    """
+    Waveform peaks for an audio file: PEAK_BINS (min, max) pairs as signed bytes
+    (full scale = ±127), interleaved. b'' if the file can't be decoded. Runs in
+    the worker processes.
+    """
+    try:
+        if filepath.lower().endswith(WAV_EXTENSIONS):
+            try:
+                return _wav_peaks(filepath) or b''
+            except (wave.Error, EOFError):
+                if not FFMPEG:
+                    return b''  # Compressed/float WAV the wave module can't read
+        if FFMPEG:
+            return _ffmpeg_peaks(filepath) or b''
+    except Exception as e:
+        print(f"Waveform error for {filepath}: {e}")
+    return b''
+
+
+def unpack_peaks(peaks):
+    """Stored peaks blob as a flat array of signed bytes: min, max, min, max, ..."""
+    return array('b', peaks)
+
+
+def _lower_priority():
+    """Pool initializer: keep peak work from competing with playback and the UI."""
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+class PeakIndexer:
+    """
+    Computes waveform peaks for every song once and keeps them in the cache database.
+
+    refresh() queues every song with no stored peaks (songs are matched by file
+    identity, so edited files are redone and moved ones are not), queue() just the
+    given ones (new or changed files, so a watcher batch or finished download
+    doesn't re-query the whole library); they are decoded
+    in a small process pool, a batch at a time, and each batch is committed as it
+    finishes, so the job picks up where it left off after a restart. pause() holds
+    the backlog (e.g. while downloads run) until resume(). request() computes one
+    song ahead of the backlog, even while paused, for the player.
+
+    Callbacks passed to request() are called from the indexer thread.
+    """
+
+    def __init__(self, cache_db, workers=None):
+        self.cache_db = cache_db
+        self.available = bool(cache_db)
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self._cond = threading.Condition()
+        self._refresh = False
+        self._queued = []   # filepaths passed to queue()
+        self._urgent = []   # (filepath, callback)
+        self._paused = False
+        self._stopped = False
+        self._pool = None   # started on first use
+        self._thread = None
+        if self.available:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def refresh(self):
+        """Queue every song whose peaks haven't been computed yet."""
+        self._signal(refresh=True)
+
+    def queue(self, filepaths):
+        """Queue these songs if their peaks haven't been computed yet."""
+        if not self.available:
+            return
+        with self._cond:
+            self._queued.extend(filepaths)
+            self._cond.notify()
+
+    def request(self, filepath, callback):
+        """Compute one song's peaks now; callback(filepath, peaks) when done."""
+        if self.available and can_decode(filepath):
+            with self._cond:
+                self._urgent.append((filepath, callback))
+                self._cond.notify()
+
+    def get(self, filepath):
+        """Stored peaks for a song (b'' if it couldn't be decoded), or None if not computed yet."""
+        if not self.available:
+            return None
+        try:
+            return self.cache_db.get_peaks(filepath)
+        except Exception as e:
+            print(f"Waveform lookup error: {e}")
+            return None
+
+    def pause(self):
+        self._signal(paused=True)
+
+    def resume(self):
+        self._signal(paused=False)
+
+    def close(self):
+        self._signal(stopped=True)
+
+    def _signal(self, refresh=None, paused=None, stopped=None):
+        with self._cond:
+            if refresh:
+                self._refresh = True
+            if paused is not None:
+                self._paused = paused
+            if stopped:
+                self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        todo = []
+        try:
+            while True:
+                with self._cond:
+                    while not (self._stopped or self._urgent
+                               or (not self._paused and (todo or self._refresh or self._queued))):
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    urgent, self._urgent = self._urgent, []
+                    refresh = self._refresh and not self._paused
+                    queued = []
+                    if refresh:
+                        self._refresh = False
+                        self._queued = []  # The refresh finds them too
+                    elif not self._paused:
+                        queued, self._queued = self._queued, []
+                try:
+                    if urgent:
+                        results = self._compute([filepath for filepath, _ in urgent])
+                        for (filepath, callback), peaks in zip(urgent, results):
+                            callback(filepath, peaks)
+                    if refresh:
+                        todo = [filepath for filepath in self.cache_db.peak_index_state() if can_decode(filepath)]
+                    elif queued:
+                        pending = set(todo)
+                        todo.extend(filepath for filepath in dict.fromkeys(queued)
+                                    if filepath not in pending and can_decode(filepath)
+                                    and self.cache_db.get_peaks(filepath) is None)
+                    elif not urgent:
+                        batch, todo = todo[:BATCH_SIZE], todo[BATCH_SIZE:]
+                        self._compute(batch)
+                except Exception as e:
+                    print(f"Waveform index error: {e}")
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _compute(self, filepaths):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_priority)
+        results = list(self._pool.map(compute_peaks, filepaths))
+        self.cache_db.set_peaks_many(zip(filepaths, results))
+        return results
+